@@ -1,14 +1,15 @@
 import subprocess
 import os
-import matplotlib.pyplot as plt
-import matplotlib as mpl
 import math
-from networkx.drawing.nx_pydot import pydot_layout
+import numbers
 from lxml import etree
 import networkx as nx
 import platform
 import pandas as pd
 
+#Solvers whose results carry costs, flows and capacities ("SSGLP" and "INSIDEOUT" also by their numeric codes 2 and 3)
+COSTED_SOLVERS=["SSGLP","INSIDEOUT","MILP","HEURISTIC",2,3]
+
 class Pgraph():
     def __init__(self, problem_network, mutual_exclusion=[[]], solver="INSIDEOUT",max_sol=100, input_file=None):
         ''' 
@@ -20,10 +21,22 @@ class Pgraph():
         Arguments
         problem_network: (DiGraph() object) Directed graph object specified using networkx
         mutual_exclusion: (list of list) List of lists containing mutually excluded elements. Symbols of nodes should be used. e.g. "M1"
-        solver: (str) solver type that is used. Possibilities include "MSE", "SSG", "SSGLP" (for SSG+LP), "INSIDEOUT" (for ABB)
+        solver: (str) solver type that is used. Possibilities include "MSE", "SSG", "SSGLP" (for SSG+LP), "INSIDEOUT" (for ABB),
+                "MILP" (optimal structure only, from the mixed-integer program solved by HiGHS, see milp_model()),
+                "HEURISTIC" (good structures fast from a beam search guided by LP relaxations, with a lower bound and gap on their quality)
         max_sol: (int) Maximum number of solutions required for the solver.       
+        input_file: (string)(optional) Existing PNS_problem_v1 input file (.in) that the solver uses instead of the one generated from problem_network.
+                    If problem_network is None or empty, the network and mutual exclusions are read from the file (see from_pns()).
         
         '''
+        if input_file is not None and (problem_network is None or len(problem_network)==0):
+            from .pnsfile import read_pns
+            problem_network,ME,symbols=read_pns(input_file)
+            if mutual_exclusion==[[]] and ME:
+                mutual_exclusion=ME
+            if any(k!=v for k,v in symbols.items()):
+                #Solutions of the file would refer to names that are not symbols of the network
+                input_file=None
     
         #In case names is not specified, revert to symbol of graph
         for n in problem_network:
@@ -40,8 +53,27 @@ class Pgraph():
         self.goolist=[]
         self.wine_installed=False #For Linux Only
         self.input_file=input_file
+        self.partial=False #True if the last run was stopped by a time limit or gap
+        self.structures=None #Bitset matrix of the operating units of every solution, see _encode_structures()
+        self.lower_bound=None
+        self.gap=None
+        self._maximal=None #MaximalStructure kept up to date by the network edits, see maximal_structure()
         
-    def plot_problem(self,figsize=(5,10),padding=0.25,titlepos=0.95,rescale=2,box=True,node_size=3000):
+    def _layout(self,G,layout="dot"):
+        '''
+        Node positions of G for plotting, see the layout argument of plot_problem().
+        '''
+        if isinstance(layout,dict):
+            return {n:(float(layout[n][0]),float(layout[n][1])) for n in G.nodes()}
+        elif layout=="dot":
+            from networkx.drawing.nx_pydot import pydot_layout
+            return pydot_layout(G,prog='dot')
+        elif layout=="layered":
+            from .layout import layered_layout
+            return layered_layout(G)
+        raise ValueError("Unknown layout "+str(layout)+". Use \"dot\", \"layered\" or a dictionary of positions.")
+
+    def plot_problem(self,figsize=(5,10),padding=0.25,titlepos=0.95,rescale=2,box=True,node_size=3000,layout="dot"):
         '''
         plot_problem(self,figsize=(5,10),padding=0,titlepos=0.95,rescale=2,box=True)
                 
@@ -54,11 +86,14 @@ class Pgraph():
         titlepos: (float) Position of title in the figure
         rescale: (float) Rescaling the axis of the figures. Makes nodes further apart and appear smaller.
         box: (boolean) Whether the figure should appear square.
+        layout: (string or dict) "dot" for the Graphviz layout, "layered" for the built-in layered layout (no Graphviz needed) or a dictionary of precomputed node positions.
         
         Return:
         ax: (matplotlib.axes) Axes of the figure. Can be manipulated further before plotting.
         '''
-        
+        import matplotlib.pyplot as plt
+        import matplotlib as mpl
+
         G=self.G.copy()
         for n in G.nodes():
             if n[0]=="O":
@@ -74,8 +109,8 @@ class Pgraph():
         node_labels={n:G.nodes()[n]['names']  for n in G.nodes()}
 
         nodeShapes = set((aShape[1]["s"] for aShape in G.nodes(data = True)))
-        pos=pydot_layout(G,prog='dot')
-        pos2=pydot_layout(G,prog='dot')
+        pos=self._layout(G,layout)
+        pos2=dict(pos)
         for key, (v1,v2) in pos2.items():
             if key[0]=="O":
                 pos2[key]=(v1,v2-3)
@@ -185,16 +220,9 @@ class Pgraph():
 
         for n in G.nodes():
             if n[0]=="O": 
-                add_str=n+": "
-                for x1, x2 in G.in_edges(n):
-                    add_str=add_str+str(G[x1][x2]["weight"])+" "+x1
-                    add_str=add_str+" + "
-                add_str=add_str[:-3]
-                add_str=add_str+" => "
-                for x1, x2 in G.out_edges(n):
-                    add_str=add_str+str(G[x1][x2]["weight"])+" "+x2
-                    add_str=add_str+" + "
-                add_str=add_str[:-3]
+                #Joined so that a unit without inputs or outputs keeps its symbol
+                add_str=n+": "+" + ".join(str(G[x1][x2]["weight"])+" "+x1 for x1, x2 in G.in_edges(n))
+                add_str=add_str+" => "+" + ".join(str(G[x1][x2]["weight"])+" "+x2 for x1, x2 in G.out_edges(n))
                 prelines.append(add_str)
                 prelines.append("\n")
         if ME!=[]:
@@ -217,9 +245,9 @@ class Pgraph():
             for line in prelines:
                 f.write(line)
 
-    def solve(self,system=None,skip_wine=False, solver_name='pgraph_solver.exe',path=None):
+    def solve(self,system=None,skip_wine=False, solver_name='pgraph_solver.exe',path=None,time_limit=None):
         '''
-        solve(system=None,skip_wine=False)
+        solve(system=None,skip_wine=False,time_limit=None)
         
         Description
         Runs the solver.
@@ -228,22 +256,30 @@ class Pgraph():
         system: (string) (optional) Operating system. Options of "Windows", "Linux". MacOS is not supported yet. Specifying this makes function slightly faster.
         skip_wine: (boolean) Only relevent for Linux. Skip the dependency "wine" if it is already installed. 
         solver_name= (string) For advanced users only. Choose your customized solver. 'pgraph_solver.exe' or 'pgraph_solver_new.exe'
-        path = (string) path to the custom solver. If None, then the default library installation path will be used.
+        path = (string) path to the custom solver. If None, then the default library installation path will be used. Input and output files are always kept in self.path.
+        time_limit: (float)(optional) Seconds after which the solver is stopped. Solutions written until then can still be read and are flagged with self.partial=True.
         '''
         if path==None:
             path=self.path
+        work_path=self.path
         max_sol=self.max_sol
         solver=self.solver
         solver_dict={0:"MSG",1:"SSG",2:"SSGLP",3:"INSIDEOUT"}
+        self.partial=False
+        #Remove old results so that a stopped run never reads solutions of a previous one
+        if os.path.isfile(work_path+"test_out.out"):
+            os.remove(work_path+"test_out.out")
      
         if system==None:
             system=platform.system()
+        #A given input file is solved as it is, otherwise the one written by create_solver_input()
+        if type(self.input_file)==str:
+            input_file=os.path.abspath(self.input_file)
+        else:
+            input_file=work_path+"input.in"
             
         if system=="Windows": #support for windows
-            if type(self.input_file)==str:
-                rc=subprocess.run([path+solver_name,solver, input_file, path+"test_out.out", str(max_sol)])
-            else:
-                rc=subprocess.run([path+solver_name,solver, path+"input.in", path+"test_out.out", str(max_sol)])                
+            self._run_solver_process([path+solver_name,solver, input_file, work_path+"test_out.out", str(max_sol)],time_limit)
         elif system=="Linux":
             #try installing dependencies
             if skip_wine==False and self.wine_installed==False:
@@ -253,46 +289,148 @@ class Pgraph():
                 os.system("apt-get update")
                 os.system("apt-get install wine32")
                 self.wine_installed=True
-            out_string=" ".join(["wine",path+solver_name,solver, path+"input.in", path+"test_out.out", str(max_sol)])
-            os.popen(out_string).read()
+            self._run_solver_process(["wine",path+solver_name,solver, input_file, work_path+"test_out.out", str(max_sol)],time_limit)
         ################
+
+    def _run_solver_process(self,args,time_limit=None):
+        '''
+        _run_solver_process(args,time_limit=None)
+
+        Description
+        Runs the solver executable and stops it once time_limit seconds have passed. Raises RuntimeError with the output of the executable
+        (or of wine) if it fails.
+        '''
+        try:
+            process=subprocess.run(args,stdout=subprocess.PIPE,stderr=subprocess.PIPE,timeout=time_limit)
+        except subprocess.TimeoutExpired:
+            self.partial=True
+            return
+        if process.returncode!=0:
+            message=(process.stderr or process.stdout).decode(errors="replace").strip()
+            raise RuntimeError("The P-graph solver "+args[-5]+" failed with exit code "+str(process.returncode)+(": "+message if message else ""))
+
+    def solve_native(self,time_limit=None,gap=None,incumbent=None,cutoff=None,workers=1,beam_width=8):
+        '''
+        solve_native(time_limit=None,gap=None,incumbent=None,cutoff=None,workers=1,beam_width=8)
+
+        Description
+        Solves the problem with the built-in accelerated branch-and-bound and fills the same results as read_solutions().
+        Requires numpy and scipy.
+
+        Arguments
+        time_limit: (float)(optional) Maximum solving time in seconds. The "HEURISTIC" solver stops after 1 s by default (heuristic.TIME_LIMIT).
+        gap: (float)(optional) Relative optimality gap at which the search stops, e.g. 0.01 for 1%.
+        incumbent: (list or int)(optional) Symbols of the operating units of a known structure, or the index of a solution of the previous run. It is evaluated first
+                   and counts as a found solution, so its cost prunes the search once max_sol structures are known. The solutions do not change.
+        cutoff: (float)(optional) Upper cost bound. Only structures not more expensive than cutoff are searched for.
+        workers: (int) Number of processes exploring subtrees in parallel. They share the incumbent bound and give the same structures as a single process.
+        beam_width: (int) Nodes kept on every level of the tree by the "HEURISTIC" solver. self.lower_bound and self.gap tell how far its best structure can be from the optimum.
+        '''
+        from .model import PNSModel
+        from .abb import solve_abb
+
+        if self.solver in ["MSG",0]:
+            units,materials=self.maximal_structure()
+            self.goplist=[units]
+            self.gmatlist=[materials]
+            self.goolist=["0"]
+            self.partial=False
+            self._encode_structures()
+            return
+        if self.solver not in COSTED_SOLVERS:
+            raise ValueError("The native solver supports 'MSG', 'SSGLP', 'INSIDEOUT', 'MILP' and 'HEURISTIC' only, not "+str(self.solver))
+        model=PNSModel(self.G,self.ME)
+        if self.solver=="MILP":
+            from .milp import solve_milp
+            if incumbent is not None:
+                raise ValueError("The MILP solver does not take an incumbent.")
+            result=solve_milp(model,time_limit=time_limit,gap=gap,cutoff=cutoff)
+        else:
+            if isinstance(incumbent,numbers.Integral):
+                incumbent=[x[1] for x in self.goplist[incumbent]]
+            if incumbent is not None:
+                #Units removed from the graph since the previous run are skipped
+                incumbent=[model.unit_index[x] for x in incumbent if x in model.unit_index]
+            if self.solver=="HEURISTIC":
+                from .heuristic import solve_heuristic
+                result=solve_heuristic(model,beam_width=beam_width,max_sol=self.max_sol,time_limit=time_limit,gap=gap,incumbent=incumbent,cutoff=cutoff)
+            else:
+                result=solve_abb(model,max_sol=self.max_sol,time_limit=time_limit,gap=gap,incumbent=incumbent,cutoff=cutoff,workers=workers)
+        self._set_native_results(model,result.solutions)
+        self.partial=result.partial
+        self.lower_bound=result.lower_bound
+        self.gap=result.gap
+        if len(self.goolist)==0:
+            print("No Feasible Solution Found!")
+
+    def _set_native_results(self,model,solutions):
+        '''
+        _set_native_results(model,solutions)
+
+        Description
+        Converts (cost, units, x) solutions of the native solvers to gmatlist, goplist and goolist in the format of read_solutions().
+        '''
+        import numpy as np
+
+        fmt=lambda x:"%.10g" % x
+        gmatlist=[]
+        goplist=[]
+        goolist=[]
+        for cost,units,x in solutions:
+            selected=np.zeros(len(model.units))
+            selected[list(units)]=1
+            unit_cost=model.unit_cost(x,selected)
+            p=model.A@x
+            mat_cost=-model.price*p
+            used=np.flatnonzero(model.touch@selected>0)
+            tmatlist=[]
+            for m in used:
+                flow=-p[m] if model.mat_type[m]==0 else p[m]
+                tmatlist.append([model.materials[m],fmt(mat_cost[m]+0.0),"USD/y",fmt(flow+0.0),"t/y"])
+            toplist=[[fmt(x[u]),model.units[u],fmt(unit_cost[u]),"USD/y"] for u in units]
+            gmatlist.append(tmatlist)
+            goplist.append(toplist)
+            goolist.append(fmt(cost))
+        self.gmatlist=gmatlist
+        self.goplist=goplist
+        self.goolist=goolist
+        self._encode_structures()
     
-    def read_solutions(self):
+    def read_solutions(self,lazy=False):
         '''
-        read_solutions()
+        read_solutions(lazy=False)
         
         Description
-        Reads the solution from the solver.            
+        Reads the solution from the solver. Raises FileNotFoundError if there is no output file, unless the solver was stopped by the time limit
+        before writing one (self.partial=True).
+
+        Arguments
+        lazy: (boolean) Whether to read solutions only when they are accessed. The output file is indexed once (the index is saved next to it as
+              test_out.out.idx.npz) and e.g. plot_solution(k) or get_solution_as_network(k) then parse only the block of solution k.
+              goplist, gmatlist and goolist become read-only list-like views.
         '''
     
         path=self.path
+        if lazy:
+            return self._read_solutions_lazy()
         gmatlist=[]
         goplist=[]
         goolist=[]
         
-        #clean strings
-        with open(path+"test_out.out","r") as f:
-            lines = f.readlines()
-        for i in range(len(lines)-1,1,-1):
-            if lines[i-1].strip() == "Operating units(1):":
-                continue
-            if lines[i][0]==" " or (len(lines[i].strip())>0 and ":" not in lines[i] and "," not in lines[i] and "= " not in lines[i] and "End." not in lines[i]): ## Attention for possible future changes
-                if lines[i-1][-3:]!="\n":
-                    lines[i-1]=lines[i-1].rstrip()+" "+lines[i].strip()
-                    lines[i]=""
-                else:
-                    lines[i-1]=lines[i-1][:-3].rstrip()+" "+lines[i].strip()
-                    lines[i]=""
-        lines=list(map(lambda x:x.strip(),lines))
-        lines=list(filter(None, lines))
-        #Lines are now clean with next lines combined as elements of list.
+        lines=[]
+        if os.path.isfile(path+"test_out.out"):
+            with open(path+"test_out.out","r") as f:
+                lines = f.readlines()
+        elif not self.partial:
+            raise FileNotFoundError("The P-graph solver did not write "+path+"test_out.out")
+        lines=self._clean_lines(lines)
+        #A solver stopped by the time limit leaves an output without "End.", its last structure may be cut off.
+        complete=len(lines)>0 and lines[-1]=="End."
+        if not complete:
+            self.partial=True
         
         ###### Read for the case of SSGLP and INSIDEOUT (ABB) ######
-        if self.solver in ["SSGLP","INSIDEOUT",2,3]:
-            mat_list=lines[1]
-            op_list=lines[3] 
-            used_mat_list=lines[6] 
-
+        if self.solver in COSTED_SOLVERS:
             #Find solutions via Feasible Structure tag
             sol_start_index=[]
             for i in range(len(lines)):
@@ -304,44 +442,13 @@ class Pgraph():
             sol_list=[]
             for i in range(1,len(sol_start_index)):
                 sol_list.append(lines[sol_start_index[i-1]:sol_start_index[i]])
+            if not complete:
+                sol_list=sol_list[:-1]
 
-            comp=["Materials:","Operating units:","Total annual cost="]
             for i in range(len(sol_list)): #loop through solution number
-                comp_ind=-1
-                s=False
-                tmatlist=[]
-                toplist=[]
-                for j in range(len(sol_list[i])):
-                    if sol_list[i][j][:len(comp[0])]==comp[0]: #Materials
-                        comp_ind=0
-                        s=True
-                    elif sol_list[i][j][:len(comp[1])]==comp[1]:    #Operating units
-                        comp_ind=1
-                        s=True
-                    elif sol_list[i][j][:len(comp[2])]==comp[2]:   # Total annual cost
-                        comp_ind=2
-                        s=True
-                    if s==False:
-                        if comp_ind==0: #Materials
-                           
-                            tlist=sol_list[i][j].replace('(',' ')
-                            tlist=tlist.replace(')','')
-                            tlist=tlist.split()
-                            if tlist[0][-1]==":":
-                                tlist[0]=tlist[0][:-1] #correct for semicolon  
-                            if tlist[1]=="balanced": #correct for balanced
-                                tlist=[tlist[0],0,0,0]
-                            tmatlist.append(tlist)
-                        elif comp_ind==1: #Operating units
-                            glist=sol_list[i][j].split(')')
-                            glist=glist[0].replace('*',' ')
-                            glist=glist.replace('(', ' ')
-                            glist=glist.split()
-                            toplist.append(glist)
-                    if comp_ind==2:  #Total annual cost
-                        goolist.append(sol_list[i][j].split()[3])
-                    s=False
-
+                toplist,tmatlist,cost=self._parse_feasible_structure(sol_list[i])
+                if cost is not None:
+                    goolist.append(cost)
                 goplist.append(toplist)
                 gmatlist.append(tmatlist)        
             self.goplist=goplist
@@ -353,28 +460,138 @@ class Pgraph():
         ###### Read for the case MSG ######
         if self.solver in ["MSG",0,"SSG",1]:
             for i in range(len(lines)):
-                #### maximal structure ####
-                if self.solver in ["MSG", 0] and lines[i]=="Maximal Structure:":
-                    if lines[i+1][9:]!="(0):":
-                        gmatlist.append(lines[i+2].split(", "))  # materials
-                        goplist.append(lines[i+4].split(", "))   # operating units
-                    else:
-                        gmatlist.append([])
-                        goplist.append([])
-                    goolist.append("0")
-                
-                #### solution structure ####
-                if lines[i][:19]=="Solution structure ":
-                    goolist.append(lines[i].split("#")[1][:-1]) #SSG number
-                    if lines[i+1][9:]!="(0):":
-                        gmatlist.append(lines[i+2].split(", "))  # materials
-                        goplist.append(lines[i+4].split(", "))   # operating units
-                    else:
-                        gmatlist.append([])
-                        goplist.append([])
+                #### maximal structure and solution structures ####
+                if ((self.solver in ["MSG", 0] and lines[i]=="Maximal Structure:") or lines[i][:19]=="Solution structure ") and (complete or i+5<len(lines)):
+                    ops,mats,number=self._parse_structure(lines[i:i+5])
+                    goolist.append(number)
+                    gmatlist.append(mats)
+                    goplist.append(ops)
             self.goplist=goplist
             self.gmatlist=gmatlist
             self.goolist=goolist
+        self._encode_structures()
+
+    @staticmethod
+    def _clean_lines(lines):
+        '''
+        _clean_lines(lines)
+
+        Description
+        Joins the wrapped lines of the solver output with the line they continue, strips them and drops empty lines.
+        '''
+        for i in range(len(lines)-1,1,-1):
+            if lines[i-1].strip() == "Operating units(1):":
+                continue
+            if lines[i][0]==" " or (len(lines[i].strip())>0 and ":" not in lines[i] and "," not in lines[i] and "= " not in lines[i] and "End." not in lines[i]): ## Attention for possible future changes
+                if lines[i-1][-3:]!="\n":
+                    lines[i-1]=lines[i-1].rstrip()+" "+lines[i].strip()
+                    lines[i]=""
+                else:
+                    lines[i-1]=lines[i-1][:-3].rstrip()+" "+lines[i].strip()
+                    lines[i]=""
+        lines=list(map(lambda x:x.strip(),lines))
+        lines=list(filter(None, lines))
+        #Lines are now clean with next lines combined as elements of list.
+        return lines
+
+    @staticmethod
+    def _parse_feasible_structure(block):
+        '''
+        _parse_feasible_structure(block)
+
+        Description
+        Parses the clean lines of one "Feasible structure" block of SSGLP and INSIDEOUT.
+
+        Return
+        toplist, tmatlist: (list) Operating unit and material entries of the solution.
+        cost: (string) Total annual cost, None if missing.
+        '''
+        comp=["Materials:","Operating units:","Total annual cost="]
+        comp_ind=-1
+        s=False
+        tmatlist=[]
+        toplist=[]
+        cost=None
+        for j in range(len(block)):
+            if block[j][:len(comp[0])]==comp[0]: #Materials
+                comp_ind=0
+                s=True
+            elif block[j][:len(comp[1])]==comp[1]:    #Operating units
+                comp_ind=1
+                s=True
+            elif block[j][:len(comp[2])]==comp[2]:   # Total annual cost
+                comp_ind=2
+                s=True
+            if s==False:
+                if comp_ind==0: #Materials
+                   
+                    tlist=block[j].replace('(',' ')
+                    tlist=tlist.replace(')','')
+                    tlist=tlist.split()
+                    if tlist[0][-1]==":":
+                        tlist[0]=tlist[0][:-1] #correct for semicolon  
+                    if tlist[1]=="balanced": #correct for balanced
+                        tlist=[tlist[0],0,0,0]
+                    tmatlist.append(tlist)
+                elif comp_ind==1: #Operating units
+                    glist=block[j].split(')')
+                    glist=glist[0].replace('*',' ')
+                    glist=glist.replace('(', ' ')
+                    glist=glist.split()
+                    toplist.append(glist)
+            if comp_ind==2:  #Total annual cost
+                cost=block[j].split()[3]
+            s=False
+        return toplist,tmatlist,cost
+
+    @staticmethod
+    def _parse_structure(block):
+        '''
+        _parse_structure(block)
+
+        Description
+        Parses the clean lines of one "Maximal Structure" or "Solution structure" block of MSG and SSG.
+
+        Return
+        ops, mats: (list) Operating units and materials of the structure.
+        number: (string) Structure number, "0" for the maximal structure.
+        '''
+        if block[0]=="Maximal Structure:":
+            number="0"
+        else:
+            number=block[0].split("#")[1][:-1] #SSG number
+        if block[1][9:]!="(0):":
+            return block[4].split(", "),block[2].split(", "),number
+        return [],[],number
+
+    def _read_solutions_lazy(self):
+        '''
+        _read_solutions_lazy()
+
+        Description
+        Indexes the solver output and sets goplist, gmatlist and goolist to views that parse single solutions on access.
+        '''
+        from .outindex import SolutionFile, FEASIBLE, SOLUTION, MAXIMAL
+
+        out_path=self.path+"test_out.out"
+        if not os.path.isfile(out_path):
+            if not self.partial:
+                raise FileNotFoundError("The P-graph solver did not write "+out_path)
+            self.goplist,self.gmatlist,self.goolist=[],[],[]
+            self._encode_structures()
+            return
+        if self.solver in COSTED_SOLVERS:
+            solutions=SolutionFile(out_path,(FEASIBLE,),lambda block:self._parse_feasible_structure(self._clean_lines(block)))
+            self.goplist,self.gmatlist,self.goolist=solutions.view(0),solutions.view(1),solutions.view(2)
+        else:
+            kinds=(SOLUTION,MAXIMAL) if self.solver in ["MSG",0] else (SOLUTION,)
+            solutions=SolutionFile(out_path,kinds,lambda block:self._parse_structure(self._clean_lines(block)))
+            self.goplist,self.gmatlist,self.goolist=solutions.view(0),solutions.view(1),solutions.view(2)
+        if not solutions.complete:
+            self.partial=True
+        #Structures are encoded on first use (see _get_structures()) so that no solution is parsed here
+        self.structures=None
+
     def get_solution_as_network(self, sol_num=0):
         '''
         get_solution_as_network(sol_num=0)
@@ -388,12 +605,13 @@ class Pgraph():
         Return:
         H: (networkx DiGraph() object) Directed Graph object of the solution.
         '''
+        import matplotlib as mpl
         sol_num=sol_num
         H=self.G.copy()
         gmatlist=self.gmatlist
         goplist=self.goplist
         goolist=self.goolist
-        if self.solver in ["SSGLP","INSIDEOUT",2,3] :
+        if self.solver in COSTED_SOLVERS:
             for n in H.nodes():
                 if n[0]=="O":
                     H.nodes[n]['s']=mpl.markers.MarkerStyle(marker='s', fillstyle='top')
@@ -412,7 +630,35 @@ class Pgraph():
        
         return H
         
-    def plot_solution(self,sol_num=0,figsize=(5,10),padding=0.25,titlepos=0.95,rescale=2,box=True,node_size=3000):
+    def _solution_labels(self,sol_num):
+        '''
+        Nodes of solution sol_num and their plot labels (name, and Flow/Cap./Cost for SSGLP and INSIDEOUT) for the nodes still in the network.
+        '''
+        names=nx.get_node_attributes(self.G,'names')
+        if self.solver in COSTED_SOLVERS:
+            labels_flow={x[0]:x[3] for x in self.gmatlist[sol_num]}
+            labels_cap={x[1]:x[0] for x in self.goplist[sol_num]}
+            labels_cost={x[1]:x[2] for x in self.goplist[sol_num]}
+            labels_cost.update({x[0]:x[1] for x in self.gmatlist[sol_num]})
+            all_node=list(set(list(labels_flow.keys())+list(labels_cap.keys())+list(labels_cost.keys())))
+            labels1={}
+            for x in all_node:
+                string=str(names.get(x,x))
+                if labels_flow.get(x) is not None:
+                    string=string+"\nFlow="+str(abs(float(labels_flow.get(x))))
+                if labels_cap.get(x) is not None:
+                    string=string+"\nCap.="+str(labels_cap.get(x))
+                if labels_cost.get(x) is not None:
+                    string=string+"\nCost="+str(labels_cost.get(x))
+                labels1.update({x:string})
+        else:
+            all_node=self.goplist[sol_num]+self.gmatlist[sol_num]
+            labels1={x:str(names.get(x,x)) for x in all_node}
+        #Results may name nodes that were removed from the network after the run, they have nothing to be drawn on
+        labels1={x:text for x,text in labels1.items() if x in self.G}
+        return all_node,labels1
+
+    def plot_solution(self,sol_num=0,figsize=(5,10),padding=0.25,titlepos=0.95,rescale=2,box=True,node_size=3000,layout="dot"):
         '''
         plot_solution(sol_num=0,figsize=(5,10),padding=0,titlepos=0.95,rescale=2,box=True)
                 
@@ -426,51 +672,32 @@ class Pgraph():
         titlepos: (float) Position of title in the figure
         rescale: (float) Rescaling the axis of the figures. Makes nodes further apart and appear smaller.
         box: (boolean) Whether the figure should appear square.
+        layout: (string or dict) "dot" for the Graphviz layout, "layered" for the built-in layered layout (no Graphviz needed) or a dictionary of precomputed node positions.
         
         Return:
         ax: (matplotlib.axes) Axes of the figure. Can be manipulated further before plotting.
         '''
-        
+        import matplotlib.pyplot as plt
+        import matplotlib as mpl
+
         sol_num=sol_num
         H=self.G.copy()
-        gmatlist=self.gmatlist
-        goplist=self.goplist
         goolist=self.goolist
         
 
-        if self.solver in ["SSGLP","INSIDEOUT",2,3] and len(goolist)!=0:
+        if self.solver in COSTED_SOLVERS and len(goolist)!=0:
             for n in H.nodes():
                 if n[0]=="O":
                     H.nodes[n]['s']=mpl.markers.MarkerStyle(marker='s', fillstyle='top')
                 else:
                     H.nodes[n]['s']='o'
-            attr_op={x[1]:{"Capacity":x[0],"Cost":x[2]} for x in goplist[sol_num]}
-            attr_mat={x[0]:{"Flow":x[3],"Cost":x[1]} for x in gmatlist[sol_num]}
-            nx.set_node_attributes(H,attr_op)
-            nx.set_node_attributes(H,attr_mat)
             plt.rc('figure',figsize=figsize)
             label_options = {"ec": "k", "fc": "white", "alpha": 0.8}
             edges=H.edges()
             weights = [H[u][v]['weight'] for u,v in edges]
             labels = nx.get_edge_attributes(H,'weight')
             labels={k:round(v,2) for k,v in labels.items()}
-            labels_flow=nx.get_node_attributes(H,'Flow')
-            labels_cap=nx.get_node_attributes(H,'Capacity')
-            labels_cost=nx.get_node_attributes(H,'Cost')
-            all_node=list(set(list(labels_flow.keys())+list(labels_cap.keys())+list(labels_cost.keys())))
-            labels1={}
-            for x in all_node:
-                string=H.nodes()[x]['names']
-                if labels_flow.get(x) is not None:
-                    string=string+"\nFlow="+str(abs(float(labels_flow.get(x))))
-                
-                if labels_cap.get(x) is not None:
-                    string=string+"\nCap.="+str(labels_cap.get(x))
-                    
-                if labels_cost.get(x) is not None:    
-                    string=string+"\nCost="+str(labels_cost.get(x))
-                
-                labels1.update({x:string})
+            all_node,labels1=self._solution_labels(sol_num)
 
             for e in H.edges():
                 if e[0] in all_node and e[1] in all_node:
@@ -494,8 +721,8 @@ class Pgraph():
             
             nodeShapes = set((aShape[1]["s"] for aShape in H.nodes(data = True)))
 
-            pos=pydot_layout(H,prog='dot')
-            pos2=pydot_layout(H,prog='dot')
+            pos=self._layout(H,layout)
+            pos2=dict(pos)
             
 
             for key, (v1,v2) in pos2.items():
@@ -545,12 +772,7 @@ class Pgraph():
             labels = nx.get_edge_attributes(H,'weight')
             labels={k:round(v,2) for k,v in labels.items()}
 
-            all_node=self.goplist[sol_num]+self.gmatlist[sol_num]
-                        
-            labels1={}
-            for x in all_node:
-                string=H.nodes()[x]['names']
-                labels1.update({x:string})
+            all_node,labels1=self._solution_labels(sol_num)
             
             for e in H.edges():
                 if e[0] in all_node and e[1] in all_node:
@@ -574,8 +796,8 @@ class Pgraph():
             
             nodeShapes = set((aShape[1]["s"] for aShape in H.nodes(data = True)))
 
-            pos=pydot_layout(H,prog='dot')
-            pos2=pydot_layout(H,prog='dot')
+            pos=self._layout(H,layout)
+            pos2=dict(pos)
             
 
             for key, (v1,v2) in pos2.items():
@@ -622,6 +844,65 @@ class Pgraph():
         
         return ax
     
+    def solution_viewer(self,sol_num=0,figsize=(5,10),padding=0.25,titlepos=0.95,rescale=2,box=True,node_size=3000,layout="dot",ax=None):
+        '''
+        solution_viewer(sol_num=0,figsize=(5,10),padding=0.25,titlepos=0.95,rescale=2,box=True,node_size=3000,layout="dot",ax=None)
+
+        Description
+        Draws the network once and returns a viewer for browsing the solutions. Switching the solution with viewer.show(i), viewer.next() or the
+        notebook slider of viewer.interact() only updates the colors and labels of the drawn figure, which is much faster than calling plot_solution() again.
+
+        Arguments
+        The same as plot_solution(). ax: (matplotlib.axes)(optional) Axes to draw on.
+
+        Return:
+        viewer: (SolutionViewer) Viewer of the solutions.
+        '''
+        from .viewer import SolutionViewer
+        return SolutionViewer(self,sol_num=sol_num,figsize=figsize,padding=padding,titlepos=titlepos,rescale=rescale,box=box,node_size=node_size,layout=layout,ax=ax)
+
+    def svg_renderer(self,layout="layered",scale=1.5,node_radius=20,font_size=10,margin=60):
+        '''
+        svg_renderer(layout="layered",scale=1.5,node_radius=20,font_size=10,margin=60)
+
+        Description
+        Computes the layout and geometry of the network once and returns a renderer whose render(sol_num) writes solution images as SVG without
+        matplotlib. Rendering takes a few milliseconds and is thread-safe, e.g. for a web service that keeps one renderer per problem.
+
+        Arguments
+        layout: (string or dict) "layered" (default, no Graphviz needed), "dot" or a dictionary of precomputed node positions.
+        scale: (float) Pixels per layout point.
+        node_radius: (float) Radius of the material circles in pixels.
+        font_size: (float) Font size of the labels in pixels.
+        margin: (float) Margin around the drawing in pixels.
+
+        Return
+        renderer: (SVGRenderer) Renderer of the problem and its solutions.
+        '''
+        from .svg import SVGRenderer
+        return SVGRenderer(self,layout=layout,scale=scale,node_radius=node_radius,font_size=font_size,margin=margin)
+
+    def to_svg(self,sol_num=None,path=None,layout="layered",**kwargs):
+        '''
+        to_svg(sol_num=None,path=None,layout="layered",**kwargs)
+
+        Description
+        Draws the problem (sol_num=None) or a solution as an SVG image without matplotlib. Use svg_renderer() to draw many solutions with one layout.
+
+        Arguments
+        sol_num: (int)(optional) Index of the solution.
+        path: (string)(optional) File to write the image to.
+        layout, kwargs: See svg_renderer().
+
+        Return
+        svg: (string) SVG document.
+        '''
+        svg=self.svg_renderer(layout=layout,**kwargs).render(sol_num)
+        if path is not None:
+            with open(path,"w") as f:
+                f.write(svg)
+        return svg
+
     def to_studio(self, path=None,file_name="studio_file.pgsx",verbose=False):
         '''
         to_studio(path=None,file_name="studio_file.pgsx",verbose=False)
@@ -888,7 +1169,7 @@ class Pgraph():
             for x in nameM:
                 etree.SubElement(MOP_list[-1],"OperatingUnit").text=x
             global_edge_count+=1
-        if self.solver in ["SSGLP","INSIDEOUT",2,3]:
+        if self.solver in COSTED_SOLVERS:
             # Solutions
             Solutions=etree.SubElement(PGraph,"Solutions")
 
@@ -923,23 +1204,172 @@ class Pgraph():
             print(header+xml)
             print("Generated P-graph Studio File at ", path)
         return header+xml    
+
+    @staticmethod
+    def from_pns(path,solver="INSIDEOUT",max_sol=100):
+        '''
+        from_pns(path,solver="INSIDEOUT",max_sol=100)
+
+        Description
+        Builds a Pgraph object from a PNS_problem_v1 input file (.in), e.g. one written by create_solver_input() or exported from P-graph Studio.
+        The file is handed to the P-graph executable as it is, without generating a new input. If materials or operating units of the file
+        do not start with "M" and "O", they get new symbols (names are kept in "names") and the input is generated from the network instead.
+
+        Arguments
+        path: (string) Path of the .in file.
+        solver, max_sol: As in Pgraph().
+
+        Return
+        P: (Pgraph) Pgraph object of the problem.
+        '''
+        return Pgraph(None,solver=solver,max_sol=max_sol,input_file=path)
+
+    @staticmethod
+    def from_studio(path,solver="INSIDEOUT",max_sol=100):
+        '''
+        from_studio(path,solver="INSIDEOUT",max_sol=100)
+
+        Description
+        Builds a Pgraph object from a .pgsx (P-graph Studio File), e.g. one written by to_studio(). Parameters of value -1 keep the library defaults.
+        Fixed and proportional costs are the sums of the investment and operating costs of the file. Solutions stored in the file are not read.
+        Nodes are named "M<ID>" and "O<ID>" after the IDs of the file, with their names as "names".
+
+        Arguments
+        path: (string) Path of the .pgsx file.
+        solver, max_sol: As in Pgraph().
+
+        Return
+        P: (Pgraph) Pgraph object of the problem.
+        '''
+        import re
+        with open(path,"rb") as f:
+            data=f.read()
+        if data[:2] in (b"\xff\xfe",b"\xfe\xff"):
+            text=data.decode("utf-16")
+        else:
+            text=data.decode("utf-8-sig")
+        #The declaration may name an encoding that does not match the bytes (to_studio() writes utf-8 declared as utf-16)
+        root=etree.fromstring(re.sub(r"^\s*<\?xml[^>]*\?>","",text).encode("utf-8"))
+        type_converter={"0":"raw_material","1":"intermediate","2":"product"}
+
+        def parameters(element):
+            values={}
+            for par in element.iter("Parameter"):
+                try:
+                    value=float(par.get("Value"))
+                except (TypeError,ValueError):
+                    continue
+                if value!=-1:
+                    values[par.get("Name")]=value
+            return values
+
+        G=nx.DiGraph()
+        symbol={}
+        for mat in root.iterfind("Materials/Material"):
+            n="M"+mat.get("ID")
+            symbol[mat.get("ID")]=n
+            par=parameters(mat)
+            attr={"names":mat.get("Name"),"type":type_converter.get(mat.get("Type"),"intermediate")}
+            for key,name in (("price","price"),("reqflow","flow_rate_lower_bound"),("maxflow","flow_rate_upper_bound")):
+                if key in par:
+                    attr[name]=par[key]
+            G.add_node(n,**attr)
+        unit_names={}
+        for op in root.iterfind("OperatingUnits/OperatingUnit"):
+            n="O"+op.get("ID")
+            symbol[op.get("ID")]=n
+            unit_names[op.get("Name").replace(" ","_")]=n
+            par=parameters(op)
+            attr={"names":op.get("Name")}
+            for key,name in (("caplower","capacity_lower_bound"),("capupper","capacity_upper_bound")):
+                if key in par:
+                    attr[name]=par[key]
+            for keys,name in ((("investcostfix","opercostfix"),"fix_cost"),(("investcostprop","opercostprop"),"proportional_cost")):
+                if any(key in par for key in keys):
+                    attr[name]=sum(par.get(key,0) for key in keys)
+            G.add_node(n,**attr)
+        for edge in root.iterfind("Edges/Edge"):
+            u=symbol.get(edge.get("BeginID"))
+            v=symbol.get(edge.get("EndID"))
+            if u is not None and v is not None:
+                G.add_edge(u,v,weight=abs(float(edge.get("Rate"))))
+        ME=[]
+        for M in root.iterfind("MutualExclusions/MutualExclusion"):
+            ME.append([unit_names[x.text] for x in M.iterfind("OperatingUnits/OperatingUnit") if x.text in unit_names])
+        return Pgraph(G,mutual_exclusion=ME if ME else [[]],solver=solver,max_sol=max_sol)
         
-    def run(self,system=None,skip_wine=False, solver_name='pgraph_solver.exe',path=None):
+    def validate(self,raise_error=True,attributes=True):
         '''
-        run(system=None,skip_wine=False)
+        validate(raise_error=True,attributes=True)
+
+        Description
+        Checks the problem network and the mutual exclusions in one O(V+E) pass and reports every problem at once: node symbols not starting with
+        "M" or "O", unknown material types, non-numeric or inconsistent bounds, costs and prices, edges without a positive numeric weight or not
+        between a material and an operating unit, and mutual exclusions naming units that are not in the network. run() calls it first.
+
+        Arguments
+        raise_error: (boolean) Raise a ValueError listing all problems instead of returning them.
+        attributes: (boolean) Also report node attributes unknown to the solver input file.
+
+        Return
+        problems: (list) Description of every problem found, empty if the problem is valid.
+        '''
+        from .validate import validate
+        problems=validate(self.G,self.ME,attributes=attributes)
+        if problems and raise_error:
+            raise ValueError(str(len(problems))+" problem(s) in the P-graph:\n"+"\n".join(problems))
+        return problems
+
+    def run(self,system=None,skip_wine=False, solver_name='pgraph_solver.exe',path=None,time_limit=None,gap=None,native=False,incumbent=None,cutoff=None,server=None,workers=1,lazy=False,validate=True,beam_width=8):
+        '''
+        run(system=None,skip_wine=False,time_limit=None,gap=None,native=False,incumbent=None,cutoff=None,server=None,workers=1,lazy=False,validate=True,beam_width=8)
         
         Description
         Create input, solve problem and read solution.
+        If the run is stopped by time_limit or gap, all complete solutions found so far are kept and self.partial is set to True.
         
         Arguments
         system: (string) (optional) Operating system. Options of "Windows", "Linux". MacOS is not supported yet. Specifying this makes function slightly faster.
         skip_wine: (boolean) Only relevent for Linux. Skip the dependency "wine" if it is already installed. 
         solver_name= (string) For advanced users only. Choose your customized solver. 'pgraph_solver.exe' or 'pgraph_solver_new.exe'
         path = (string) path to the custom solver. If None, then the default library installation path will be used.
+        time_limit: (float)(optional) Maximum solving time in seconds.
+        gap: (float)(optional) Relative optimality gap at which the native solver stops, e.g. 0.01 for 1%. Requires native=True, a ValueError is raised otherwise.
+        native: (boolean) Use the built-in branch-and-bound (requires numpy and scipy) instead of the P-graph executable. Supports "SSGLP" and "INSIDEOUT",
+                and "MSG" through maximal_structure(). "MILP" and "HEURISTIC" always run natively.
+        incumbent: (list or int)(optional) Warm start for the native solver. Symbols of the operating units of a known structure, e.g. ["O1","O3"], or the index of a solution of the previous run.
+                   It prunes the search as a known solution and does not change the solutions found.
+        cutoff: (float)(optional) Upper cost bound for the native solver. Only structures not more expensive than cutoff are searched for.
+        server: (string)(optional) Unix socket of a running solver daemon (python -m Pgraph.server) that solves the problem instead of this process.
+        If None, the environment variable PGRAPH_SERVER is used when it is set. False always solves locally.
+        The daemon always uses its own solver executable, so system, solver_name and path do not apply.
+        workers: (int) Number of processes of the native branch-and-bound.
+        lazy: (boolean) Index the output of the P-graph executable and parse single solutions only when they are accessed (see read_solutions()).
+        validate: (boolean) Check the problem with validate() before anything is solved or sent, and raise a ValueError listing every problem found.
+        beam_width: (int) Beam width of the "HEURISTIC" solver (see solve_native()).
         '''
-        self.create_solver_input()
-        self.solve(system=system,skip_wine=skip_wine,solver_name=solver_name,path=path)
-        self.read_solutions()
+        if validate:
+            #Unknown attributes only break the input file of the executable
+            self.validate(attributes=not native and self.solver not in ["MILP","HEURISTIC"] and type(self.input_file)!=str)
+        if server is None:
+            server=os.environ.get("PGRAPH_SERVER")
+        if server:
+            from .server import submit
+            #The daemon always runs its own solver executable
+            options={"time_limit":time_limit,"gap":gap,"native":native,"incumbent":incumbent,"cutoff":cutoff,"workers":workers,"beam_width":beam_width}
+            self._set_results_dict(submit(self.to_dict(),options,address=server))
+            if len(self.goolist)==0:
+                print("No Feasible Solution Found!")
+            return
+        if native or self.solver in ["MILP","HEURISTIC"]:
+            self.solve_native(time_limit=time_limit,gap=gap,incumbent=incumbent,cutoff=cutoff,workers=workers,beam_width=beam_width)
+            return
+        if incumbent is not None or cutoff is not None or gap is not None:
+            raise ValueError("gap, incumbent and cutoff are only supported by the native solver. Use run(native=True).")
+        if type(self.input_file)!=str:
+            self.create_solver_input()
+        self.solve(system=system,skip_wine=skip_wine,solver_name=solver_name,path=path,time_limit=time_limit)
+        self.read_solutions(lazy=lazy)
         
     def get_info(self):
         '''
@@ -961,16 +1391,262 @@ class Pgraph():
         (2) (list) This returns total costs in a list arranged by solution number 
         '''
     
-        if self.solver in ["SSGLP","INSIDEOUT",2,3]:
+        if self.solver in COSTED_SOLVERS:
             OperatingUnit=[pd.DataFrame(x,columns=['Ratio','Names','Costs','Unit']).iloc[:,[1,0,2]] for x in self.goplist]
             Materials=[pd.DataFrame(x,columns=['Names','Costs','MoneyUnit','Flow','FlowUnit']).iloc[:,[0,3,1]] for x in self.gmatlist]
-            TotalCosts=pd.DataFrame(self.goolist,columns=["Total Costs"])
+            TotalCosts=pd.DataFrame(list(self.goolist),columns=["Total Costs"])
             TotalCosts.index.name='Solution Number'
         else:
             Materials=self.gmatlist
             OperatingUnit=self.goplist
             TotalCosts=self.goolist
         return Materials,OperatingUnit,TotalCosts
+    def _maximal_tracker(self):
+        '''
+        _maximal_tracker()
+
+        Description
+        MaximalStructure of the current network. It is rebuilt if the network was replaced or nodes were added or removed without the methods below.
+        (networkx counts edges in O(V), so only the number of nodes is compared.)
+        '''
+        from .maximal import MaximalStructure
+        M=self._maximal
+        if M is None or M.G is not self.G or self._maximal_size!=len(self.G):
+            M=self._maximal=MaximalStructure(self.G)
+            self._maximal_size=len(self.G)
+        return M
+
+    def _edited(self):
+        #The network no longer matches an input file given to the constructor
+        self.input_file=None
+        self._maximal_size=len(self.G)
+
+    def maximal_structure(self,rebuild=False):
+        '''
+        maximal_structure(rebuild=False)
+
+        Description
+        Computes the maximal structure (the union of all combinatorially feasible structures, as found by the "MSG" solver) without the P-graph executable.
+        The structure is kept and updated incrementally by add_material(), remove_material(), add_unit(), remove_unit(), add_edge() and remove_edge(),
+        which only visit the part of the network an edit changes. Direct edits of self.G are detected when they change the number of nodes.
+
+        Arguments
+        rebuild: (boolean) Recompute the structure from scratch, e.g. after editing edges or node types of self.G directly.
+
+        Return
+        units: (list) Symbols of the operating units of the maximal structure, empty if a product cannot be produced.
+        materials: (list) Symbols of its materials.
+        '''
+        if rebuild:
+            self._maximal=None
+        return self._maximal_tracker().structure()
+
+    def add_material(self,symbol,material_type="intermediate",**attributes):
+        '''
+        add_material(symbol,material_type="intermediate",**attributes)
+
+        Description
+        Adds a material to the problem network and updates the maximal structure.
+
+        Arguments
+        symbol: (string) Node symbol starting with "M".
+        material_type: (string) "raw_material", "intermediate" or "product".
+        attributes: Other node attributes, e.g. names, price, flow_rate_lower_bound, flow_rate_upper_bound.
+        '''
+        if symbol[0]!="M" or symbol in self.G:
+            raise ValueError("Material symbols must start with 'M' and be new, not "+str(symbol))
+        attributes.setdefault("names",symbol)
+        self._maximal_tracker().add_material(symbol,type=material_type,**attributes)
+        self._edited()
+
+    def remove_material(self,symbol):
+        '''
+        remove_material(symbol)
+
+        Description
+        Removes a material and its edges from the problem network and updates the maximal structure.
+        '''
+        self._maximal_tracker().remove_material(symbol)
+        self._edited()
+
+    def add_unit(self,symbol,inputs={},outputs={},**attributes):
+        '''
+        add_unit(symbol,inputs={},outputs={},**attributes)
+
+        Description
+        Adds an operating unit with its input and output edges to the problem network and updates the maximal structure.
+
+        Arguments
+        symbol: (string) Node symbol starting with "O".
+        inputs, outputs: (dict) Flow rate (edge weight) of every input and output material, e.g. {"M1":2}. The materials must exist.
+        attributes: Other node attributes, e.g. names, capacity_lower_bound, capacity_upper_bound, fix_cost, proportional_cost.
+
+        Example
+        P.add_unit("O9",inputs={"M1":1},outputs={"M4":0.8},fix_cost=1000,proportional_cost=2)
+        '''
+        if symbol[0]!="O" or symbol in self.G:
+            raise ValueError("Operating unit symbols must start with 'O' and be new, not "+str(symbol))
+        attributes.setdefault("names",symbol)
+        self._maximal_tracker().add_unit(symbol,inputs,outputs,**attributes)
+        self._edited()
+
+    def remove_unit(self,symbol):
+        '''
+        remove_unit(symbol)
+
+        Description
+        Removes an operating unit and its edges from the problem network and the mutual exclusions, and updates the maximal structure.
+        '''
+        self._maximal_tracker().remove_unit(symbol)
+        self.ME=[[x for x in M if x!=symbol] for M in self.ME]
+        self._edited()
+
+    def add_edge(self,u,v,weight=1):
+        '''
+        add_edge(u,v,weight=1)
+
+        Description
+        Adds an edge from a material to an operating unit (input) or from an operating unit to a material (output), or changes the weight of an
+        existing one, and updates the maximal structure.
+        '''
+        self._maximal_tracker().add_edge(u,v,weight)
+        self._edited()
+
+    def remove_edge(self,u,v):
+        '''
+        remove_edge(u,v)
+
+        Description
+        Removes an edge between a material and an operating unit and updates the maximal structure.
+        '''
+        self._maximal_tracker().remove_edge(u,v)
+        self._edited()
+
+    def structure_diagram(self):
+        '''
+        structure_diagram()
+
+        Description
+        Builds a zero-suppressed decision diagram (ZDD) of all combinatorially feasible structures (the structures of the "SSG" solver) respecting
+        the mutual exclusions, without the P-graph executable. The diagram gives the exact number of structures, membership tests, the number of
+        structures using every operating unit and uniform samples without enumerating the structures.
+
+        Example
+        Z=P.structure_diagram()
+        Z.count(), Z.contains(["O1","O3"]), Z.frequency(), Z.sample(10,seed=0), list(Z.structures(limit=5))
+
+        Return
+        diagram: (StructureDiagram) The diagram of the current network.
+        '''
+        from .zdd import StructureDiagram
+        return StructureDiagram(self.G,self.ME)
+
+    def sensitivity(self,sol_num=0):
+        '''
+        sensitivity(sol_num=0)
+
+        Description
+        LP sensitivity analysis of the structure of a solution: shadow prices of the material flow rate bounds, reduced costs of the operating units and the
+        ranges of prices, proportional costs and bounds over which they stay valid. Within a range the total cost changes linearly, by the flow per unit
+        change of a price (capacity per unit change of a proportional cost) and by the shadow price per unit change of a bound.
+        The optimal basis is recovered from the capacities of the solution (SSGLP, INSIDEOUT), so the LP is not solved again.
+
+        Arguments
+        sol_num: (int) Index of the solution.
+
+        Return
+        Materials: (DataFrame) Flow (net production, negative for raw materials), Price, Price low/high, Active bound, Shadow price, Bound low/high by material.
+        OperatingUnit: (DataFrame) Capacity, Proportional cost, Cost low/high, Active bound, Reduced cost, Bound low/high by operating unit.
+        '''
+        from .model import PNSModel
+        from .sensitivity import Sensitivity
+        import numpy as np
+
+        model=PNSModel(self.G,self.ME)
+        units=[model.unit_index[x] for x in self._solution_units(sol_num)]
+        x=None
+        if self.solver in COSTED_SOLVERS:
+            x=np.zeros(len(model.units))
+            for entry in self.goplist[sol_num]:
+                x[model.unit_index[entry[1]]]=float(entry[0])
+        S=Sensitivity(model,units,x)
+        names=nx.get_node_attributes(self.G,'names')
+        mats=[model.materials[i] for i in S.rows]
+        ops=[model.units[j] for j in S.cols]
+        Materials=pd.DataFrame({"Names":[names[n] for n in mats],"Flow":S.flow,"Price":model.price[S.rows],
+                                "Price low":S.price_range[:,0],"Price high":S.price_range[:,1],"Active bound":S.active_bound,
+                                "Shadow price":S.shadow_price,"Bound low":S.bound_range[:,0],"Bound high":S.bound_range[:,1]},index=pd.Index(mats,name="Material"))
+        OperatingUnit=pd.DataFrame({"Names":[names[n] for n in ops],"Capacity":S.capacity,"Proportional cost":model.prop_cost[S.cols],
+                                    "Cost low":S.cost_range[:,0],"Cost high":S.cost_range[:,1],"Active bound":S.unit_bound,
+                                    "Reduced cost":S.reduced_cost,"Bound low":S.unit_bound_range[:,0],"Bound high":S.unit_bound_range[:,1]},index=pd.Index(ops,name="Operating unit"))
+        return Materials,OperatingUnit
+
+    def evaluate_structures(self,structures,workers=1,chunk_size=64):
+        '''
+        evaluate_structures(structures,workers=1,chunk_size=64)
+
+        Description
+        Optimal operating cost of candidate structures, e.g. a shortlist from heuristics or previous runs, without running a solver over the
+        whole problem. Only the LP of every fixed structure is solved. The LPs are slices of one sparse model and are solved in chunks of
+        chunk_size by a single call each (see evaluate.py). Duplicated structures are solved once.
+
+        Arguments
+        structures: (list) Operating unit symbols of every candidate, e.g. [["O1","O3"],["O2"]].
+        workers: (int) Number of worker processes.
+        chunk_size: (int) Number of candidates per LP call.
+
+        Return
+        table: (DataFrame) One row per candidate with the column groups "Structure" (Operating units, Feasible, Total Costs), "Capacity" (by operating unit)
+               and "Flow" (net production by material, negative for raw materials). Costs are NaN for infeasible candidates, which select
+               mutually excluded units or cannot operate within the bounds.
+        '''
+        from .model import PNSModel
+        from .evaluate import evaluate_structures
+        import numpy as np
+
+        model=PNSModel(self.G,self.ME)
+        unknown=set(x for units in structures for x in units)-set(model.unit_index)
+        if unknown:
+            raise KeyError("Unknown operating units: "+", ".join(sorted(unknown)))
+        cost,x,feasible=evaluate_structures(model,[[model.unit_index[u] for u in units] for units in structures],workers=workers,chunk_size=chunk_size)
+        index=pd.RangeIndex(len(structures),name="Candidate")
+        summary=pd.DataFrame({"Operating units":[list(units) for units in structures],"Feasible":feasible,"Total Costs":cost},index=index)
+        capacity=pd.DataFrame(x,index=index,columns=model.units)
+        flow=pd.DataFrame((model.A@x.T).T if len(structures) else np.zeros((0,len(model.materials))),index=index,columns=model.materials)
+        return pd.concat([summary,capacity,flow],axis=1,keys=["Structure","Capacity","Flow"])
+
+    def milp_model(self,cutoff=None):
+        '''
+        milp_model(cutoff=None)
+
+        Description
+        Builds the mixed-integer linear program of the problem (capacities, unit on/off binaries, material balances and mutual exclusions) as
+        scipy.sparse matrices. It is the model the "MILP" solver passes to HiGHS.
+
+        Arguments
+        cutoff: (float)(optional) Upper bound on the total cost.
+
+        Return
+        model: (MILPModel) MILP with c, A, row_lo, row_hi, lb, ub, integrality and the names of its columns and rows.
+        '''
+        from .model import PNSModel
+        from .milp import MILPModel
+        return MILPModel(PNSModel(self.G,self.ME),cutoff=cutoff)
+
+    def export_milp(self,path,file_format=None):
+        '''
+        export_milp(path,file_format=None)
+
+        Description
+        Writes the MILP of the problem (see milp_model()) as an MPS or LP file for external MILP solvers.
+        Variables are named x_<unit> (capacity), y_<unit> (selected) and z_<material> (used, for conditional lower flow rate bounds).
+
+        Arguments
+        path: (string) Output file, e.g. "problem.mps" or "problem.lp".
+        file_format: (string)(optional) "mps" or "lp". Default from the extension of path.
+        '''
+        self.milp_model().write(path,file_format)
+
     def get_sol_num(self):
         '''
         get_sol_num()
@@ -983,7 +1659,460 @@ class Pgraph():
         '''
         num_sol=len(self.goolist)
         return num_sol
+
+    def to_dict(self):
+        '''
+        to_dict()
+
+        Description
+        Returns the problem as a dictionary of plain Python types that can be dumped to JSON and rebuilt with Pgraph.from_dict().
+
+        Return
+        problem: (dict) Keys "nodes" ([symbol, attributes] pairs), "edges" ([from, to, attributes] triples), "mutual_exclusion", "solver" and "max_sol".
+        '''
+        G=self.G
+        return {"nodes":[[n,dict(G.nodes[n])] for n in G.nodes()],
+                "edges":[[u,v,dict(d)] for u,v,d in G.edges(data=True)],
+                "mutual_exclusion":[list(M) for M in self.ME],
+                "solver":self.solver,
+                "max_sol":self.max_sol}
+
+    @staticmethod
+    def from_dict(problem):
+        '''
+        from_dict(problem)
+
+        Description
+        Builds a Pgraph object from a dictionary created by to_dict().
+
+        Arguments
+        problem: (dict) Problem dictionary.
+
+        Return
+        P: (Pgraph) Pgraph object of the problem.
+        '''
+        G=nx.DiGraph()
+        for n,attr in problem["nodes"]:
+            G.add_node(n,**attr)
+        for u,v,attr in problem["edges"]:
+            G.add_edge(u,v,**attr)
+        return Pgraph(G,mutual_exclusion=problem.get("mutual_exclusion",[[]]),solver=problem.get("solver","INSIDEOUT"),max_sol=problem.get("max_sol",100))
+
+    @staticmethod
+    def from_decision_tree(estimator,feature_names=None,class_names=None,solver="INSIDEOUT",max_sol=100):
+        '''
+        from_decision_tree(estimator,feature_names=None,class_names=None,solver="INSIDEOUT",max_sol=100)
+
+        Description
+        Builds a Pgraph object from a fitted scikit-learn decision tree (see builders.from_decision_tree()).
+
+        Arguments
+        estimator: (sklearn estimator) Fitted DecisionTreeClassifier or DecisionTreeRegressor.
+        feature_names: (list)(optional) Names of the features.
+        class_names: (list)(optional) Names of the classes.
+        solver, max_sol: As in Pgraph().
+
+        Return
+        P: (Pgraph) Pgraph object of the tree.
+        '''
+        from .builders import from_decision_tree
+        G,ME=from_decision_tree(estimator,feature_names=feature_names,class_names=class_names)
+        return Pgraph(G,mutual_exclusion=ME,solver=solver,max_sol=max_sol)
+
+    @staticmethod
+    def from_tree_ensemble(estimator,feature_names=None,class_names=None,solver="INSIDEOUT",max_sol=100):
+        '''
+        from_tree_ensemble(estimator,feature_names=None,class_names=None,solver="INSIDEOUT",max_sol=100)
+
+        Description
+        Builds a Pgraph object from a fitted scikit-learn tree ensemble such as RandomForestClassifier (see builders.from_tree_ensemble()).
+
+        Arguments
+        estimator: (sklearn estimator) Fitted tree ensemble.
+        feature_names: (list)(optional) Names of the features.
+        class_names: (list)(optional) Names of the classes.
+        solver, max_sol: As in Pgraph().
+
+        Return
+        P: (Pgraph) Pgraph object of the ensemble.
+        '''
+        from .builders import from_tree_ensemble
+        G,ME=from_tree_ensemble(estimator,feature_names=feature_names,class_names=class_names)
+        return Pgraph(G,mutual_exclusion=ME,solver=solver,max_sol=max_sol)
+
+    @staticmethod
+    def from_linear_model(estimator,feature_names=None,target=0,solver="SSG",max_sol=100,**kwargs):
+        '''
+        from_linear_model(estimator,feature_names=None,target=0,solver="SSG",max_sol=100,**kwargs)
+
+        Description
+        Builds a Pgraph object from a fitted linear model or its coefficients (see builders.from_linear_model()).
+
+        Arguments
+        estimator: (sklearn estimator or numpy array) Fitted linear model with coef_ (e.g. PLSRegression) or the coefficients.
+        feature_names: (list)(optional) Names of the features.
+        target: (int) Target used for multi-output models.
+        solver, max_sol: As in Pgraph().
+        kwargs: Bounds and price of builders.from_linear_model().
+
+        Return
+        P: (Pgraph) Pgraph object of the model.
+        '''
+        from .builders import from_linear_model
+        G,ME=from_linear_model(estimator,feature_names=feature_names,target=target,**kwargs)
+        return Pgraph(G,mutual_exclusion=ME,solver=solver,max_sol=max_sol)
+
+    def expand_periods(self,periods,weights=None,overrides=None,storage=None,shared_structure=True):
+        '''
+        expand_periods(periods,weights=None,overrides=None,storage=None,shared_structure=True)
+
+        Description
+        Replicates the problem over periods or scenarios (see multiperiod.MultiPeriod). Solve the expanded problem with expanded.problem.run() and
+        get the results per period with expanded.values(sol_num) and the shared structure with expanded.structure(sol_num).
+
+        Arguments
+        periods: (int or list) Number of periods or their names.
+        weights: (list)(optional) Weight of every period (duration or scenario probability) applied to prices and proportional costs.
+        overrides: (dict)(optional) Node attributes per period, {symbol: {attribute: value or list with one value per period}}.
+        storage: (dict or list)(optional) Materials that can be stored from one period to the next, {material: {storage unit attributes}}.
+        shared_structure: (boolean) Whether all periods share one structure with the fixed costs paid once.
+
+        Return
+        expanded: (MultiPeriod) Expanded problem and its mapping to this problem.
+        '''
+        from .multiperiod import MultiPeriod
+        return MultiPeriod(self,periods,weights=weights,overrides=overrides,storage=storage,shared_structure=shared_structure)
+
+    def pack(self,results=True):
+        '''
+        pack(results=True)
+
+        Description
+        Packs the problem and, if results is True, the solutions into one compact buffer of flat arrays (see Pgraph.packed).
+        The buffer can be sent to other processes, cached, or put in shared memory with packed.to_shared_memory(), and is read back with Pgraph.unpack().
+        Send the buffer instead of the object where pickling the networkx graph and the result lists is too slow. Pickling and copying a Pgraph
+        object keep every attribute as it is.
+
+        Return
+        buffer: (bytes) Packed problem.
+        '''
+        from .packed import pack
+        return pack(self,results)
+
+    @staticmethod
+    def unpack(buffer,lazy=False):
+        '''
+        unpack(buffer,lazy=False)
+
+        Description
+        Rebuilds a Pgraph object from a buffer created by pack().
+
+        Arguments
+        buffer: (bytes) Packed problem.
+        lazy: (boolean) Build the result lists of a solution only when it is accessed (the buffer is kept).
+
+        Return
+        P: (Pgraph) Pgraph object.
+        '''
+        from .packed import unpack
+        return unpack(buffer,lazy)
+
+    def _results_dict(self):
+        '''
+        _results_dict()
+
+        Description
+        Returns the solutions and run status as a dictionary of plain Python types.
+        '''
+        return {"gmatlist":list(self.gmatlist),"goplist":list(self.goplist),"goolist":list(self.goolist),
+                "partial":self.partial,"lower_bound":self.lower_bound,"gap":self.gap}
+
+    def _set_results_dict(self,results):
+        '''
+        _set_results_dict(results)
+
+        Description
+        Sets the solutions and run status from a dictionary created by _results_dict().
+        '''
+        self.gmatlist=results["gmatlist"]
+        self.goplist=results["goplist"]
+        self.goolist=results["goolist"]
+        self.partial=results.get("partial",False)
+        self.lower_bound=results.get("lower_bound")
+        self.gap=results.get("gap")
+        self._encode_structures()
+
+    def _solution_units(self,sol_num):
+        '''
+        _solution_units(sol_num)
+
+        Description
+        Symbols of the operating units of a solution for every solver type.
+        '''
+        if self.solver in COSTED_SOLVERS:
+            return [x[1] for x in self.goplist[sol_num]]
+        return [x for x in self.goplist[sol_num] if x!=""]
+
+    def _encode_structures(self):
+        '''
+        _encode_structures()
+
+        Description
+        Stores the operating units of every solution as a row of 64-bit words in self.structures (bit i is the i-th operating unit of the graph).
+        '''
+        from . import bitset
+
+        units=[n for n in self.G.nodes() if n[0]=="O"]
+        index={n:i for i,n in enumerate(units)}
+        self.structure_units=units
+        self.structures=bitset.encode_many([[index[x] for x in self._solution_units(i) if x in index] for i in range(len(self.goolist))],len(units))
+
+    def _get_structures(self):
+        '''
+        Bitset matrix of the solutions, encoded on first use after a lazy read_solutions().
+        '''
+        if self.structures is None:
+            self._encode_structures()
+        return self.structures
+
+    def _structure_index(self,units):
+        from . import bitset
+
+        index={n:i for i,n in enumerate(self.structure_units)}
+        return bitset.encode([index[x] for x in units],len(self.structure_units))
+
+    def solutions_using(self,unit):
+        '''
+        solutions_using(unit)
+
+        Description
+        Finds all solutions that contain an operating unit.
+
+        Arguments
+        unit: (string) Symbol of the operating unit, e.g. "O1".
+
+        Return
+        sol_nums: (numpy array) Indices of the solutions using the unit.
+        '''
+        from . import bitset
+        import numpy as np
+
+        structures=self._get_structures()
+        if unit not in self.structure_units:
+            return np.zeros(0,dtype=np.int64)
+        return np.flatnonzero(bitset.contains(structures,self.structure_units.index(unit)))
+
+    def find_structure(self,units):
+        '''
+        find_structure(units)
+
+        Description
+        Finds the solutions whose operating units are exactly the given set.
+
+        Arguments
+        units: (list) Symbols of operating units, e.g. ["O1","O3"].
+
+        Return
+        sol_nums: (numpy array) Indices of the matching solutions (empty if the structure is not among the solutions).
+        '''
+        from . import bitset
+        import numpy as np
+
+        structures=self._get_structures()
+        if any(x not in self.structure_units for x in units):
+            return np.zeros(0,dtype=np.int64)
+        return np.flatnonzero(bitset.equal_rows(structures,self._structure_index(units)))
+
+    def unique_solutions(self):
+        '''
+        unique_solutions()
+
+        Description
+        Indices of the first solution of every distinct operating unit structure.
+        '''
+        from . import bitset
+
+        return bitset.unique_rows(self._get_structures())
+
+    def compare_solutions(self,sol_a,sol_b):
+        '''
+        compare_solutions(sol_a,sol_b)
+
+        Description
+        Compares the operating units of two solutions.
+
+        Arguments
+        sol_a, sol_b: (int) Indices of the solutions.
+
+        Return
+        diff: (dict) "common", "only_a" and "only_b" lists of operating unit symbols.
+        '''
+        from . import bitset
+
+        structures=self._get_structures()
+        a=structures[sol_a]
+        b=structures[sol_b]
+        names=lambda words:[self.structure_units[i] for i in bitset.decode(words)]
+        return {"common":names(a&b),"only_a":names(a&~b),"only_b":names(b&~a)}
+
+    def _results_to_columns(self):
+        '''
+        _results_to_columns()
+
+        Description
+        Flattens gmatlist, goplist and goolist into equally long columns with one row per material, operating unit and total cost of every solution.
+
+        Return
+        columns: (dict) Column name to list of values. Keys are "solution", "kind", "name", "value" and "cost".
+        '''
+        solution=[]
+        kind=[]
+        name=[]
+        value=[]
+        cost=[]
+        has_values=self.solver in COSTED_SOLVERS
+        for i in range(len(self.goolist)):
+            solution.append(i)
+            kind.append("total")
+            name.append(None if has_values else self.goolist[i]) #SSG/MSG keep the structure number here
+            value.append(None)
+            cost.append(float(self.goolist[i]) if has_values else None)
+            for x in self.gmatlist[i]:
+                solution.append(i)
+                kind.append("material")
+                if has_values:
+                    name.append(x[0])
+                    value.append(float(x[3]))
+                    cost.append(float(x[1]))
+                else:
+                    name.append(x)
+                    value.append(None)
+                    cost.append(None)
+            for x in self.goplist[i]:
+                solution.append(i)
+                kind.append("unit")
+                if has_values:
+                    name.append(x[1])
+                    value.append(float(x[0]))
+                    cost.append(float(x[2]))
+                else:
+                    name.append(x)
+                    value.append(None)
+                    cost.append(None)
+        return {"solution":solution,"kind":kind,"name":name,"value":value,"cost":cost}
+
+    def save_results(self,path,file_format=None):
+        '''
+        save_results(path,file_format=None)
+
+        Description
+        Saves the parsed solutions in a columnar file (one row per material, operating unit and total cost of each solution).
+        The default Arrow IPC (Feather v2) file is written uncompressed so that it can be memory-mapped and read column by column with load_results().
+        Requires the optional dependency pyarrow.
+
+        Arguments
+        path: (string) Path of the output file.
+        file_format: (string)(optional) "arrow" or "parquet". If None, ".parquet" file endings give Parquet and all others give Arrow IPC.
+
+        Return
+        path: (string) Path of the written file.
+        '''
+        import pyarrow as pa
+
+        if file_format==None:
+            file_format="parquet" if path.endswith(".parquet") else "arrow"
+        columns=self._results_to_columns()
+        schema=pa.schema([
+            ("solution",pa.int32()),
+            ("kind",pa.dictionary(pa.int8(),pa.string())),
+            ("name",pa.dictionary(pa.int32(),pa.string())),
+            ("value",pa.float64()),
+            ("cost",pa.float64()),
+            ],metadata={"solver":str(self.solver),"max_sol":str(self.max_sol),"num_sol":str(len(self.goolist))})
+        table=pa.Table.from_pydict(columns,schema=schema)
+        if file_format=="parquet":
+            import pyarrow.parquet as pq
+            pq.write_table(table,path)
+        elif file_format=="arrow":
+            with pa.OSFile(path,"wb") as sink:
+                with pa.ipc.new_file(sink,table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            raise ValueError("Unknown file_format "+str(file_format)+". Options are 'arrow' or 'parquet'.")
+        return path
+
+    @staticmethod
+    def load_results(path,columns=None,memory_map=True):
+        '''
+        load_results(path,columns=None,memory_map=True)
+
+        Description
+        Opens a file written by save_results(). Arrow IPC files are memory-mapped, so opening is instant and only the selected columns are paged in.
+        Parquet files only decode the selected columns. Requires the optional dependency pyarrow.
+
+        Arguments
+        path: (string) Path of the results file.
+        columns: (list)(optional) Names of the columns to read, e.g. ["solution","cost"]. Default reads all columns.
+        memory_map: (boolean) Memory-map Arrow IPC files instead of reading them into memory.
+
+        Return
+        table: (pyarrow.Table) Table with columns "solution", "kind", "name", "value" and "cost". Solver information is kept in table.schema.metadata.
+        '''
+        import pyarrow as pa
+
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            return pq.read_table(path,columns=columns,memory_map=memory_map)
+        if memory_map:
+            source=pa.memory_map(path,"r")
+        else:
+            source=pa.OSFile(path,"rb")
+        table=pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table=table.select(columns)
+        return table
+
+    def load_solutions(self,path):
+        '''
+        load_solutions(path)
+
+        Description
+        Loads the solutions of a file written by save_results() back into this object, so that plot_solution(), get_info() and to_studio() work as after run().
+
+        Arguments
+        path: (string) Path of the results file.
+        '''
+        table=Pgraph.load_results(path)
+        meta={k.decode():v.decode() for k,v in table.schema.metadata.items()}
+        num_sol=int(meta["num_sol"])
+        #The solver decides the format of the result lists, so it is taken from the file (numeric solver codes are stored as text)
+        self.solver=int(meta["solver"]) if meta["solver"].isdigit() else meta["solver"]
+        has_values=self.solver in COSTED_SOLVERS
+        gmatlist=[[] for i in range(num_sol)]
+        goplist=[[] for i in range(num_sol)]
+        goolist=["0"]*num_sol
+        fmt=lambda x:"%.15g" % x
+        columns=table.to_pydict()
+        for i,kind,name,value,cost in zip(columns["solution"],columns["kind"],columns["name"],columns["value"],columns["cost"]):
+            if kind=="total":
+                goolist[i]=fmt(cost) if has_values else name
+            elif kind=="material":
+                if has_values:
+                    gmatlist[i].append([name,fmt(cost),"USD/y",fmt(value),"t/y"])
+                else:
+                    gmatlist[i].append(name)
+            elif kind=="unit":
+                if has_values:
+                    goplist[i].append([fmt(value),name,fmt(cost),"USD/y"])
+                else:
+                    goplist[i].append(name)
+        self.gmatlist=gmatlist
+        self.goplist=goplist
+        self.goolist=goolist
+        self._encode_structures()
+
 if __name__=="__main__":
+    import matplotlib.pyplot as plt
     
     ##TEST1########################################
     ### Prepare Network Structure #############
@@ -0,0 +1,455 @@
+import bisect
+import heapq
+import time
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import linprog
+from . import bitset
+
+FREE=-1
+OUT=0
+IN=1
+TOL=1e-9
+MIN_CAPACITY=1e-6 #selected units must run, otherwise a cheaper structure without them exists
+
+def lp_data(model, state):
+    '''
+    lp_data(model, state)
+
+    Description
+    LP of a node of the branch-and-bound tree without the mutual exclusion rows: minimize c@x+constant subject to p_lo <= A@x <= p_hi and lb <= x <= ub.
+    Units fixed IN pay their fixed cost, units fixed OUT are removed and FREE units pay fix_cost/cap_ub per unit capacity.
+
+    Return
+    lp: (dict) cols (unit indices of x), rows (material indices of A), A (csr), c, constant, lb, ub, p_lo, p_hi.
+        None if a required product has no active producer.
+    '''
+    free=state==FREE
+    sel=state==IN
+    active=~(state==OUT)
+    cols=np.flatnonzero(active)
+    A=model.A[:,cols]
+    c=model.prop_cost[cols]-model.price@A
+    c=c+np.where(free[cols],model.fix_cost[cols]/np.maximum(model.cap_ub[cols],TOL),0.0)
+    constant=model.fix_cost[sel].sum()
+    lb=np.where(sel[cols],np.maximum(model.cap_lb[cols],MIN_CAPACITY),0.0)
+    ub=model.cap_ub[cols]
+
+    #Lower bounds of raw materials and intermediates only count once the material belongs to the structure
+    in_structure=(model.touch[:,sel].sum(axis=1).A1>0)|(model.mat_type==2)
+    touched=model.touch[:,cols].sum(axis=1).A1>0
+    if ((model.mat_type==2)&(model.mat_lb>0)&~touched).any():
+        return None
+    rows=np.flatnonzero(touched)
+    A=A.tocsr()[rows]
+    raw=model.mat_type[rows]==0
+    mlb=np.where(in_structure[rows],model.mat_lb[rows],0.0)
+    p_lo=np.where(raw,-model.mat_ub[rows],mlb)
+    p_hi=np.where(raw,-mlb,model.mat_ub[rows])
+    return {"cols":cols,"rows":rows,"A":A,"c":c,"constant":constant,"lb":lb,"ub":ub,"p_lo":p_lo,"p_hi":p_hi}
+
+def solve_lp(model, state, method="highs"):
+    '''
+    solve_lp(model, state, method="highs")
+
+    Description
+    Solves the LP relaxation of a node of the branch-and-bound tree (see lp_data()).
+    When no unit is FREE the LP is exact and gives the optimal cost of the structure.
+
+    Arguments
+    model: (PNSModel) Problem in array form.
+    state: (numpy array) FREE, OUT or IN for every operating unit.
+    method: (string) Method of scipy.optimize.linprog.
+
+    Return
+    cost: (float) Optimal objective value, or None if the LP is infeasible.
+    x: (numpy array) Optimal capacities of all operating units, or None if the LP is infeasible.
+    '''
+    nu=len(model.units)
+    free=state==FREE
+    x=np.zeros(nu)
+    if nu==0 or (state==OUT).all():
+        if (model.mat_lb[model.mat_type==2]>0).any():
+            return None,None
+        return 0.0,x
+
+    lp=lp_data(model,state)
+    if lp is None:
+        return None,None
+    cols=lp["cols"]
+    A=lp["A"]
+    A_ub=[A,-A]
+    b_ub=[lp["p_hi"],-lp["p_lo"]]
+    me_rows=[]
+    pos={u:i for i,u in enumerate(cols)}
+    for group in model.me:
+        if (state[group]==IN).any():
+            continue
+        members=[u for u in group if free[u]]
+        if len(members)>1:
+            me_rows.append(members)
+    if me_rows:
+        r=[]
+        cc=[]
+        v=[]
+        for i,members in enumerate(me_rows):
+            for u in members:
+                r.append(i)
+                cc.append(pos[u])
+                v.append(1.0/max(model.cap_ub[u],TOL))
+        A_ub.append(sp.csr_matrix((v,(r,cc)),shape=(len(me_rows),len(cols))))
+        b_ub.append(np.ones(len(me_rows)))
+    res=linprog(lp["c"],A_ub=sp.vstack(A_ub,format="csr"),b_ub=np.concatenate(b_ub),bounds=np.column_stack([lp["lb"],lp["ub"]]),method=method)
+    if res.status!=0:
+        return None,None
+    x[cols]=res.x
+    return float(res.fun+lp["constant"]),x
+
+class ABBResult():
+    def __init__(self):
+        '''
+        ABBResult()
+
+        Description
+        Outcome of solve_abb().
+
+        Attributes
+        solutions: (list) (cost, units, x) tuples sorted by cost, where units is a sorted tuple of operating unit indices and x the capacities.
+        partial: (boolean) True if the search was stopped by the time limit or the gap before the tree was exhausted.
+        lower_bound: (float) Lower bound on the cost of any structure not proven to be worse than the reported ones.
+        gap: (float) Relative gap between the best solution and lower_bound. None if no solution was found.
+        nodes: (int) Number of LP relaxations solved.
+        '''
+        self.solutions=[]
+        self.partial=False
+        self.lower_bound=-np.inf
+        self.gap=None
+        self.nodes=0
+
+def _relative_gap(best, lower):
+    return max(best-lower,0.0)/max(abs(best),TOL)
+
+def _maximal_units(model):
+    '''
+    Boolean mask of the operating units of the maximal structure, computed on the arrays with the two steps of maximal.MaximalStructure.
+    '''
+    produces=(model.A>0).astype(np.int8)
+    raw=model.mat_type==0
+    alive=~(produces[raw].sum(axis=0).A1>0)
+    while True:
+        available=raw|(produces@alive.astype(np.int8)>0)
+        dead=alive&(model.consumes[~available].sum(axis=0).A1>0)
+        if not dead.any():
+            break
+        alive&=~dead
+    if not available[model.mat_type==2].all():
+        return np.zeros(len(alive),dtype=bool)
+    produces=produces.T.tocsr()
+    needed=model.mat_type==2
+    selected=np.zeros(len(alive),dtype=bool)
+    while True:
+        added=alive&~selected&(produces@needed.astype(np.int8)>0)
+        if not added.any():
+            return selected
+        selected|=added
+        needed|=(model.consumes@selected.astype(np.int8)>0)&~raw
+
+def _root(model):
+    '''
+    Root state of the tree: the units outside the maximal structure (e.g. producers of raw materials) are OUT, the others FREE.
+    '''
+    return np.where(_maximal_units(model),FREE,OUT).astype(np.int8)
+
+def _supported(model, selected):
+    '''
+    Units of selected (boolean mask) that the branch-and-bound tree can reach: producers of a product or of an input (not a raw material)
+    of a unit already reached. A structure is minimal if all its units are supported.
+    '''
+    produces=(model.A>0).astype(np.int8).T.tocsr()
+    needed=(model.mat_type==2)&(model.mat_lb>0)
+    keep=np.zeros(len(selected),dtype=bool)
+    while True:
+        added=selected&~keep&(produces@needed.astype(np.int8)>0)
+        if not added.any():
+            return keep
+        keep|=added
+        needed|=(model.consumes@keep.astype(np.int8)>0)&(model.mat_type!=0)
+
+def _warm_start(model, incumbent):
+    '''
+    Evaluates an incumbent structure without its unsupported units (units outside the tree, e.g. producers of raw materials, could make it
+    cheaper than every structure). Returns (cost, state, x) of the incumbent, to be recorded as a known solution, or None if it is infeasible.
+    '''
+    selected=np.zeros(len(model.units),dtype=bool)
+    selected[list(incumbent)]=True
+    warm=np.where(_supported(model,selected&_maximal_units(model)),IN,OUT).astype(np.int8)
+    cost,x=solve_lp(model,warm)
+    if cost is None:
+        return None
+    return cost,warm,x
+
+def _branch_unit(model, state, x):
+    '''
+    _branch_unit(model, state, x)
+
+    Description
+    Picks the next operating unit to decide. Only producers of materials required by the partial structure (products and inputs of
+    selected units) are branched on, so the leaves are the combinatorially feasible structures. Materials without a selected producer go first.
+
+    Return
+    u: (int) Index of the unit, None if the node is a leaf, or -1 if a required material can no longer be produced.
+    '''
+    sel=(state==IN).astype(np.int8)
+    needed=((model.mat_type==2)&(model.mat_lb>0))|((model.consumes@sel>0)&(model.mat_type!=0))
+    best=None
+    for m in np.flatnonzero(needed):
+        producers=model.producers[m]
+        unsatisfied=not (state[producers]==IN).any()
+        undecided=producers[state[producers]==FREE]
+        if len(undecided)==0:
+            if unsatisfied:
+                return -1
+            continue
+        if best is None or (unsatisfied and not best[0]):
+            best=(unsatisfied,undecided)
+            if unsatisfied:
+                break
+    if best is None:
+        return None
+    undecided=best[1]
+    return undecided[np.argmax(x[undecided]/np.maximum(model.cap_ub[undecided],TOL))]
+
+class _Search():
+    def __init__(self, model, max_sol, gap=None, cutoff=None, shared=None, known=()):
+        '''
+        Best-first search state used by the serial solver and the parallel workers.
+        shared is an optional multiprocessing.Array with the max_sol cheapest costs found by all workers, so that they prune with each other's solutions.
+        known are structures already counted in shared.
+        '''
+        self.model=model
+        self.max_sol=max_sol
+        self.gap=gap
+        self.limit=np.inf if cutoff is None else cutoff+TOL*max(abs(cutoff),1)
+        self.shared=shared
+        self.shared_costs=None if shared is None else np.frombuffer(shared.get_obj())
+        self.known=set(known)
+        self.found={}
+        self.ranked=[]
+        self.heap=[]
+        self.counter=0
+        self.nodes=0
+        nu=len(model.units)
+        self.partners=[bitset.decode(bitset.from_int(c,nu)) for c in model.conflicts]
+
+    def threshold(self):
+        t=self.limit
+        if len(self.ranked)>=self.max_sol:
+            t=min(t,self.ranked[self.max_sol-1][0])
+        if self.shared is not None:
+            t=min(t,self.shared_costs[-1])
+        return t
+
+    def best(self):
+        b=self.ranked[0][0] if self.ranked else np.inf
+        if self.shared is not None:
+            b=min(b,self.shared_costs[0])
+        return b
+
+    def prunable(self, bound):
+        #Ties are kept so that the reported structures do not depend on the search order
+        t=self.threshold()
+        return bound>t+TOL*max(abs(t),1)
+
+    def record(self, cost, state, x):
+        sel=state==IN
+        if (x[sel]<=TOL).any() or cost>self.limit:
+            return #a cheaper structure without the idle unit exists
+        key=bitset.from_mask(sel)
+        if key in self.found or bitset.violates(key,self.model.me_masks):
+            return
+        self.found[key]=(cost,key,x)
+        bisect.insort(self.ranked,(cost,key))
+        if self.shared is not None and key not in self.known:
+            with self.shared.get_lock():
+                costs=self.shared_costs
+                if cost<costs[-1]:
+                    i=np.searchsorted(costs,cost)
+                    costs[i+1:]=costs[i:-1].copy()
+                    costs[i]=cost
+
+    def expand(self, state):
+        self.nodes+=1
+        cost,x=solve_lp(self.model,state)
+        if cost is None:
+            return None
+        free=state==FREE
+        if not (x[free]>TOL).any():
+            #Relaxation is integral: the structure of fixed units is a solution
+            self.record(cost,state,x)
+        u=_branch_unit(self.model,state,x)
+        if u==-1:
+            return None
+        if u is None:
+            if free.any():
+                leaf=np.where(free,OUT,state).astype(np.int8)
+                self.nodes+=1
+                cost,x=solve_lp(self.model,leaf)
+                if cost is not None:
+                    self.record(cost,leaf,x)
+            return None
+        return cost,u,x
+
+    def push(self, state):
+        node=self.expand(state)
+        if node is not None and not self.prunable(node[0]):
+            self.counter+=1
+            heapq.heappush(self.heap,(node[0],self.counter,state,node[1]))
+
+    def search(self, deadline=None, max_open=None):
+        '''
+        Runs the best-first search. Returns "done" when the tree is exhausted, "gap" or "time" when stopped early and
+        "split" when max_open open nodes are waiting to be handed to workers.
+        '''
+        while self.heap:
+            lower=self.heap[0][0]
+            if self.prunable(lower):
+                self.heap=[]
+                break
+            if self.gap is not None and _relative_gap(self.best(),lower)<=self.gap:
+                return "gap"
+            if deadline is not None and time.time()>deadline:
+                return "time"
+            if max_open is not None and len(self.heap)>=max_open:
+                return "split"
+            bound,_,state,u=heapq.heappop(self.heap)
+            child_in=state.copy()
+            child_in[u]=IN
+            child_in[self.partners[u]]=OUT
+            child_out=state.copy()
+            child_out[u]=OUT
+            self.push(child_in)
+            self.push(child_out)
+        return "done"
+
+    def lower_bound(self):
+        return self.heap[0][0] if self.heap else np.inf
+
+    def candidates(self):
+        '''
+        The max_sol cheapest solutions found, including ties with the last one.
+        '''
+        if len(self.ranked)<=self.max_sol:
+            return [self.found[key] for cost,key in self.ranked]
+        last=self.ranked[self.max_sol-1][0]+TOL*max(abs(self.ranked[self.max_sol-1][0]),1)
+        return [self.found[key] for cost,key in self.ranked if cost<=last]
+
+_worker_model=None
+_worker_shared=None
+_worker_known=()
+
+def _init_worker(model, shared, known):
+    global _worker_model,_worker_shared,_worker_known
+    _worker_model=model
+    _worker_shared=shared
+    _worker_known=known
+
+def _solve_subtree(bound, state, u, max_sol, gap, cutoff, deadline):
+    '''
+    Explores one subtree in a worker process with the incumbent bound shared between all workers.
+    '''
+    search=_Search(_worker_model,max_sol,gap=gap,cutoff=cutoff,shared=_worker_shared,known=_worker_known)
+    search.heap=[(bound,0,state,u)]
+    status=search.search(deadline=deadline)
+    return search.candidates(),status,search.lower_bound(),search.nodes
+
+def solve_abb(model, max_sol=100, time_limit=None, gap=None, incumbent=None, cutoff=None, workers=1):
+    '''
+    solve_abb(model, max_sol=100, time_limit=None, gap=None, incumbent=None, cutoff=None, workers=1)
+
+    Description
+    Native accelerated branch-and-bound over operating unit decisions. Returns the max_sol cheapest solution structures, in which every
+    selected operating unit runs at positive capacity and at most one unit of every mutually exclusive set is selected.
+    Operating units outside the maximal structure (e.g. producers of raw materials) are never selected, as in the "MSG" solver.
+    The search is best-first on the LP bound and can be stopped early; complete solutions found so far are then returned.
+    With several workers the first levels of the tree are explored here and the open subtrees are solved in worker processes
+    that share the incumbent bound. The reported structures do not depend on the number of workers unless the search is stopped early.
+
+    Arguments
+    model: (PNSModel) Problem in array form.
+    max_sol: (int) Maximum number of solutions.
+    time_limit: (float)(optional) Wall clock budget in seconds.
+    gap: (float)(optional) Stop once the best solution is proven to be within this relative gap of the optimum, e.g. 0.01 for 1%.
+    incumbent: (list)(optional) Indices of the operating units of a known structure. It is evaluated before the search and recorded as a solution,
+               so its cost prunes the tree as soon as max_sol structures are known (from the root on if max_sol=1). The solutions are the same as without it.
+               Units the tree cannot reach (see _supported()) are dropped from it first.
+    cutoff: (float)(optional) Upper bound on the cost. Nodes and structures that cannot beat it are pruned.
+    workers: (int) Number of worker processes.
+
+    Return
+    result: (ABBResult) Solutions and search status.
+    '''
+    deadline=None if time_limit is None else time.time()+time_limit
+    result=ABBResult()
+    nu=len(model.units)
+    search=_Search(model,max_sol,gap=gap,cutoff=cutoff)
+    if incumbent is not None:
+        search.nodes+=1
+        warm=_warm_start(model,incumbent)
+        if warm is not None:
+            search.record(*warm)
+
+    search.push(_root(model))
+    status=search.search(deadline=deadline,max_open=4*workers if workers>1 else None)
+    candidates=search.candidates()
+    lower=search.lower_bound()
+    nodes=search.nodes
+    if status=="split":
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        shared=multiprocessing.Array("d",max_sol)
+        costs=np.full(max_sol,np.inf)
+        found=[cost for cost,key in search.ranked[:max_sol]]
+        costs[:len(found)]=found
+        shared[:]=costs.tolist()
+        lower=np.inf
+        status="done"
+        with ProcessPoolExecutor(max_workers=workers,initializer=_init_worker,initargs=(model,shared,set(search.found))) as pool:
+            futures=[pool.submit(_solve_subtree,bound,state,u,max_sol,gap,cutoff,deadline) for bound,_,state,u in sorted(search.heap,key=lambda n:(n[0],n[1]))]
+            for f in futures:
+                sub_candidates,sub_status,sub_lower,sub_nodes=f.result()
+                candidates.extend(sub_candidates)
+                nodes+=sub_nodes
+                lower=min(lower,sub_lower)
+                if sub_status!="done":
+                    status=sub_status
+    result.partial=status in ["gap","time"]
+    result.nodes=nodes
+
+    #Re-evaluate the final structures on their own so that costs do not depend on where in the tree they were found
+    merged={}
+    for cost,key,x in sorted(candidates,key=lambda s:(s[0],s[1])):
+        if key not in merged:
+            merged[key]=(cost,key,x)
+    ranked=sorted(merged.values(),key=lambda s:(s[0],s[1]))
+    if len(ranked)>max_sol:
+        last=ranked[max_sol-1][0]
+        ranked=[s for s in ranked if s[0]<=last+TOL*max(abs(last),1)]
+    solutions=[]
+    for cost,key,x in ranked:
+        units=bitset.decode(bitset.from_int(key,nu))
+        leaf=np.full(nu,OUT,dtype=np.int8)
+        leaf[units]=IN
+        exact,x=solve_lp(model,leaf)
+        solutions.append((exact if exact is not None else cost,key,tuple(units.tolist()),x if x is not None else merged[key][2]))
+    solutions=sorted(solutions,key=lambda s:(s[0],s[1]))[:max_sol]
+    result.solutions=[(cost,units,x) for cost,key,units,x in solutions]
+
+    if result.solutions:
+        if not result.partial:
+            lower=result.solutions[0][0]
+        result.lower_bound=min(lower,result.solutions[-1][0] if len(result.solutions)==max_sol else lower)
+        result.gap=_relative_gap(result.solutions[0][0],min(result.lower_bound,result.solutions[0][0]))
+    else:
+        result.lower_bound=lower
+    return result
@@ -0,0 +1,127 @@
+'''
+Bitset encoding of operating unit sets.
+
+A structure is stored as a row of 64-bit words in which bit i is set if the i-th operating unit (graph order) is selected.
+A set of solutions is a (number of solutions, number of words) uint64 matrix, so that membership, deduplication, differences and
+"which structures use unit X" are word-level numpy operations. Single structures can also be handled as Python integers.
+'''
+import numpy as np
+
+WORD=64
+
+def n_words(n_bits):
+    '''
+    Number of 64-bit words needed for n_bits units.
+    '''
+    return max(1,(n_bits+WORD-1)//WORD)
+
+def encode(indices, n_bits):
+    '''
+    encode(indices, n_bits)
+
+    Description
+    Encodes one set of unit indices.
+
+    Return
+    words: (numpy array) uint64 words of the set.
+    '''
+    return encode_many([indices],n_bits)[0]
+
+def encode_many(index_lists, n_bits):
+    '''
+    encode_many(index_lists, n_bits)
+
+    Description
+    Encodes many sets of unit indices in one vectorized pass.
+
+    Arguments
+    index_lists: (list of list) Unit indices of every structure.
+    n_bits: (int) Number of operating units.
+
+    Return
+    matrix: (numpy array) (len(index_lists), n_words(n_bits)) uint64 matrix.
+    '''
+    matrix=np.zeros((len(index_lists),n_words(n_bits)),dtype=np.uint64)
+    lengths=[len(x) for x in index_lists]
+    if sum(lengths)==0:
+        return matrix
+    rows=np.repeat(np.arange(len(index_lists)),lengths)
+    cols=np.concatenate([np.asarray(x,dtype=np.int64) for x in index_lists if len(x)>0])
+    np.bitwise_or.at(matrix,(rows,cols//WORD),np.left_shift(np.uint64(1),(cols%WORD).astype(np.uint64)))
+    return matrix
+
+def decode(words):
+    '''
+    decode(words)
+
+    Description
+    Returns the sorted unit indices of one encoded structure.
+    '''
+    bits=np.unpackbits(np.ascontiguousarray(words,dtype="<u8").view(np.uint8),bitorder="little")
+    return np.flatnonzero(bits)
+
+def to_int(words):
+    '''
+    Python integer of an encoded structure.
+    '''
+    return int.from_bytes(np.ascontiguousarray(words,dtype="<u8").tobytes(),"little")
+
+def from_int(key, n_bits):
+    '''
+    Encoded words of a Python integer structure.
+    '''
+    return np.frombuffer(key.to_bytes(8*n_words(n_bits),"little"),dtype="<u8").astype(np.uint64)
+
+def from_mask(mask):
+    '''
+    Python integer of a boolean array over all units.
+    '''
+    return int.from_bytes(np.packbits(np.asarray(mask,dtype=bool),bitorder="little").tobytes(),"little")
+
+def contains(matrix, index):
+    '''
+    contains(matrix, index)
+
+    Description
+    Boolean array telling which rows of matrix contain unit index.
+    '''
+    return ((matrix[:,index//WORD]>>np.uint64(index%WORD))&np.uint64(1)).astype(bool)
+
+def popcount(matrix):
+    '''
+    Number of units in every row of matrix.
+    '''
+    matrix=np.atleast_2d(matrix)
+    return np.unpackbits(np.ascontiguousarray(matrix,dtype="<u8").view(np.uint8),axis=1).sum(axis=1)
+
+def equal_rows(matrix, words):
+    '''
+    Boolean array telling which rows of matrix equal the encoded structure words.
+    '''
+    return (matrix==words).all(axis=1)
+
+def unique_rows(matrix):
+    '''
+    unique_rows(matrix)
+
+    Description
+    Indices of the first occurrence of every distinct structure, in order of first occurrence.
+    '''
+    if len(matrix)==0:
+        return np.zeros(0,dtype=np.int64)
+    rows=np.ascontiguousarray(matrix).view(np.dtype((np.void,matrix.dtype.itemsize*matrix.shape[1]))).ravel()
+    _,first=np.unique(rows,return_index=True)
+    return np.sort(first)
+
+def violates(key, masks):
+    '''
+    violates(key, masks)
+
+    Description
+    True if the structure key (Python integer) selects more than one unit of any mutually exclusive set in masks (Python integers).
+    '''
+    for m in masks:
+        both=key&m
+        if both&(both-1):
+            return True
+    return False
@@ -0,0 +1,244 @@
+'''
+Builders of P-graph networks from fitted scikit-learn estimators.
+
+The networks follow Example 3 (decision trees) and the PLS example (linear models). All node symbols, attributes and edges are generated
+from the arrays of the fitted estimator in one vectorized pass and added to networkx in bulk (add_nodes_from/add_edges_from).
+'''
+import numpy as np
+import networkx as nx
+
+UPPER_BOUND=1000000000000
+THRESHOLD_MARGIN=0.001 #Right branch starts at threshold+THRESHOLD_MARGIN
+CHILD_WEIGHT=0.001 #Weight of the branch material consumed by a child node
+LEAF_PRICE=0.0001
+
+def _symbols(prefix, start, count):
+    return np.char.add(prefix,np.arange(start,start+count).astype(str))
+
+def _add(G, names, attrs):
+    G.add_nodes_from(zip(names.tolist(),attrs))
+
+def _add_edges(G, u, v, w):
+    #Negative weights are turned around: the unit consumes instead of producing (and vice versa)
+    u=np.asarray(u)
+    v=np.asarray(v)
+    w=np.asarray(w,dtype=float)
+    neg=w<0
+    src=np.where(neg,v,u)
+    dst=np.where(neg,u,v)
+    G.add_edges_from(zip(src.tolist(),dst.tolist(),({"weight":x} for x in np.abs(w).tolist())))
+
+def _tree_arrays(trees):
+    '''
+    Concatenates the node arrays of sklearn trees (tree_ objects). Children are given as global node ids, -1 for leaves.
+    '''
+    sizes=np.array([t.node_count for t in trees],dtype=np.int64)
+    offsets=np.concatenate([[0],np.cumsum(sizes)[:-1]]).astype(np.int64)
+    owner=np.repeat(np.arange(len(trees)),sizes)
+    left=np.concatenate([t.children_left for t in trees]).astype(np.int64)
+    right=np.concatenate([t.children_right for t in trees]).astype(np.int64)
+    left=np.where(left>=0,left+offsets[owner],-1)
+    right=np.where(right>=0,right+offsets[owner],-1)
+    feature=np.concatenate([t.feature for t in trees]).astype(np.int64)
+    threshold=np.concatenate([t.threshold for t in trees]).astype(float)
+    #Nodes cut off by pruning (e.g. prune_duplicate_leaves of Example 3) stay in the arrays but are not reachable from the root
+    reach=np.zeros(len(left),dtype=bool)
+    frontier=offsets
+    while len(frontier):
+        reach[frontier]=True
+        frontier=frontier[left[frontier]>=0]
+        frontier=np.concatenate([left[frontier],right[frontier]])
+    return owner,left,right,feature,threshold,reach
+
+def _tree_network(trees, leaf_target, leaf_weight, outputs, feature_names):
+    '''
+    Builds the network of a list of trees.
+
+    leaf_target, leaf_weight: (numpy array) Output material index and weight of every node (used for leaves).
+    outputs: (list) Names of the output materials.
+    '''
+    owner,left,right,feature,threshold,reach=_tree_arrays(trees)
+    split=reach&(left>=0)
+    leaf=reach&(left<0)
+    s_nodes=np.flatnonzero(split)
+    l_nodes=np.flatnonzero(leaf)
+    S=len(s_nodes)
+    used,feat_of_split=np.unique(feature[s_nodes],return_inverse=True)
+    F=len(used)
+    K=len(outputs)
+    if feature_names is None:
+        feature_names=["x"+str(i) for i in range(int(used.max())+1 if F else 0)]
+    feature_names=np.asarray(feature_names,dtype=object)
+
+    #Numbering: materials F inputs, F feature values, S branches, S left, S right, K outputs
+    m_in=_symbols("M",1,F)
+    m_val=_symbols("M",1+F,F)
+    m_branch=_symbols("M",1+2*F,S)
+    m_left=_symbols("M",1+2*F+S,S)
+    m_right=_symbols("M",1+2*F+2*S,S)
+    m_out=_symbols("M",1+2*F+3*S,K)
+    #Units: F feature units, one unit per tree node (split or leaf), S left tests, S right tests
+    o_feat=_symbols("O",1,F)
+    node_unit=np.full(len(left),"",dtype=object)
+    o_nodes=_symbols("O",1+F,S+len(l_nodes))
+    node_unit[s_nodes]=o_nodes[:S]
+    node_unit[l_nodes]=o_nodes[S:]
+    o_left=_symbols("O",1+F+S+len(l_nodes),S)
+    o_right=_symbols("O",1+F+2*S+len(l_nodes),S)
+
+    G=nx.DiGraph()
+    inter={"type":'intermediate',"flow_rate_lower_bound":0,"flow_rate_upper_bound":UPPER_BOUND,"price":0}
+    names=feature_names[used].tolist()
+    _add(G,m_in,({**inter,"names":n} for n in names))
+    _add(G,m_val,({"type":'intermediate',"flow_rate_lower_bound":0,"flow_rate_upper_bound":0,"price":0,"names":n} for n in names))
+    _add(G,m_branch,({**inter,"names":n} for n in m_branch.tolist()))
+    _add(G,m_left,({**inter,"names":n} for n in m_left.tolist()))
+    _add(G,m_right,({**inter,"names":n} for n in m_right.tolist()))
+    _add(G,m_out,({**inter,"price":LEAF_PRICE,"names":str(n)} for n in outputs))
+    _add(G,o_feat,({"names":n} for n in names))
+    child=np.zeros(len(left),dtype=bool)
+    child[left[s_nodes]]=True
+    child[right[s_nodes]]=True
+    _add(G,o_nodes,({"names":n,"capacity_lower_bound":0,"capacity_upper_bound":UPPER_BOUND} if c else {"names":n}
+                    for n,c in zip(o_nodes.tolist(),child[np.concatenate([s_nodes,l_nodes])].tolist())))
+    thr=threshold[s_nodes]
+    f_names=feature_names[used][feat_of_split].tolist()
+    _add(G,o_left,({"names":n+"<="+"%.6g"%t,"capacity_lower_bound":0,"capacity_upper_bound":t} for n,t in zip(f_names,thr.tolist())))
+    _add(G,o_right,({"names":n+">"+"%.6g"%t,"capacity_lower_bound":t+THRESHOLD_MARGIN,"capacity_upper_bound":UPPER_BOUND} for n,t in zip(f_names,thr.tolist())))
+
+    _add_edges(G,m_in,o_feat,np.ones(F))
+    _add_edges(G,o_feat,m_val,np.ones(F))
+    _add_edges(G,m_val[feat_of_split],o_nodes[:S],np.ones(S))
+    _add_edges(G,o_nodes[:S],m_branch,np.ones(S))
+    _add_edges(G,m_branch,o_left,np.ones(S))
+    _add_edges(G,o_left,m_left,np.ones(S))
+    _add_edges(G,m_left,node_unit[left[s_nodes]],np.full(S,CHILD_WEIGHT))
+    _add_edges(G,m_branch,o_right,np.ones(S))
+    _add_edges(G,o_right,m_right,np.ones(S))
+    _add_edges(G,m_right,node_unit[right[s_nodes]],np.full(S,CHILD_WEIGHT))
+    _add_edges(G,node_unit[l_nodes],m_out[leaf_target[l_nodes]],leaf_weight[l_nodes])
+    ME=np.stack([o_left,o_right],axis=1).tolist() if S else [[]]
+    return G,ME
+
+def _estimator_trees(estimator):
+    return [e.tree_ for e in np.ravel(np.asarray(estimator.estimators_,dtype=object))]
+
+def from_decision_tree(estimator, feature_names=None, class_names=None):
+    '''
+    from_decision_tree(estimator, feature_names=None, class_names=None)
+
+    Description
+    Builds the P-graph network of a fitted DecisionTreeClassifier or DecisionTreeRegressor as in Example 3.
+    Every split is an operating unit followed by two mutually excluded threshold units (capacity <= threshold, capacity > threshold) leading to the
+    units of the child nodes. Leaves of classifiers produce the material of their class, leaves of regressors produce "Prediction" with their value as weight.
+
+    Arguments
+    estimator: (sklearn estimator) Fitted decision tree.
+    feature_names: (list)(optional) Names of the features. Default is x0, x1, ...
+    class_names: (list)(optional) Names of the classes. Default is estimator.classes_.
+
+    Return
+    G: (DiGraph() object) Problem network.
+    ME: (list of list) Mutually excluded operating units.
+    '''
+    tree=estimator.tree_
+    if hasattr(estimator,"classes_"):
+        outputs=list(class_names if class_names is not None else estimator.classes_)
+        target=tree.value[:,0,:].argmax(axis=1)
+        weight=np.ones(tree.node_count)
+    else:
+        outputs=["Prediction"]
+        target=np.zeros(tree.node_count,dtype=np.int64)
+        weight=tree.value[:,0,0]
+    return _tree_network([tree],target,weight,outputs,feature_names)
+
+def from_tree_ensemble(estimator, feature_names=None, class_names=None):
+    '''
+    from_tree_ensemble(estimator, feature_names=None, class_names=None)
+
+    Description
+    Builds the P-graph network of a fitted tree ensemble (RandomForest, ExtraTrees, GradientBoosting) with the trees of from_decision_tree().
+    The trees share the feature materials and the output materials. Classifier leaves vote for their class with weight 1/number of trees,
+    regressor leaves add value/number of trees (value*learning_rate for gradient boosting) to "Prediction" (to the class scores for gradient boosting classifiers).
+
+    Arguments
+    estimator: (sklearn estimator) Fitted tree ensemble.
+    feature_names: (list)(optional) Names of the features. Default is x0, x1, ...
+    class_names: (list)(optional) Names of the classes. Default is estimator.classes_.
+
+    Return
+    G: (DiGraph() object) Problem network.
+    ME: (list of list) Mutually excluded operating units.
+    '''
+    estimators=np.asarray(estimator.estimators_,dtype=object)
+    trees=_estimator_trees(estimator)
+    sizes=np.array([t.node_count for t in trees],dtype=np.int64)
+    boosting=hasattr(estimator,"learning_rate")
+    if boosting:
+        #Gradient boosting: estimators_ is (stages, outputs) of regression trees
+        n_out=estimators.shape[1] if estimators.ndim==2 else 1
+        if hasattr(estimator,"classes_") and n_out>1:
+            outputs=list(class_names if class_names is not None else estimator.classes_)
+        else:
+            outputs=["Prediction"]
+        target=np.repeat(np.tile(np.arange(n_out),len(trees)//n_out),sizes)
+        weight=np.concatenate([t.value[:,0,0] for t in trees])*estimator.learning_rate
+    elif hasattr(estimator,"classes_"):
+        outputs=list(class_names if class_names is not None else estimator.classes_)
+        target=np.concatenate([t.value[:,0,:].argmax(axis=1) for t in trees])
+        weight=np.full(int(sizes.sum()),1/len(trees))
+    else:
+        outputs=["Prediction"]
+        target=np.zeros(int(sizes.sum()),dtype=np.int64)
+        weight=np.concatenate([t.value[:,0,0] for t in trees])/len(trees)
+    return _tree_network(trees,target,weight,outputs,feature_names)
+
+def from_linear_model(estimator, feature_names=None, target=0, prediction_price=100, feature_upper_bound=1, prediction_upper_bound=10000):
+    '''
+    from_linear_model(estimator, feature_names=None, target=0, prediction_price=100, feature_upper_bound=1, prediction_upper_bound=10000)
+
+    Description
+    Builds the P-graph network of a linear model as in the PLS example: features with positive coefficients are raw materials converted into a common
+    material with their coefficient as weight, features with negative coefficients are products drawn from it. A final unit converts the common material into "Prediction".
+
+    Arguments
+    estimator: (sklearn estimator or numpy array) Fitted linear model with coef_ (e.g. PLSRegression, LinearRegression, Ridge) or the coefficients.
+    feature_names: (list)(optional) Names of the features. Default is x0, x1, ...
+    target: (int) Target used for multi-output models.
+    prediction_price: (float) Price of the prediction product.
+    feature_upper_bound: (float) Upper bound of the feature materials (features scaled to [0,1] by default).
+    prediction_upper_bound: (float) Upper bound of the prediction product.
+
+    Return
+    G: (DiGraph() object) Problem network.
+    ME: (list of list) Mutually excluded operating units (none).
+    '''
+    coef=np.asarray(getattr(estimator,"coef_",estimator),dtype=float)
+    if coef.ndim==2:
+        n_features=getattr(estimator,"n_features_in_",None)
+        if 1 in coef.shape:
+            coef=coef.ravel()
+        elif coef.shape[1]==n_features:
+            coef=coef[target]
+        else:
+            coef=coef[:,target]
+    n=len(coef)
+    if feature_names is None:
+        feature_names=["x"+str(i) for i in range(n)]
+    names=np.asarray(feature_names,dtype=object)
+    positive=coef>=0
+    m_feat=_symbols("M",2,n)
+    o_feat=_symbols("O",2,n)
+    G=nx.DiGraph()
+    G.add_node("M1",names="combine",type='intermediate',flow_rate_lower_bound=0,flow_rate_upper_bound=0,price=0)
+    _add(G,m_feat,({"names":x,"type":'raw_material' if p else 'product',"flow_rate_lower_bound":0,"flow_rate_upper_bound":feature_upper_bound,"price":0}
+                   for x,p in zip(names.tolist(),positive.tolist())))
+    _add(G,o_feat,({"names":x} for x in names.tolist()))
+    #Positive: M_i -> O_i -> M1 (coef), negative: M1 (-coef) -> O_i -> M_i
+    _add_edges(G,np.where(positive,m_feat,o_feat),np.where(positive,o_feat,m_feat),np.ones(n))
+    _add_edges(G,o_feat,np.full(n,"M1"),coef)
+    G.add_node("O"+str(n+2),names="sum")
+    G.add_node("M"+str(n+2),names="Prediction",type='product',price=prediction_price,flow_rate_lower_bound=0,flow_rate_upper_bound=prediction_upper_bound)
+    G.add_edge("M1","O"+str(n+2),weight=1)
+    G.add_edge("O"+str(n+2),"M"+str(n+2),weight=1)
+    return G,[[]]
@@ -0,0 +1,167 @@
+'''
+Headless batch solver.
+
+    pgraph problems/ --solver INSIDEOUT --max-sol 10 --workers 4 --output results.jsonl
+
+solves every problem file of the given directories (PNS_problem_v1 .in, P-graph Studio .pgsx, or .json dumps of Pgraph.to_dict()) in a pool of
+worker processes and writes one JSON line per job with its results and timings. Only the solver side of the library is imported, no plotting code.
+'''
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import server
+from .Pgraph import Pgraph
+
+EXTENSIONS=(".in",".pgsx",".json")
+
+def find_problems(paths, recursive=False):
+    '''
+    find_problems(paths, recursive=False)
+
+    Description
+    Problem files (.in, .pgsx, .json) among the given files and directories, in sorted order.
+
+    Arguments
+    paths: (list) Files and directories.
+    recursive: (boolean) Whether subdirectories are searched too.
+
+    Return
+    files: (list) Paths of the problem files.
+    '''
+    files=[]
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                found=[os.path.join(root,f) for root,dirs,names in os.walk(path) for f in names]
+            else:
+                found=[os.path.join(path,f) for f in os.listdir(path)]
+            files+=sorted(f for f in found if os.path.isfile(f) and os.path.splitext(f)[1].lower() in EXTENSIONS)
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError("No such file or directory: "+path)
+    return files
+
+def load_problem(path, solver="INSIDEOUT", max_sol=100):
+    '''
+    load_problem(path, solver="INSIDEOUT", max_sol=100)
+
+    Description
+    Loads a problem file by its extension: .json (Pgraph.to_dict()), .pgsx (Pgraph.from_studio()) or .in (Pgraph.from_pns()).
+
+    Return
+    P: (Pgraph) Pgraph object of the problem.
+    '''
+    ext=os.path.splitext(path)[1].lower()
+    if ext==".json":
+        with open(path) as f:
+            problem=json.load(f)
+        problem["solver"]=solver
+        problem["max_sol"]=max_sol
+        return Pgraph.from_dict(problem)
+    elif ext==".pgsx":
+        return Pgraph.from_studio(path,solver=solver,max_sol=max_sol)
+    elif ext==".in":
+        return Pgraph.from_pns(path,solver=solver,max_sol=max_sol)
+    raise ValueError("Unknown problem file type "+ext+". Use .in, .pgsx or .json.")
+
+def solve_file(path, solver="INSIDEOUT", max_sol=100, options=None):
+    '''
+    solve_file(path, solver="INSIDEOUT", max_sol=100, options=None)
+
+    Description
+    Loads and solves one problem file. Errors are reported in the record instead of being raised.
+
+    Arguments
+    path: (string) Problem file.
+    solver, max_sol: As in Pgraph().
+    options: (dict)(optional) Keyword arguments of Pgraph.run(), e.g. {"native":True,"time_limit":30}.
+
+    Return
+    record: (dict) file, status ("ok" or "error"), error, the results of Pgraph (gmatlist, goplist, goolist, partial, lower_bound, gap)
+            and timings (load, solve and total seconds).
+    '''
+    options=dict(options or {})
+    if not options.get("native"):
+        options.setdefault("path",server.SOLVER_PATH)
+    record={"file":path,"status":"ok","solver":solver}
+    start=time.time()
+    loaded=solved=None
+    try:
+        #run() reports to stdout, which may be the results stream
+        with contextlib.redirect_stdout(sys.stderr):
+            P=load_problem(path,solver,max_sol)
+            loaded=time.time()
+            if server._work_path is not None:
+                P.path=server._work_path
+            P.run(skip_wine=True,server=False,**options)
+            solved=time.time()
+        record.update(P._results_dict())
+    except Exception as e:
+        record["status"]="error"
+        record["error"]=type(e).__name__+": "+str(e)
+    end=time.time()
+    record["timings"]={"load":None if loaded is None else loaded-start,
+                       "solve":None if solved is None else solved-loaded,
+                       "total":end-start}
+    return record
+
+def solve_files(files, solver="INSIDEOUT", max_sol=100, workers=1, options=None):
+    '''
+    solve_files(files, solver="INSIDEOUT", max_sol=100, workers=1, options=None)
+
+    Description
+    Solves problem files in a pool of worker processes, each with its own directory for the solver input and output.
+
+    Return
+    records: (generator) Records of solve_file() with the index of the file, in the order the jobs finish.
+    '''
+    if workers<=1:
+        server._init_worker()
+        for i,path in enumerate(files):
+            yield dict(solve_file(path,solver,max_sol,options),index=i)
+        return
+    with ProcessPoolExecutor(max_workers=workers,initializer=server._init_worker) as pool:
+        futures={pool.submit(solve_file,path,solver,max_sol,options):i for i,path in enumerate(files)}
+        for future in as_completed(futures):
+            yield dict(future.result(),index=futures[future])
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(prog="pgraph",description="Solve P-graph problem files (.in, .pgsx, .json) in parallel and write JSON-lines results.")
+    parser.add_argument("paths",nargs="+",help="problem files or directories")
+    parser.add_argument("--solver",default="INSIDEOUT",choices=["MSG","SSG","SSGLP","INSIDEOUT","MILP","HEURISTIC"],help="solver type (default: %(default)s)")
+    parser.add_argument("--max-sol",type=int,default=100,help="maximum number of solutions (default: %(default)s)")
+    parser.add_argument("--workers",type=int,default=os.cpu_count() or 1,help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--output","-o",default="-",help="JSON-lines results file (default: stdout)")
+    parser.add_argument("--native",action="store_true",help="use the built-in branch-and-bound instead of the P-graph executable")
+    parser.add_argument("--time-limit",type=float,default=None,help="time limit of every job in seconds")
+    parser.add_argument("--gap",type=float,default=None,help="relative optimality gap of the native solver")
+    parser.add_argument("--beam-width",type=int,default=8,help="beam width of the HEURISTIC solver (default: %(default)s)")
+    parser.add_argument("--recursive","-r",action="store_true",help="search directories recursively")
+    args=parser.parse_args(argv)
+
+    files=find_problems(args.paths,args.recursive)
+    options={"native":args.native,"time_limit":args.time_limit,"beam_width":args.beam_width}
+    if args.gap is not None:
+        options["gap"]=args.gap
+    out=sys.stdout if args.output=="-" else open(args.output,"w")
+    start=time.time()
+    errors=0
+    try:
+        for record in solve_files(files,args.solver,args.max_sol,args.workers,options):
+            errors+=record["status"]!="ok"
+            out.write(json.dumps(record,default=server._json_default)+"\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print("Solved",len(files)-errors,"of",len(files),"problems in",round(time.time()-start,3),"s",file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__=="__main__":
+    sys.exit(main())
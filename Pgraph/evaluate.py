@@ -0,0 +1,135 @@
+'''
+Batch evaluation of fixed structures.
+
+The LP of a structure (see abb.lp_data()) is a slice of the one sparse model. Candidates are solved in chunks: the LPs of a chunk are
+independent, so they are stacked block-diagonally and solved by a single HiGHS call, whose optimum is the optimum of every block.
+This saves the setup of one solver call per candidate. If a chunk is infeasible it is bisected until the infeasible candidates are isolated.
+Other outcomes of HiGHS (unbounded, iteration limit) are not taken for infeasibility and raise an error.
+'''
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import linprog
+from . import bitset
+from .abb import lp_data, solve_lp, OUT, IN
+
+CHUNK=64
+
+def _solve_blocks(lps):
+    '''
+    Solves the stacked LPs and returns the optimal x of every block, None for the infeasible ones.
+    Any other failure of HiGHS (unbounded LP, iteration limit, numerical trouble) is raised as a RuntimeError.
+    '''
+    res=linprog(np.concatenate([lp["c"] for lp in lps]),
+                A_ub=sp.vstack([sp.block_diag([lp["A"] for lp in lps]),-sp.block_diag([lp["A"] for lp in lps])],format="csr"),
+                b_ub=np.concatenate([lp["p_hi"] for lp in lps]+[-lp["p_lo"] for lp in lps]),
+                bounds=np.column_stack([np.concatenate([lp["lb"] for lp in lps]),np.concatenate([lp["ub"] for lp in lps])]),method="highs")
+    if res.status==0:
+        ends=np.cumsum([len(lp["cols"]) for lp in lps])
+        return np.split(res.x,ends[:-1])
+    if res.status!=2:
+        raise RuntimeError("The LP of "+str(len(lps))+" stacked structures failed with status "+str(res.status)+": "+res.message)
+    if len(lps)==1:
+        return [None]
+    half=len(lps)//2
+    return _solve_blocks(lps[:half])+_solve_blocks(lps[half:])
+
+def evaluate_chunk(model, structures):
+    '''
+    evaluate_chunk(model, structures)
+
+    Description
+    Optimal operation of fixed structures.
+
+    Arguments
+    model: (PNSModel) Problem in array form.
+    structures: (list) Sorted unit indices of every structure.
+
+    Return
+    results: (list) (cost, x) of every structure, (None, None) if its LP is infeasible.
+    '''
+    nu=len(model.units)
+    results=[(None,None)]*len(structures)
+    produces=(model.A>0).astype(np.int8).tocsc()
+    intermediate=model.mat_type!=0
+    lps=[]
+    index=[]
+    for i,units in enumerate(structures):
+        state=np.full(nu,OUT,dtype=np.int8)
+        state[list(units)]=IN
+        if len(units)==0:
+            results[i]=solve_lp(model,state)
+            continue
+        #Selected units run at positive capacity, so every consumed intermediate must be produced in the structure
+        sel=(state==IN).astype(np.int8)
+        if ((model.consumes@sel>0)&intermediate&~(produces@sel>0)).any():
+            continue
+        lp=lp_data(model,state)
+        if lp is not None:
+            lps.append(lp)
+            index.append(i)
+    if lps:
+        for i,lp,y in zip(index,lps,_solve_blocks(lps)):
+            if y is not None:
+                x=np.zeros(nu)
+                x[lp["cols"]]=y
+                results[i]=(float(lp["c"]@y+lp["constant"]),x)
+    return results
+
+_worker_model=None
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model=model
+
+def _evaluate_worker(structures):
+    return evaluate_chunk(_worker_model,structures)
+
+def evaluate_structures(model, structures, workers=1, chunk_size=CHUNK):
+    '''
+    evaluate_structures(model, structures, workers=1, chunk_size=64)
+
+    Description
+    Optimal cost and capacities of many fixed structures. Duplicates are solved once and structures that select more than one unit of a
+    mutually exclusive set are reported as infeasible without solving them.
+
+    Arguments
+    model: (PNSModel) Problem in array form.
+    structures: (list) Unit indices of every structure.
+    workers: (int) Number of worker processes. The model is sent to every worker once.
+    chunk_size: (int) Number of structures solved by one LP call.
+
+    Return
+    cost: (numpy array) Optimal total cost of every structure, nan if it is infeasible.
+    x: (numpy array) (structures, units) optimal capacities, 0 for infeasible structures.
+    feasible: (numpy array) Whether every structure has a feasible operation.
+    '''
+    nu=len(model.units)
+    keys={}
+    unique=[]
+    position=np.zeros(len(structures),dtype=np.int64)
+    for i,units in enumerate(structures):
+        units=tuple(sorted(set(int(u) for u in units)))
+        if units not in keys:
+            keys[units]=len(unique)
+            unique.append(units)
+        position[i]=keys[units]
+    allowed=[not bitset.violates(bitset.to_int(bitset.encode(units,nu)),model.me_masks) for units in unique]
+    todo=[units for units,ok in zip(unique,allowed) if ok]
+    chunks=[todo[i:i+chunk_size] for i in range(0,len(todo),chunk_size)]
+    if workers>1 and len(chunks)>1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers,initializer=_init_worker,initargs=(model,)) as pool:
+            solved=[r for results in pool.map(_evaluate_worker,chunks) for r in results]
+    else:
+        solved=[r for chunk in chunks for r in evaluate_chunk(model,chunk)]
+
+    cost=np.full(len(unique),np.nan)
+    x=np.zeros((len(unique),nu))
+    feasible=np.zeros(len(unique),dtype=bool)
+    rows=np.flatnonzero(allowed)
+    for i,(c,y) in zip(rows,solved):
+        if c is not None:
+            cost[i]=c
+            x[i]=y
+            feasible[i]=True
+    return cost[position],x[position],feasible[position]
@@ -0,0 +1,127 @@
+'''
+Heuristic solver: beam search over the branch-and-bound tree of the native solver.
+
+The tree, the LP relaxations and the branching rule are those of abb.solve_abb(), but every level only keeps the beam_width children with
+the smallest LP bounds instead of the whole open list, so the number of LPs grows with beam_width times the depth of the tree.
+The LP solution of the best node of every level is also rounded to a structure (its units with positive capacity), which gives feasible
+structures early and lets the bound prune the rest of the beam.
+
+The LP bounds of the dropped nodes keep a valid lower bound on the optimum: every structure is either found, in a subtree pruned as
+infeasible or worse than the found ones, or below a dropped node. The gap of the result is measured against this bound, and the search
+stops as soon as it is closed or the time budget is spent.
+'''
+import time
+import numpy as np
+from . import bitset
+from .abb import ABBResult, _Search, _relative_gap, _root, _supported, _warm_start, solve_lp, FREE, OUT, IN, TOL
+
+BEAM_WIDTH=8
+TIME_LIMIT=1.0
+
+def _round(search, state, x):
+    '''
+    Records the structure of the units selected or running in the LP solution x of a node. As in the branch-and-bound tree, a unit is
+    only kept if it produces a product or an input of a kept unit (see abb._supported()).
+    '''
+    active=(state==IN)|((state==FREE)&(x>TOL))
+    leaf=np.where(_supported(search.model,active),IN,OUT).astype(np.int8)
+    search.nodes+=1
+    cost,y=solve_lp(search.model,leaf)
+    if cost is not None:
+        search.record(cost,leaf,y)
+
+def solve_heuristic(model, beam_width=BEAM_WIDTH, max_sol=100, time_limit=None, gap=None, incumbent=None, cutoff=None):
+    '''
+    solve_heuristic(model, beam_width=8, max_sol=100, time_limit=None, gap=None, incumbent=None, cutoff=None)
+
+    Description
+    Finds good structures quickly with a beam search guided by LP relaxations. The structures are feasible and their costs exact,
+    but cheaper structures may exist. The search stops once the best structure is within gap of the optimum, or at time_limit once a
+    structure is found; until then only the best node of the beam is followed. beam_width=1 is a pure dive.
+
+    Arguments
+    model: (PNSModel) Problem in array form.
+    beam_width: (int) Number of nodes kept on every level of the tree. Larger beams are slower and find better structures.
+    max_sol: (int) Maximum number of solutions.
+    time_limit: (float)(optional) Wall clock budget in seconds. Default: TIME_LIMIT (1 s); pass float("inf") to follow the beam to the end.
+    gap: (float)(optional) Stop once the best structure is proven to be within this relative gap of the optimum, e.g. 0.01 for 1%.
+         Default: 0, i.e. stop once it is proven optimal.
+    incumbent: (list)(optional) Indices of the operating units of a known structure. It is evaluated first and recorded as a solution, as in abb.solve_abb().
+    cutoff: (float)(optional) Upper bound on the cost. Nodes and structures that cannot beat it are pruned.
+
+    Return
+    result: (ABBResult) Solutions, lower bound and gap. partial is False only if the best structure is proven optimal (gap 0).
+    '''
+    if beam_width<1:
+        raise ValueError("beam_width must be at least 1, not "+str(beam_width))
+    deadline=time.time()+(TIME_LIMIT if time_limit is None else time_limit)
+    gap=0.0 if gap is None else gap
+    result=ABBResult()
+    nu=len(model.units)
+    search=_Search(model,max_sol,cutoff=cutoff)
+    if incumbent is not None:
+        search.nodes+=1
+        warm=_warm_start(model,incumbent)
+        if warm is not None:
+            search.record(*warm)
+    root=_root(model)
+    node=search.expand(root)
+    beam=[] if node is None else [(node[0],0,root,node[1],node[2])]
+    dropped=np.inf
+    counter=0
+    timeout=lambda:time.time()>deadline and bool(search.ranked)
+    while beam:
+        if search.ranked and _relative_gap(search.best(),min(dropped,beam[0][0]))<=gap:
+            break
+        if timeout():
+            break
+        #Round the LP solution of the best node to a structure for an early incumbent
+        best,x=beam[0][2],beam[0][4]
+        if (x[best==FREE]>TOL).any():
+            _round(search,best,x)
+        #Until a structure is found past the deadline, only the best node is followed
+        width=1 if time.time()>deadline else beam_width
+        children=[]
+        stopped=False
+        for i,(bound,_,state,u,x) in enumerate(beam):
+            if timeout():
+                #The nodes not expanded yet stay in the beam and count as dropped
+                children+=beam[i:]
+                stopped=True
+                break
+            if search.prunable(bound):
+                continue
+            child_in=state.copy()
+            child_in[u]=IN
+            child_in[search.partners[u]]=OUT
+            child_out=state.copy()
+            child_out[u]=OUT
+            for child in (child_in,child_out):
+                node=search.expand(child)
+                if node is not None and not search.prunable(node[0]):
+                    counter+=1
+                    children.append((node[0],counter,child,node[1],node[2]))
+        if stopped:
+            beam=children
+            break
+        children.sort(key=lambda n:(n[0],n[1]))
+        if len(children)>width:
+            dropped=min(dropped,children[width][0])
+        beam=children[:width]
+    result.nodes=search.nodes
+
+    solutions=[]
+    for cost,key,x in sorted(search.candidates(),key=lambda s:(s[0],s[1]))[:max_sol]:
+        solutions.append((cost,tuple(bitset.decode(bitset.from_int(key,nu)).tolist()),x))
+    result.solutions=solutions
+    #Nodes left in the beam when the search stopped count as dropped
+    dropped=min([dropped]+[n[0] for n in beam if not search.prunable(n[0])])
+    result.partial=dropped<np.inf
+    if solutions:
+        #Structures that were not found lie below a dropped node
+        result.lower_bound=min(dropped,solutions[0][0])
+        result.gap=_relative_gap(solutions[0][0],result.lower_bound)
+        result.partial=result.gap>0
+    else:
+        result.lower_bound=dropped
+    return result
@@ -0,0 +1,262 @@
+'''
+Incremental maximal structure.
+
+The maximal structure is the union of all combinatorially feasible structures, computed in the two steps of the MSG algorithm:
+1. Reduction: operating units producing raw materials are excluded, then units consuming a material that is neither raw nor produced by a
+   remaining unit are removed until none is left ("alive" units, a greatest fixpoint kept with producer counts).
+2. Composition: starting from the products, alive units producing a needed material are selected and their inputs become needed
+   ("selected" units and "needed" materials, a least fixpoint).
+
+Every edit of the network retracts the operating units it touches, changes the graph and inserts the units again. Retracting cascades
+only through the units that lose their producers or their need (deleting and rederiving the latter), inserting only through the units
+that become producible or needed, so an edit costs time in the size of the region it changes, not of the network.
+'''
+from collections import deque
+
+class MaximalStructure():
+    def __init__(self, G):
+        '''
+        MaximalStructure(G)
+
+        Description
+        Computes the maximal structure of the problem network G. Edits made through add_material(), remove_material(), add_unit(), remove_unit(),
+        add_edge() and remove_edge() change G and update the structure incrementally. G must not be edited directly in between.
+
+        Arguments
+        G: (DiGraph() object) Problem network in the format of Pgraph.
+
+        Attributes
+        alive: (set) Operating units left by the reduction step.
+        selected: (set) Operating units of the maximal structure.
+        needed: (set) Products and inputs of the selected operating units.
+        count: (dict) Number of alive producers of every material.
+        '''
+        self.G=G
+        self.order={}
+        self.count={}
+        self.alive=set()
+        self.selected=set()
+        self.needed=set()
+        for n in G.nodes():
+            self.order[n]=len(self.order)
+            if n[0]=="M":
+                self.count[n]=0
+                if self._type(n)=="product":
+                    self.needed.add(n)
+        self._insert([n for n in G.nodes() if n[0]=="O"])
+
+    def _type(self, m):
+        return self.G.nodes[m].get('type','raw_material')
+
+    def _banned(self, u):
+        return any(self._type(m)=="raw_material" for m in self.G.successors(u))
+
+    def _available(self, m):
+        return self.count[m]>0 or self._type(m)=="raw_material"
+
+    def _select(self, units):
+        '''
+        Selects alive units and needs their inputs, propagating towards the raw materials.
+        '''
+        G=self.G
+        queue=deque(u for u in units if u in self.alive and u not in self.selected)
+        self.selected.update(queue)
+        while queue:
+            u=queue.popleft()
+            for m in G.predecessors(u):
+                if m not in self.needed:
+                    self.needed.add(m)
+                    for p in G.predecessors(m):
+                        if p in self.alive and p not in self.selected:
+                            self.selected.add(p)
+                            queue.append(p)
+
+    def _kill(self, units):
+        '''
+        Removes units from the alive set, cascading to the consumers of materials left without producers. Returns the removed units.
+        '''
+        G=self.G
+        queue=deque(u for u in units if u in self.alive)
+        dead=set(queue)
+        self.alive.difference_update(dead)
+        while queue:
+            u=queue.popleft()
+            for m in G.successors(u):
+                self.count[m]-=1
+                if self.count[m]==0 and self._type(m)!="raw_material":
+                    for c in G.successors(m):
+                        if c in self.alive:
+                            self.alive.discard(c)
+                            dead.add(c)
+                            queue.append(c)
+        return dead
+
+    def _retract(self, units):
+        '''
+        Kills units and removes everything that was only selected or needed because of them (delete and rederive).
+        '''
+        G=self.G
+        dead=self._kill(units)
+        queue=deque(u for u in dead if u in self.selected)
+        self.selected.difference_update(queue)
+        lost_units=set(queue)
+        lost_materials=[]
+        #Over-delete everything upstream of the removed units...
+        while queue:
+            u=queue.popleft()
+            for m in G.predecessors(u):
+                if m in self.needed and self._type(m)!="product":
+                    self.needed.discard(m)
+                    lost_materials.append(m)
+                    for p in G.predecessors(m):
+                        if p in self.selected:
+                            self.selected.discard(p)
+                            lost_units.add(p)
+                            queue.append(p)
+        #...and rederive what is still needed by the remaining selected units
+        for m in lost_materials:
+            if m not in self.needed and any(c in self.selected for c in G.successors(m)):
+                self.needed.add(m)
+                self._select(G.predecessors(m))
+        self._select(u for u in lost_units if any(m in self.needed for m in G.successors(u)))
+
+    def _insert(self, units):
+        '''
+        Makes units and the dead units downstream of them alive where their inputs can be produced, then selects the ones that are needed.
+        '''
+        G=self.G
+        candidates=set()
+        queue=deque()
+        for u in units:
+            if u not in self.alive and u not in candidates and not self._banned(u):
+                candidates.add(u)
+                queue.append(u)
+        #Tentatively revive the dead units that could be fed by the new ones...
+        while queue:
+            u=queue.popleft()
+            for m in G.successors(u):
+                for c in G.successors(m):
+                    if c not in self.alive and c not in candidates and not self._banned(c):
+                        candidates.add(c)
+                        queue.append(c)
+        self.alive.update(candidates)
+        for u in candidates:
+            for m in G.successors(u):
+                self.count[m]+=1
+        #...and remove those still missing an input
+        self._kill([u for u in candidates if not all(self._available(m) for m in G.predecessors(u))])
+        self._select(u for u in candidates if u in self.alive and any(m in self.needed for m in G.successors(u)))
+
+    def add_material(self, m, **attributes):
+        '''
+        add_material(m, **attributes)
+
+        Description
+        Adds material m with its attributes (type, flow_rate_lower_bound, ...) to the network.
+        '''
+        self.G.add_node(m,**attributes)
+        self.order.setdefault(m,len(self.order))
+        self.count.setdefault(m,0)
+        if self._type(m)=="product":
+            self.needed.add(m)
+
+    def remove_material(self, m):
+        '''
+        remove_material(m)
+
+        Description
+        Removes material m and its edges from the network.
+        '''
+        G=self.G
+        units=list(G.predecessors(m))+list(G.successors(m))
+        self._retract(units)
+        G.remove_node(m)
+        del self.count[m]
+        self.order.pop(m,None)
+        self.needed.discard(m)
+        self._insert(units)
+
+    def add_unit(self, u, inputs={}, outputs={}, **attributes):
+        '''
+        add_unit(u, inputs={}, outputs={}, **attributes)
+
+        Description
+        Adds operating unit u with its attributes (capacity_upper_bound, fix_cost, ...) and edges to existing materials.
+
+        Arguments
+        inputs, outputs: (dict) Flow rate (edge weight) of every input and output material.
+        '''
+        G=self.G
+        missing=[m for m in list(inputs)+list(outputs) if m not in self.count]
+        if missing:
+            raise KeyError("Unknown materials "+str(missing)+". Add them with add_material() first.")
+        G.add_node(u,**attributes)
+        self.order.setdefault(u,len(self.order))
+        G.add_edges_from((m,u,{"weight":w}) for m,w in inputs.items())
+        G.add_edges_from((u,m,{"weight":w}) for m,w in outputs.items())
+        self._insert([u])
+
+    def remove_unit(self, u):
+        '''
+        remove_unit(u)
+
+        Description
+        Removes operating unit u and its edges from the network.
+        '''
+        self._retract([u])
+        self.G.remove_node(u)
+        self.order.pop(u,None)
+
+    def add_edge(self, a, b, weight=1):
+        '''
+        add_edge(a, b, weight=1)
+
+        Description
+        Adds an input (material a to unit b) or output (unit a to material b) edge of an operating unit, or changes its weight.
+        '''
+        if not ((a in self.count and b in self.G and b[0]=="O") or (b in self.count and a in self.G and a[0]=="O")):
+            raise KeyError("An edge must connect an existing material and an existing operating unit, not "+str(a)+" and "+str(b)+".")
+        u=a if a[0]=="O" else b
+        if self.G.has_edge(a,b):
+            self.G[a][b]["weight"]=weight
+            return
+        self._retract([u])
+        self.G.add_edge(a,b,weight=weight)
+        self._insert([u])
+
+    def remove_edge(self, a, b):
+        '''
+        remove_edge(a, b)
+
+        Description
+        Removes an edge between a material and an operating unit.
+        '''
+        u=a if a[0]=="O" else b
+        self._retract([u])
+        self.G.remove_edge(a,b)
+        self._insert([u])
+
+    def feasible(self):
+        '''
+        Whether every product can be produced, i.e. the maximal structure exists.
+        '''
+        return all(self.count[m]>0 for m in self.needed if self._type(m)=="product")
+
+    def structure(self):
+        '''
+        structure()
+
+        Description
+        Operating units and materials of the maximal structure in the order they were added to the network. Both are empty if a product cannot be produced.
+
+        Return
+        units: (list) Symbols of the operating units.
+        materials: (list) Symbols of the materials (inputs and outputs of the units and the products).
+        '''
+        if not self.feasible():
+            return [],[]
+        G=self.G
+        materials=set(m for m in self.needed)
+        for u in self.selected:
+            materials.update(G.successors(u))
+        return sorted(self.selected,key=self.order.get),sorted(materials,key=self.order.get)
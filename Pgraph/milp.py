@@ -0,0 +1,279 @@
+'''
+Mixed-integer linear program of the PNS problem.
+
+Variables are the capacities x of the operating units, their on/off binaries y and, for raw materials and intermediates with a positive
+lower flow rate bound, an indicator z of the material being used (the bound only applies to structures that contain the material, as in the
+native branch-and-bound). The constraints are the material balances, capacity bounds linked to y, z >= y of the units touching the material
+and the mutual exclusions. The model is built as scipy.sparse matrices and can be written as MPS or LP files or solved with HiGHS.
+
+Operating units outside the maximal structure are fixed off: without the combinatorial axioms the balances alone would let e.g. producers of
+raw materials make structures cheaper than every solution structure.
+'''
+import warnings
+import numpy as np
+import scipy.sparse as sp
+from .abb import ABBResult, solve_lp, _supported, _maximal_units, MIN_CAPACITY, OUT, IN, TOL
+
+MIP_TOLERANCE=1e-9
+
+class MILPModel():
+    def __init__(self, model, cutoff=None):
+        '''
+        MILPModel(model, cutoff=None)
+
+        Description
+        Builds the MILP of a problem: minimize c@v subject to row_lo <= A@v <= row_hi and lb <= v <= ub, v=[x, y, z] with y and z binary.
+        x and y of the operating units outside the maximal structure have ub=0.
+
+        Arguments
+        model: (PNSModel) Problem in array form.
+        cutoff: (float)(optional) Upper bound on the total cost, added as a constraint.
+
+        Attributes
+        c, A, row_lo, row_hi, lb, ub, integrality: (numpy array, scipy.sparse.csr_matrix) The MILP in the form of scipy.optimize.milp().
+        columns, rows: (list) Names of the variables ("x_O1", "y_O1", "z_M1") and constraints ("balance_M1", "capacity_O1", "me_1", ...).
+        '''
+        self.model=model
+        nm,nu=model.A.shape
+        conditional=np.flatnonzero((model.mat_type!=2)&(model.mat_lb>0))
+        nz=len(conditional)
+        n=2*nu+nz
+        self.columns=["x_"+u for u in model.units]+["y_"+u for u in model.units]+["z_"+model.materials[m] for m in conditional]
+        self.c=np.concatenate([model.prop_cost-model.A.T@model.price,model.fix_cost,np.zeros(nz)])
+        self.lb=np.zeros(n)
+        maximal=_maximal_units(model)
+        self.ub=np.concatenate([np.where(maximal,model.cap_ub,0.0),maximal.astype(float),np.ones(nz)])
+        self.integrality=np.concatenate([np.zeros(nu),np.ones(nu+nz)]).astype(np.int8)
+        blocks=[]
+        lo=[]
+        hi=[]
+        names=[]
+        def add(matrix, low, high, labels):
+            blocks.append(sp.csr_matrix(matrix,shape=(matrix.shape[0],n)))
+            lo.append(np.asarray(low,dtype=float))
+            hi.append(np.asarray(high,dtype=float))
+            names.extend(labels)
+
+        #Material balances of the materials any unit touches, and of the products
+        A=sp.hstack([model.A,sp.csc_matrix((nm,nu+nz))]).tocsr()
+        touched=np.diff(model.touch.tocsr().indptr)>0
+        rows=np.flatnonzero(touched|(model.mat_type==2))
+        raw=model.mat_type[rows]==0
+        unconditional=np.where(np.isin(rows,conditional),0.0,model.mat_lb[rows])
+        add(A[rows],np.where(raw,-model.mat_ub[rows],unconditional),np.where(raw,-unconditional,model.mat_ub[rows]),
+            ["balance_"+model.materials[m] for m in rows])
+        #Conditional lower bounds: raw A@x+lb*z <= 0, intermediate A@x-lb*z >= 0, and z >= y of every unit touching the material
+        if nz:
+            sign=np.where(model.mat_type[conditional]==0,1.0,-1.0)
+            Z=sp.csr_matrix((sign*model.mat_lb[conditional],(np.arange(nz),2*nu+np.arange(nz))),shape=(nz,n))
+            raw=model.mat_type[conditional]==0
+            add(A[conditional]+Z,np.where(raw,-np.inf,0.0),np.where(raw,0.0,np.inf),["used_"+model.materials[m] for m in conditional])
+            T=model.touch.tocsr()[conditional].tocoo()
+            link=sp.csr_matrix((np.concatenate([np.ones(T.nnz),-np.ones(T.nnz)]),
+                                (np.tile(np.arange(T.nnz),2),np.concatenate([nu+T.col,2*nu+T.row]))),shape=(T.nnz,n))
+            add(link,np.full(T.nnz,-np.inf),np.zeros(T.nnz),["touch_"+model.materials[conditional[i]]+"_"+model.units[j] for i,j in zip(T.row,T.col)])
+        #Capacities: max(cap_lb, MIN_CAPACITY)*y <= x <= cap_ub*y
+        I=sp.identity(nu,format="csr")
+        add(sp.hstack([I,-sp.diags(model.cap_ub)]),np.full(nu,-np.inf),np.zeros(nu),["capacity_"+u for u in model.units])
+        add(sp.hstack([I,-sp.diags(np.maximum(model.cap_lb,MIN_CAPACITY))]),np.zeros(nu),np.full(nu,np.inf),["minimum_"+u for u in model.units])
+        #Mutual exclusions
+        if model.me:
+            r=np.repeat(np.arange(len(model.me)),[len(g) for g in model.me])
+            cols=nu+np.concatenate(model.me)
+            add(sp.csr_matrix((np.ones(len(cols)),(r,cols)),shape=(len(model.me),n)),np.full(len(model.me),-np.inf),np.ones(len(model.me)),
+                ["me_"+str(i+1) for i in range(len(model.me))])
+        if cutoff is not None:
+            add(sp.csr_matrix(self.c.reshape(1,-1)),[-np.inf],[cutoff+TOL*max(abs(cutoff),1)],["cutoff"])
+        self.A=sp.vstack(blocks,format="csr")
+        self.row_lo=np.concatenate(lo)
+        self.row_hi=np.concatenate(hi)
+        self.rows=names
+
+    def write(self, path, file_format=None):
+        '''
+        write(path, file_format=None)
+
+        Description
+        Writes the model as a free MPS file or a CPLEX LP file, which HiGHS, CBC, Gurobi, CPLEX, SCIP and GLPK can read.
+
+        Arguments
+        path: (string) Output file.
+        file_format: (string)(optional) "mps" or "lp". Default from the extension of path.
+        '''
+        if file_format is None:
+            file_format=path.rsplit(".",1)[-1].lower()
+        if file_format not in ["mps","lp"]:
+            raise ValueError("Unknown MILP file format "+str(file_format)+". Use 'mps' or 'lp'.")
+        with open(path,"w") as f:
+            f.write("".join(self._mps() if file_format=="mps" else self._lp()))
+
+    def _mps(self):
+        fmt=lambda v:"%.17g" % v
+        out=["NAME PGRAPH\n","ROWS\n"," N obj\n"]
+        kinds=[]
+        for name,lo,hi in zip(self.rows,self.row_lo,self.row_hi):
+            kind="E" if lo==hi else ("G" if np.isfinite(lo) else "L")
+            kinds.append(kind)
+            out.append(" "+kind+" "+name+"\n")
+        out.append("COLUMNS\n")
+        A=self.A.tocsc()
+        integer=False
+        for j,name in enumerate(self.columns):
+            if self.integrality[j]!=integer:
+                integer=bool(self.integrality[j])
+                out.append("    MARKER 'MARKER' "+("'INTORG'" if integer else "'INTEND'")+"\n")
+            if self.c[j]!=0:
+                out.append("    "+name+" obj "+fmt(self.c[j])+"\n")
+            for i,v in zip(A.indices[A.indptr[j]:A.indptr[j+1]],A.data[A.indptr[j]:A.indptr[j+1]]):
+                out.append("    "+name+" "+self.rows[i]+" "+fmt(v)+"\n")
+        if integer:
+            out.append("    MARKER 'MARKER' 'INTEND'\n")
+        out.append("RHS\n")
+        ranges=[]
+        for name,kind,lo,hi in zip(self.rows,kinds,self.row_lo,self.row_hi):
+            rhs=hi if kind=="L" else lo
+            if rhs!=0:
+                out.append("    rhs "+name+" "+fmt(rhs)+"\n")
+            if kind=="G" and np.isfinite(hi):
+                ranges.append("    rng "+name+" "+fmt(hi-lo)+"\n")
+        if ranges:
+            out+=["RANGES\n"]+ranges
+        out.append("BOUNDS\n")
+        for name,lo,hi,integer in zip(self.columns,self.lb,self.ub,self.integrality):
+            if integer and lo==0 and hi==1:
+                out.append(" BV bnd "+name+"\n")
+                continue
+            if lo!=0:
+                out.append(" LO bnd "+name+" "+fmt(lo)+"\n")
+            if np.isfinite(hi):
+                out.append(" UP bnd "+name+" "+fmt(hi)+"\n")
+        out.append("ENDATA\n")
+        return out
+
+    def _lp(self):
+        fmt=lambda v:"%.17g" % v
+        def expression(indices, values):
+            terms=[("- " if v<0 else "+ ")+fmt(abs(v))+" "+self.columns[j] for j,v in zip(indices,values) if v!=0]
+            return (" ".join(terms) if terms else "0 "+self.columns[0]).lstrip("+ ")
+        out=["\\ P-graph PNS problem\n","Minimize\n"," obj: "+expression(range(len(self.c)),self.c)+"\n","Subject To\n"]
+        A=self.A
+        for i,name in enumerate(self.rows):
+            row=expression(A.indices[A.indptr[i]:A.indptr[i+1]],A.data[A.indptr[i]:A.indptr[i+1]])
+            lo,hi=self.row_lo[i],self.row_hi[i]
+            if lo==hi:
+                out.append(" "+name+": "+row+" = "+fmt(lo)+"\n")
+                continue
+            if np.isfinite(lo):
+                out.append(" "+name+("_lo" if np.isfinite(hi) else "")+": "+row+" >= "+fmt(lo)+"\n")
+            if np.isfinite(hi):
+                out.append(" "+name+("_hi" if np.isfinite(lo) else "")+": "+row+" <= "+fmt(hi)+"\n")
+        out.append("Bounds\n")
+        for name,lo,hi in zip(self.columns,self.lb,self.ub):
+            out.append(" "+fmt(lo)+" <= "+name+" <= "+fmt(hi)+"\n" if np.isfinite(hi) else " "+name+" >= "+fmt(lo)+"\n")
+        binaries=[name for name,integer in zip(self.columns,self.integrality) if integer]
+        if binaries:
+            out+=["Binaries\n"]+[" "+name+"\n" for name in binaries]
+        out.append("End\n")
+        return out
+
+def solve_milp(model, time_limit=None, gap=None, cutoff=None):
+    '''
+    solve_milp(model, time_limit=None, gap=None, cutoff=None)
+
+    Description
+    Finds the optimal structure with the MILP solver of HiGHS (scipy.optimize.milp). The structure is made of the units running in the MILP
+    solution and its cost is then evaluated with its own LP, as for the structures of the native branch-and-bound. If that LP is infeasible
+    (HiGHS tolerances), no solution is returned and partial is True.
+
+    Arguments
+    model: (PNSModel) Problem in array form.
+    time_limit: (float)(optional) Time limit in seconds. The best structure found until then is returned with partial=True.
+    gap: (float)(optional) Relative optimality gap at which HiGHS stops.
+    cutoff: (float)(optional) Upper bound on the cost.
+
+    Return
+    result: (ABBResult) The optimal structure (at most one) and the solver status.
+    '''
+    from scipy.optimize import milp, LinearConstraint, Bounds
+
+    M=MILPModel(model,cutoff=cutoff)
+    nu=len(model.units)
+    #HiGHS accepts y within mip_feasibility_tolerance of an integer, which lets a unit with y near 0 run at up to cap_ub*tolerance
+    options={"disp":False,"mip_feasibility_tolerance":MIP_TOLERANCE}
+    if time_limit is not None:
+        options["time_limit"]=time_limit
+    if gap is not None:
+        options["mip_rel_gap"]=gap
+    with warnings.catch_warnings():
+        #scipy warns that the HiGHS option is passed verbatim
+        warnings.simplefilter("ignore",RuntimeWarning)
+        res=milp(M.c,integrality=M.integrality,bounds=Bounds(M.lb,M.ub),constraints=LinearConstraint(M.A,M.row_lo,M.row_hi),options=options)
+    result=ABBResult()
+    result.nodes=getattr(res,"mip_node_count",0) or 0
+    result.partial=res.status==1
+    if res.x is None:
+        return result
+    #Units are read from the capacities: within the integrality tolerance a unit can run with y slightly above 0
+    running=_supported(model,res.x[:nu]>TOL)
+    leaf=np.where(running,IN,OUT).astype(np.int8)
+    cost,x=solve_lp(model,leaf)
+    if cost is None:
+        result.partial=True
+        return result
+    result.solutions=[(cost,tuple(np.flatnonzero(running).tolist()),x)]
+    bound=getattr(res,"mip_dual_bound",None)
+    result.lower_bound=cost if res.status==0 or bound is None else min(float(bound),cost)
+    result.gap=max(cost-result.lower_bound,0.0)/max(abs(cost),TOL)
+    return result
+
+if __name__=="__main__":
+    #Check: MILP and the native branch-and-bound give the same optimal cost, also where units produce raw materials (python -m Pgraph.milp)
+    import random
+    import networkx as nx
+    from .model import PNSModel
+    from .abb import solve_abb
+
+    #O2 makes the product and the raw material M2 that O1 consumes, which would make O1+O2 cheaper than O1 buying M2, but O2 is
+    #outside the maximal structure
+    G=nx.DiGraph()
+    G.add_node("M0",type='product',flow_rate_lower_bound=100)
+    G.add_node("M1",type='raw_material',price=1)
+    G.add_node("M2",type='raw_material',price=50)
+    G.add_node("O1",fix_cost=100,proportional_cost=1)
+    G.add_node("O2",fix_cost=100,proportional_cost=1)
+    G.add_edge("M2","O1",weight=1)
+    G.add_edge("O1","M0",weight=1)
+    G.add_edge("M1","O2",weight=1)
+    G.add_edge("O2","M0",weight=1)
+    G.add_edge("O2","M2",weight=1)
+    model=PNSModel(G,[])
+    for result in (solve_abb(model),solve_milp(model)):
+        assert [(round(cost,6),units) for cost,units,x in result.solutions]==[(5200.0,(0,))], result.solutions
+
+    mismatches=[]
+    for seed in range(122):
+        r=random.Random(seed)
+        G=nx.DiGraph()
+        G.add_node("M0",type='product',flow_rate_lower_bound=100)
+        for m in range(1,12):
+            G.add_node("M"+str(m),type='raw_material' if m<4 else 'intermediate',price=r.randint(1,50) if m<4 else 0)
+        for u in range(16):
+            G.add_node("O"+str(u),fix_cost=r.randint(100,5000),proportional_cost=r.randint(1,20))
+            if r.random()<0.3:
+                G.nodes["O"+str(u)]["capacity_upper_bound"]=r.choice([50,150,1e6])
+            #Every other network has multi-output units, which may also produce raw materials (outside the maximal structure)
+            outputs=[0] if u%3==0 else r.sample(range(12),1+(seed%2)*r.randint(0,1))
+            if seed%2 and r.random()<0.3:
+                outputs.append(r.choice([m for m in range(1,4) if m not in outputs]))
+            for m in r.sample(range(1,12),r.randint(1,2)):
+                if m not in outputs:
+                    G.add_edge("M"+str(m),"O"+str(u),weight=r.randint(1,3))
+            for m in outputs:
+                G.add_edge("O"+str(u),"M"+str(m),weight=r.randint(1,3))
+        model=PNSModel(G,[])
+        native=[s[0] for s in solve_abb(model,max_sol=1).solutions]
+        mixed=[s[0] for s in solve_milp(model).solutions]
+        if len(native)!=len(mixed) or any(abs(a-b)>1e-6*max(abs(a),1) for a,b in zip(native,mixed)):
+            mismatches.append((seed,native,mixed))
+    print(str(len(mismatches))+" of 122 random networks differ from the native solver: "+str(mismatches))
+    assert not mismatches
@@ -0,0 +1,94 @@
+import numpy as np
+import scipy.sparse as sp
+from . import bitset
+
+#Defaults of the PNS_problem_v1 input written by Pgraph.create_solver_input()
+MATERIAL_FLOW_RATE_LOWER_BOUND=0
+MATERIAL_FLOW_RATE_UPPER_BOUND=10000000
+MATERIAL_PRICE=0
+OPERATING_UNIT_CAPACITY_LOWER_BOUND=0
+OPERATING_UNIT_CAPACITY_UPPER_BOUND=10000000
+OPERATING_UNIT_FIX_COST=0
+OPERATING_UNIT_PROPORTIONAL_COST=0
+
+class PNSModel():
+    def __init__(self, G, ME=[[]]):
+        '''
+        PNSModel(G, ME=[[]])
+
+        Description
+        Array form of a P-graph problem used by the native solvers. Materials ("M" nodes) and operating units ("O" nodes) are indexed in graph order.
+
+        Arguments
+        G: (DiGraph() object) Problem network in the format of Pgraph.
+        ME: (list of list) Mutually excluded operating units.
+
+        Attributes
+        materials, units: (list) Node symbols of materials and operating units.
+        A: (scipy.sparse.csc_matrix) Net production of every material per unit capacity of every operating unit (outputs positive, inputs negative).
+        mat_type: (numpy array) 0 for raw materials, 1 for intermediates and 2 for products.
+        mat_lb, mat_ub, price: (numpy array) Flow rate bounds and prices of materials.
+        cap_lb, cap_ub, fix_cost, prop_cost: (numpy array) Capacity bounds and costs of operating units.
+        producers: (list of numpy array) Indices of the operating units producing every material.
+        me: (list of numpy array) Indices of mutually excluded operating units.
+        me_masks: (list of int) Bitsets of the mutually exclusive sets.
+        conflicts: (list of int) Bitset of the units excluded by every operating unit.
+        '''
+        self.materials=[n for n in G.nodes() if n[0]=="M"]
+        self.units=[n for n in G.nodes() if n[0]=="O"]
+        self.mat_index={n:i for i,n in enumerate(self.materials)}
+        self.unit_index={n:i for i,n in enumerate(self.units)}
+        type_converter={"raw_material":0,"intermediate":1,"product":2}
+
+        nodes=G.nodes()
+        self.mat_type=np.array([type_converter[nodes[n].get('type','raw_material')] for n in self.materials],dtype=np.int8)
+        self.mat_lb=np.array([nodes[n].get('flow_rate_lower_bound',MATERIAL_FLOW_RATE_LOWER_BOUND) for n in self.materials],dtype=float)
+        self.mat_ub=np.array([nodes[n].get('flow_rate_upper_bound',MATERIAL_FLOW_RATE_UPPER_BOUND) for n in self.materials],dtype=float)
+        self.price=np.array([nodes[n].get('price',MATERIAL_PRICE) for n in self.materials],dtype=float)
+        self.cap_lb=np.array([nodes[n].get('capacity_lower_bound',OPERATING_UNIT_CAPACITY_LOWER_BOUND) for n in self.units],dtype=float)
+        self.cap_ub=np.array([nodes[n].get('capacity_upper_bound',OPERATING_UNIT_CAPACITY_UPPER_BOUND) for n in self.units],dtype=float)
+        self.fix_cost=np.array([nodes[n].get('fix_cost',OPERATING_UNIT_FIX_COST) for n in self.units],dtype=float)
+        self.prop_cost=np.array([nodes[n].get('proportional_cost',OPERATING_UNIT_PROPORTIONAL_COST) for n in self.units],dtype=float)
+
+        rows=[]
+        cols=[]
+        vals=[]
+        for u,v,w in G.edges(data='weight'):
+            if u[0]=="M" and v[0]=="O":
+                rows.append(self.mat_index[u])
+                cols.append(self.unit_index[v])
+                vals.append(-w)
+            elif u[0]=="O" and v[0]=="M":
+                rows.append(self.mat_index[v])
+                cols.append(self.unit_index[u])
+                vals.append(w)
+        self.A=sp.csc_matrix((vals,(rows,cols)),shape=(len(self.materials),len(self.units)),dtype=float)
+        #Materials produced or consumed by every unit, used to decide which bounds are active
+        self.touch=(self.A!=0).astype(np.int8).tocsc()
+        self.consumes=(self.A<0).astype(np.int8).tocsc()
+        produces=(self.A>0).tocsr()
+        self.producers=[produces.indices[produces.indptr[m]:produces.indptr[m+1]] for m in range(len(self.materials))]
+        self.me=[np.array([self.unit_index[x] for x in M],dtype=np.int64) for M in ME if len(M)>0]
+        self.me_masks=[bitset.to_int(bitset.encode(group,len(self.units))) for group in self.me]
+        self.conflicts=[0]*len(self.units)
+        for group,mask in zip(self.me,self.me_masks):
+            for u in group:
+                self.conflicts[u]|=mask&~(1<<int(u))
+
+    def unit_cost(self, x, selected):
+        '''
+        unit_cost(x, selected)
+
+        Description
+        Cost of the operating units at capacities x. Fixed costs count for selected units only.
+        '''
+        return self.fix_cost*selected+self.prop_cost*x
+
+    def material_cost(self, x):
+        '''
+        material_cost(x)
+
+        Description
+        Cost of the materials at capacities x. Purchased raw materials are positive, sold products are negative.
+        '''
+        return -self.price*(self.A@x)
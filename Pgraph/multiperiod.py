@@ -0,0 +1,197 @@
+'''
+Multi-period and multi-scenario expansion of a P-graph problem.
+
+The base flowsheet is replicated once per period (or scenario) with array operations: node symbols, attributes and edges of all copies are
+generated from index arrays of the base network and added to networkx in bulk. With a shared structure, every operating unit gets one investment
+unit carrying its fixed cost, and the copies of the unit consume "capacity" from it, so a unit is paid for once and can run in every period
+up to the invested capacity. Storage units carry materials from one period to the next.
+'''
+import numpy as np
+import pandas as pd
+import networkx as nx
+from .model import MATERIAL_PRICE, OPERATING_UNIT_FIX_COST, OPERATING_UNIT_PROPORTIONAL_COST, OPERATING_UNIT_CAPACITY_UPPER_BOUND
+from .Pgraph import COSTED_SOLVERS
+
+def _symbols(prefix, ids):
+    return np.char.add(prefix,(np.asarray(ids,dtype=np.int64)+1).astype(str))
+
+class MultiPeriod():
+    def __init__(self, P, periods, weights=None, overrides=None, storage=None, shared_structure=True):
+        '''
+        MultiPeriod(P, periods, weights=None, overrides=None, storage=None, shared_structure=True)
+
+        Description
+        Expands the problem of Pgraph P over periods or scenarios. The expanded Pgraph is in self.problem and can be solved with run() as usual.
+        values() and structure() map its solutions back to the symbols of the base problem.
+
+        Arguments
+        P: (Pgraph) Base problem.
+        periods: (int or list) Number of periods or their names.
+        weights: (list)(optional) Weight of every period (duration or scenario probability). Material prices and proportional costs of a period are multiplied by it. Default is 1.
+        overrides: (dict)(optional) Node attributes that change between periods, {symbol: {attribute: value or list with one value per period}},
+                   e.g. {"M1": {"flow_rate_lower_bound": weekly_demand}}.
+        storage: (dict or list)(optional) Materials that can be stored from one period to the next, {material: {operating unit attributes of the storage, e.g. proportional_cost}}.
+                 Leave empty for scenarios.
+        shared_structure: (boolean) Whether all periods share one structure. If True, fixed costs are paid once through an investment unit per operating unit.
+                          If False, every period is an independent copy.
+
+        Attributes
+        problem: (Pgraph) Expanded problem.
+        periods: (list) Names of the periods.
+        origin: (dict) Expanded symbol to (period index, base symbol), period index None for investment units.
+        '''
+        G=P.G
+        if isinstance(periods,int):
+            periods=list(range(1,periods+1))
+        self.periods=[str(p) for p in periods]
+        N=len(self.periods)
+        self.base=P
+        self.shared_structure=shared_structure
+        w=np.ones(N) if weights is None else np.asarray(weights,dtype=float)
+        overrides=overrides or {}
+        if isinstance(storage,(list,tuple)):
+            storage={m:{} for m in storage}
+        storage=storage or {}
+
+        mats=[n for n in G.nodes() if n[0]=="M"]
+        units=[n for n in G.nodes() if n[0]=="O"]
+        nM=len(mats)
+        nU=len(units)
+        self.materials=mats
+        self.units=units
+        m_index={n:i for i,n in enumerate(mats)}
+        u_index={n:i for i,n in enumerate(units)}
+        nodes=G.nodes()
+        period_names=np.array(self.periods,dtype=object)
+
+        #Symbols: period t copy of base material i is M(t*nM+i+1), of base unit j is O(t*nU+j+1)
+        m_sym=_symbols("M",np.arange(N*nM)).reshape(N,nM)
+        u_sym=_symbols("O",np.arange(N*nU)).reshape(N,nU)
+        m_names=np.array([nodes[n]['names'] for n in mats],dtype=object)
+        u_names=np.array([nodes[n]['names'] for n in units],dtype=object)
+        suffix=(" ["+period_names+"]")[:,None]
+
+        def column(symbol, attr, default):
+            #Value of a node attribute in every period
+            value=overrides.get(symbol,{}).get(attr,nodes[symbol].get(attr,default))
+            return np.broadcast_to(np.asarray(value,dtype=float),(N,))
+
+        #Costs scaled by the period weights, (N, number of nodes) matrices
+        costs=("price","proportional_cost","fix_cost")
+        price=np.stack([column(n,"price",MATERIAL_PRICE) for n in mats]+[np.zeros(N)],axis=1)[:,:nM]*w[:,None]
+        prop=np.stack([column(n,"proportional_cost",OPERATING_UNIT_PROPORTIONAL_COST) for n in units]+[np.zeros(N)],axis=1)[:,:nU]*w[:,None]
+        fix=np.stack([column(n,"fix_cost",OPERATING_UNIT_FIX_COST) for n in units]+[np.zeros(N)],axis=1)[:,:nU]*w[:,None]
+        if shared_structure:
+            fix[:]=0
+        static={n:{a:v for a,v in attrs.items() if np.ndim(v)==0 and a not in costs} for n,attrs in overrides.items()}
+        varying=[(n,a,column(n,a,None)) for n,attrs in overrides.items() for a,v in attrs.items() if np.ndim(v)>0 and a not in costs]
+        base_m=[{**nodes[n],**static.get(n,{})} for n in mats]
+        base_u=[{**nodes[n],**static.get(n,{})} for n in units]
+
+        E=nx.DiGraph()
+        for t in range(N):
+            m_attrs=[dict(a,names=x,price=p) for a,x,p in zip(base_m,(m_names+suffix[t]).tolist(),price[t].tolist())]
+            u_attrs=[dict(a,names=x,proportional_cost=p,fix_cost=f) for a,x,p,f in zip(base_u,(u_names+suffix[t]).tolist(),prop[t].tolist(),fix[t].tolist())]
+            for n,a,v in varying:
+                (m_attrs[m_index[n]] if n[0]=="M" else u_attrs[u_index[n]])[a]=float(v[t])
+            E.add_nodes_from(zip(m_sym[t].tolist(),m_attrs))
+            E.add_nodes_from(zip(u_sym[t].tolist(),u_attrs))
+
+        #Edges of all copies from the base edge index arrays
+        edges=list(G.edges(data='weight'))
+        from_unit=np.array([u[0]=="O" for u,v,d in edges],dtype=bool)
+        src_idx=np.array([u_index[u] if u[0]=="O" else m_index[u] for u,v,d in edges],dtype=np.int64)
+        dst_idx=np.array([u_index[v] if v[0]=="O" else m_index[v] for u,v,d in edges],dtype=np.int64)
+        weight=np.array([d for u,v,d in edges],dtype=float)
+        t_rep=np.repeat(np.arange(N),len(edges))
+        kind=np.tile(from_unit,N)
+        si=np.tile(src_idx,N)
+        di=np.tile(dst_idx,N)
+        src=np.empty(len(t_rep),dtype=object)
+        dst=np.empty(len(t_rep),dtype=object)
+        src[kind]=u_sym.ravel()[t_rep[kind]*nU+si[kind]]
+        src[~kind]=m_sym.ravel()[t_rep[~kind]*nM+si[~kind]]
+        dst[kind]=m_sym.ravel()[t_rep[kind]*nM+di[kind]]
+        dst[~kind]=u_sym.ravel()[t_rep[~kind]*nU+di[~kind]]
+        E.add_edges_from(zip(src.tolist(),dst.tolist(),({"weight":x} for x in np.tile(weight,N).tolist())))
+
+        self.origin={}
+        for t in range(N):
+            self.origin.update(zip(m_sym[t].tolist(),((t,n) for n in mats)))
+            self.origin.update(zip(u_sym[t].tolist(),((t,n) for n in units)))
+        ME=[]
+        next_m=N*nM
+        next_u=N*nU
+        if shared_structure and nU:
+            #Investment unit j produces capacity material (t,j) for every period, copy (t,j) consumes it per unit capacity
+            inv=_symbols("O",next_u+np.arange(nU))
+            cap=_symbols("M",next_m+np.arange(N*nU)).reshape(N,nU)
+            next_u+=nU
+            next_m+=N*nU
+            cap_ub=np.array([nodes[n].get('capacity_upper_bound',OPERATING_UNIT_CAPACITY_UPPER_BOUND) for n in units],dtype=float)
+            E.add_nodes_from(zip(inv.tolist(),({"names":x+" [invest]","fix_cost":float(column(n,"fix_cost",OPERATING_UNIT_FIX_COST)[0]),"proportional_cost":0,
+                                               "capacity_lower_bound":0,"capacity_upper_bound":ub} for x,n,ub in zip(u_names.tolist(),units,cap_ub.tolist()))))
+            E.add_nodes_from(zip(cap.ravel().tolist(),({"names":x+" capacity","type":'intermediate',"flow_rate_lower_bound":0,"flow_rate_upper_bound":ub,"price":0}
+                                                       for x,ub in zip(np.tile(u_names,N).tolist(),np.tile(cap_ub,N).tolist()))))
+            E.add_edges_from(zip(np.tile(inv,N).tolist(),cap.ravel().tolist(),({"weight":1} for i in range(N*nU))))
+            E.add_edges_from(zip(cap.ravel().tolist(),u_sym.ravel().tolist(),({"weight":1} for i in range(N*nU))))
+            self.origin.update(zip(inv.tolist(),((None,n) for n in units)))
+            self.investment=dict(zip(units,inv.tolist()))
+            ME=[[self.investment[x] for x in M] for M in P.ME if len(M)>0]
+        else:
+            self.investment={}
+            ME=[[u_sym[t,u_index[x]] for x in M] for t in range(N) for M in P.ME if len(M)>0]
+
+        for k,(m,attrs) in enumerate(storage.items()):
+            #Storage of material m from period t to t+1
+            i=m_index[m]
+            s=_symbols("O",next_u+np.arange(N-1))
+            next_u+=N-1
+            E.add_nodes_from(zip(s.tolist(),({"names":m_names[i]+" storage ["+period_names[t]+"]",**attrs} for t in range(N-1))))
+            E.add_edges_from(zip(m_sym[:-1,i].tolist(),s.tolist(),({"weight":1} for t in range(N-1))))
+            E.add_edges_from(zip(s.tolist(),m_sym[1:,i].tolist(),({"weight":1} for t in range(N-1))))
+            self.origin.update(zip(s.tolist(),((t,m+" storage") for t in range(N-1))))
+
+        from .Pgraph import Pgraph
+        self.problem=Pgraph(E,mutual_exclusion=ME if ME else [[]],solver=P.solver,max_sol=P.max_sol)
+
+    def values(self, sol_num=0):
+        '''
+        values(sol_num=0)
+
+        Description
+        Maps solution sol_num of the expanded problem back to the base problem.
+
+        Return
+        values: (DataFrame) One row per period and one column per base symbol (and storage). Capacities of operating units and flows of materials for SSGLP
+                and INSIDEOUT, 1/0 for nodes used/unused for SSG and MSG.
+        '''
+        P=self.problem
+        columns=self.materials+self.units+list(dict.fromkeys(n for t,n in self.origin.values() if n.endswith(" storage")))
+        table=pd.DataFrame(0.0,index=pd.Index(self.periods,name="Period"),columns=columns)
+        if P.solver in COSTED_SOLVERS:
+            entries=[(x[1],float(x[0])) for x in P.goplist[sol_num]]+[(x[0],abs(float(x[3]))) for x in P.gmatlist[sol_num]]
+        else:
+            entries=[(x,1.0) for x in P.goplist[sol_num]+P.gmatlist[sol_num]]
+        for symbol,value in entries:
+            t,n=self.origin.get(symbol,(None,None))
+            if t is not None:
+                table.iat[t,table.columns.get_loc(n)]=value
+        return table
+
+    def structure(self, sol_num=0):
+        '''
+        structure(sol_num=0)
+
+        Description
+        Operating units of the base problem used by solution sol_num (the invested units for a shared structure, otherwise the units used in any period).
+
+        Return
+        units: (list) Base operating unit symbols.
+        '''
+        used=set()
+        for symbol in self.problem._solution_units(sol_num):
+            t,n=self.origin.get(symbol,(None,None))
+            if n is not None and (t is None)==bool(self.investment) and n in self.units:
+                used.add(n)
+        return [n for n in self.units if n in used]
@@ -0,0 +1,151 @@
+'''
+Random-access offset index over solver output files (test_out.out).
+
+One memory-mapped scan finds the byte offset of every "Feasible structure", "Solution structure" and "Maximal Structure" block. The offsets are saved
+next to the output file (test_out.out.idx.npz) together with the size and modification time of the output, so later sessions reuse them as long as the
+output is unchanged. Single solutions are then read by seeking to their block instead of parsing the whole file.
+'''
+import mmap
+import os
+import re
+import numpy as np
+
+FEASIBLE=0
+SOLUTION=1
+MAXIMAL=2
+_HEADER=re.compile(rb"^(Feasible structure|Solution structure |Maximal Structure:)",re.M)
+_KINDS={b"Feasible structure":FEASIBLE,b"Solution structure ":SOLUTION,b"Maximal Structure:":MAXIMAL}
+
+def index_path_of(out_path):
+    return out_path+".idx.npz"
+
+def build_index(out_path, index_path=None):
+    '''
+    build_index(out_path, index_path=None)
+
+    Description
+    Scans a solver output file once (memory-mapped) and saves the offsets of its structure blocks.
+    A file without the final "End." line (stopped solver) is complete up to its last block, which is left out because it may be cut off.
+
+    Arguments
+    out_path: (string) Path of the output file.
+    index_path: (string)(optional) Path of the index. Default is out_path+".idx.npz". The index is not saved if the directory is not writable.
+
+    Return
+    index: (dict) "start", "end" (byte offsets) and "kind" (FEASIBLE, SOLUTION or MAXIMAL) arrays of the blocks, "complete", "size" and "mtime" of the file.
+    '''
+    stat=os.stat(out_path)
+    starts=[]
+    kinds=[]
+    complete=False
+    end=stat.st_size
+    if stat.st_size>0:
+        with open(out_path,"rb") as f, mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) as mm:
+            for m in _HEADER.finditer(mm):
+                starts.append(m.start())
+                kinds.append(_KINDS[m.group(1)])
+            tail=mm[max(0,stat.st_size-64):].rstrip()
+            complete=tail.endswith(b"\nEnd.") or tail==b"End."
+            if complete:
+                end=mm.rfind(b"End.")
+    start=np.array(starts,dtype=np.int64)
+    index={"start":start,"end":np.append(start[1:],end).astype(np.int64),"kind":np.array(kinds,dtype=np.int8),
+           "complete":complete,"size":stat.st_size,"mtime":stat.st_mtime_ns}
+    if not complete and len(start)>0:
+        for key in ("start","end","kind"):
+            index[key]=index[key][:-1]
+    try:
+        with open(index_path or index_path_of(out_path),"wb") as f:
+            np.savez(f,**index)
+    except OSError:
+        pass
+    return index
+
+def load_index(out_path, index_path=None, rebuild=False):
+    '''
+    load_index(out_path, index_path=None, rebuild=False)
+
+    Description
+    Loads the saved index of an output file, or builds it if it is missing, outdated or rebuild is True.
+
+    Return
+    index: (dict) See build_index().
+    '''
+    index_path=index_path or index_path_of(out_path)
+    if not rebuild and os.path.isfile(index_path):
+        stat=os.stat(out_path)
+        with np.load(index_path) as data:
+            index={key:data[key] for key in data.files}
+        if int(index["size"])==stat.st_size and int(index["mtime"])==stat.st_mtime_ns:
+            index["complete"]=bool(index["complete"])
+            return index
+    return build_index(out_path,index_path)
+
+class SolutionFile():
+    def __init__(self, out_path, kinds, parse, index_path=None, rebuild=False):
+        '''
+        SolutionFile(out_path, kinds, parse, index_path=None, rebuild=False)
+
+        Description
+        Indexed solver output file whose blocks of the given kinds are parsed on first access and cached.
+
+        Arguments
+        out_path: (string) Path of the output file.
+        kinds: (tuple) Block kinds counted as solutions, e.g. (FEASIBLE,).
+        parse: (function) Parses the text lines of one block into a tuple of fields.
+        '''
+        self.path=out_path
+        index=load_index(out_path,index_path,rebuild)
+        keep=np.isin(index["kind"],kinds)
+        self.start=index["start"][keep]
+        self.end=index["end"][keep]
+        self.complete=index["complete"]
+        self.parse=parse
+        self.cache={}
+
+    def __len__(self):
+        return len(self.start)
+
+    def block(self, k):
+        '''
+        Text lines of block k.
+        '''
+        with open(self.path,"rb") as f:
+            f.seek(int(self.start[k]))
+            data=f.read(int(self.end[k]-self.start[k]))
+        return data.decode().splitlines(True)
+
+    def get(self, k):
+        if k<0:
+            k+=len(self)
+        if k<0 or k>=len(self):
+            raise IndexError("solution index out of range")
+        if k not in self.cache:
+            self.cache[k]=self.parse(self.block(k))
+        return self.cache[k]
+
+    def view(self, field):
+        return _SolutionView(self,field)
+
+class _SolutionView():
+    '''
+    Read-only list-like access to one field (e.g. the operating units) of all solutions of a SolutionFile.
+    '''
+    def __init__(self, solutions, field):
+        self.solutions=solutions
+        self.field=field
+
+    def __len__(self):
+        return len(self.solutions)
+
+    def __getitem__(self, k):
+        if isinstance(k,slice):
+            return [self[i] for i in range(*k.indices(len(self)))]
+        return self.solutions.get(k)[self.field]
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def __repr__(self):
+        return "<"+str(len(self))+" solutions in "+self.solutions.path+">"
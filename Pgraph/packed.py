@@ -0,0 +1,398 @@
+'''
+Compact binary form of a Pgraph problem and its results for transfer between processes.
+
+The problem and the results are stored as flat numpy arrays in one contiguous buffer: node attributes as a (nodes, attributes) float matrix,
+edges and mutually exclusive sets as index arrays, and the solutions in CSR form (offsets into arrays of node indices, values, costs and
+indices of their measurement units).
+A small JSON header holds the symbols, names and the array layout. Unpacking views the arrays in place (numpy.frombuffer), so a buffer in
+shared memory is read without copying, and with lazy=True single solutions are only turned into result lists when they are accessed.
+Attributes that are not P-graph parameters are kept if they can be written as JSON (plot attributes such as MarkerStyle objects are dropped).
+'''
+import json
+import numbers
+import os
+import struct
+import sys
+import numpy as np
+import networkx as nx
+from .Pgraph import COSTED_SOLVERS
+
+MAGIC=b"PGPK"
+ALIGN=8
+NODE_ATTRIBUTES=("flow_rate_lower_bound","flow_rate_upper_bound","price","capacity_lower_bound","capacity_upper_bound","fix_cost","proportional_cost")
+MATERIAL_TYPES=("raw_material","intermediate","product")
+_created=set() #Shared memory blocks created by this process
+
+def _number(value):
+    t=type(value)
+    return t is float or t is int or (isinstance(value,numbers.Real) and not isinstance(value,bool))
+
+def _integral(value):
+    t=type(value)
+    return t is int or (t is not float and isinstance(value,numbers.Integral))
+
+def _jsonable(value):
+    if isinstance(value,np.generic):
+        value=value.item()
+    try:
+        json.dumps(value)
+    except (TypeError,ValueError):
+        return None,False
+    return value,True
+
+def _numeric_table(items, keys):
+    '''
+    (len(items), len(keys)) float matrix of the numeric attributes (NaN if absent), int flags of integer values and the other JSON attributes.
+    '''
+    values=np.full((len(items),len(keys)),np.nan)
+    is_int=np.zeros((len(items),len(keys)),dtype=np.int8)
+    extra={}
+    column={k:j for j,k in enumerate(keys)}
+    rows=[[] for k in keys]
+    found=[[] for k in keys]
+    for i,attrs in enumerate(items):
+        for k,v in attrs.items():
+            j=column.get(k)
+            if j is not None and _number(v):
+                rows[j].append(i)
+                found[j].append(v)
+            elif k not in ("names","type"):
+                v,ok=_jsonable(v)
+                if ok:
+                    extra.setdefault(k,[]).append([i,v])
+    for j in range(len(keys)):
+        values[rows[j],j]=np.array(found[j],dtype=float)
+        is_int[rows[j],j]=[_integral(v) for v in found[j]]
+    return values,is_int,extra
+
+def _attributes(values, is_int, keys, extra, n):
+    rows=[{} for i in range(n)]
+    present=~np.isnan(values)
+    for j,k in enumerate(keys):
+        idx=np.flatnonzero(present[:,j])
+        col=values[idx,j]
+        ints=is_int[idx,j].astype(bool)
+        for i,v,integral in zip(idx.tolist(),col.tolist(),ints.tolist()):
+            rows[i][k]=int(v) if integral else v
+    for k,entries in extra.items():
+        for i,v in entries:
+            rows[i][k]=v
+    return rows
+
+def _results_arrays(P, symbol_index, names, measurement_units):
+    '''
+    Solutions of P in CSR form. Result symbols that are not nodes are appended to names, and the measurement units of the costs and
+    flows (e.g. "USD/y", "t/y") to measurement_units.
+    '''
+    has_values=P.solver in COSTED_SOLVERS
+    index=dict(symbol_index)
+    unit_index={}
+
+    def lookup(x):
+        if x not in index:
+            index[x]=len(names)
+            names.append(x)
+        return index[x]
+
+    def unit(x):
+        if x not in unit_index:
+            unit_index[x]=len(measurement_units)
+            measurement_units.append(x)
+        return unit_index[x]
+
+    n=len(P.goolist)
+    total=np.empty(n)
+    arrays={}
+    for kind,results in (("mat",P.gmatlist),("unit",P.goplist)):
+        ptr=np.zeros(n+1,dtype=np.int64)
+        node=[]
+        value=[]
+        cost=[]
+        value_unit=[]
+        cost_unit=[]
+        for i in range(n):
+            entries=results[i]
+            ptr[i+1]=ptr[i]+len(entries)
+            if not has_values:
+                node+=[lookup(x) for x in entries]
+            elif kind=="mat":
+                node+=[lookup(x[0]) for x in entries]
+                value+=[float(x[3]) for x in entries]
+                cost+=[float(x[1]) for x in entries]
+                #Balanced materials of the executable are [name,0,0,0] without units, stored with unit -1
+                cost_unit+=[unit(x[2]) if len(x)>4 else -1 for x in entries]
+                value_unit+=[unit(x[4]) if len(x)>4 else -1 for x in entries]
+            else:
+                node+=[lookup(x[1]) for x in entries]
+                value+=[float(x[0]) for x in entries]
+                cost+=[float(x[2]) for x in entries]
+                cost_unit+=[unit(x[3]) for x in entries]
+        arrays[kind+"_ptr"]=ptr
+        arrays[kind+"_node"]=np.array(node,dtype=np.int32)
+        arrays[kind+"_value"]=np.array(value,dtype=np.float64)
+        arrays[kind+"_cost"]=np.array(cost,dtype=np.float64)
+        arrays[kind+"_cost_unit"]=np.array(cost_unit,dtype=np.int32)
+        if kind=="mat":
+            arrays["mat_value_unit"]=np.array(value_unit,dtype=np.int32)
+    for i in range(n):
+        total[i]=float(P.goolist[i])
+    arrays["total"]=total
+    return arrays
+
+def pack(P, results=True):
+    '''
+    pack(P, results=True)
+
+    Description
+    Packs the problem (network, mutual exclusions, solver settings) and the results of a Pgraph object into one buffer.
+
+    Arguments
+    P: (Pgraph) Pgraph object.
+    results: (boolean) Whether the solutions and the run status are packed too.
+
+    Return
+    buffer: (bytes) Packed problem.
+    '''
+    G=P.G
+    nodes=list(G.nodes())
+    symbol_index={n:i for i,n in enumerate(nodes)}
+    node_attrs=[G.nodes[n] for n in nodes]
+    values,is_int,node_extra=_numeric_table(node_attrs,NODE_ATTRIBUTES)
+    types=np.array([MATERIAL_TYPES.index(a["type"]) if a.get("type") in MATERIAL_TYPES else -1 for a in node_attrs],dtype=np.int8)
+    for i,a in enumerate(node_attrs):
+        if "type" in a and a["type"] not in MATERIAL_TYPES:
+            node_extra.setdefault("type",[]).append([i,a["type"]])
+    edges=list(G.edges(data=True))
+    edge_values,edge_int,edge_extra=_numeric_table([d for u,v,d in edges],("weight",))
+    ME=[list(M) for M in P.ME]
+    me_ptr=np.cumsum([0]+[len(M) for M in ME]).astype(np.int64)
+    arrays={"node_values":values,"node_int":is_int,"node_type":types,
+            "edge_src":np.array([symbol_index[u] for u,v,d in edges],dtype=np.int32),
+            "edge_dst":np.array([symbol_index[v] for u,v,d in edges],dtype=np.int32),
+            "edge_weight":edge_values[:,0],"edge_int":edge_int[:,0],
+            "me_ptr":me_ptr,"me_node":np.array([symbol_index[x] for M in ME for x in M],dtype=np.int32)}
+    names=list(nodes)
+    measurement_units=[]
+    meta={"solver":P.solver,"max_sol":P.max_sol,"input_file":P.input_file,"path":P.path,"results":results}
+    if results:
+        arrays.update(_results_arrays(P,symbol_index,names,measurement_units))
+        meta.update({"partial":P.partial,"lower_bound":P.lower_bound,"gap":P.gap})
+    header={"meta":meta,"symbols":names,"measurement_units":measurement_units,"num_nodes":len(nodes),"names":[a.get("names",n) for n,a in zip(nodes,node_attrs)],
+            "node_extra":node_extra,"edge_extra":edge_extra,"arrays":{}}
+    offset=0
+    for k,a in arrays.items():
+        header["arrays"][k]=[a.dtype.str,list(a.shape),offset]
+        offset+=-(-a.nbytes//ALIGN)*ALIGN
+    head=json.dumps(header,default=lambda x:x.item() if isinstance(x,np.generic) else str(x)).encode("utf-8")
+    start=-(-(len(MAGIC)+8+len(head))//ALIGN)*ALIGN
+    buffer=bytearray(start+offset)
+    buffer[:len(MAGIC)+8]=MAGIC+struct.pack("<Q",len(head))
+    buffer[len(MAGIC)+8:len(MAGIC)+8+len(head)]=head
+    for k,a in arrays.items():
+        o=start+header["arrays"][k][2]
+        buffer[o:o+a.nbytes]=np.ascontiguousarray(a).tobytes()
+    return bytes(buffer)
+
+def _read(buffer):
+    '''
+    Header and array views of a packed buffer.
+    '''
+    view=memoryview(buffer)
+    if bytes(view[:len(MAGIC)])!=MAGIC:
+        raise ValueError("Not a packed Pgraph buffer.")
+    size=struct.unpack("<Q",view[len(MAGIC):len(MAGIC)+8])[0]
+    header=json.loads(bytes(view[len(MAGIC)+8:len(MAGIC)+8+size]))
+    start=-(-(len(MAGIC)+8+size)//ALIGN)*ALIGN
+    arrays={}
+    for k,(dtype,shape,offset) in header["arrays"].items():
+        count=int(np.prod(shape))
+        arrays[k]=np.frombuffer(view,dtype=np.dtype(dtype),count=count,offset=start+offset).reshape(shape)
+    return header,arrays
+
+class PackedSolutions():
+    def __init__(self, header, arrays, owner=None):
+        '''
+        PackedSolutions(header, arrays, owner=None)
+
+        Description
+        Solutions of a packed buffer, turned into the result lists of Pgraph one solution at a time (see Pgraph.read_solutions(lazy=True)).
+
+        Arguments
+        header, arrays: Unpacked buffer.
+        owner: (object)(optional) Object that keeps the buffer alive, e.g. the SharedMemory block.
+        '''
+        self.path="packed buffer"
+        self.names=header["symbols"]
+        self.measurement_units=header.get("measurement_units",[])
+        self.arrays=arrays
+        self.has_values=header["meta"]["solver"] in COSTED_SOLVERS
+        self.owner=owner
+        self.cache={}
+
+    def __len__(self):
+        return len(self.arrays["total"])
+
+    def _entries(self, kind, k):
+        a=self.arrays
+        lo,hi=int(a[kind+"_ptr"][k]),int(a[kind+"_ptr"][k+1])
+        names=[self.names[i] for i in a[kind+"_node"][lo:hi].tolist()]
+        if not self.has_values:
+            return names
+        fmt=lambda x:"%.15g" % x
+        value=a[kind+"_value"][lo:hi].tolist()
+        cost=a[kind+"_cost"][lo:hi].tolist()
+        units=self.measurement_units
+        #Buffers without measurement units hold the units of the native solvers
+        cost_unit=[units[i] if i>=0 else None for i in a[kind+"_cost_unit"][lo:hi].tolist()] if kind+"_cost_unit" in a else ["USD/y"]*len(names)
+        if kind=="mat":
+            value_unit=[units[i] if i>=0 else None for i in a["mat_value_unit"][lo:hi].tolist()] if "mat_value_unit" in a else ["t/y"]*len(names)
+            return [[n,fmt(c),cu,fmt(v),vu] if vu is not None else [n,0,0,0] for n,v,c,cu,vu in zip(names,value,cost,cost_unit,value_unit)]
+        return [[fmt(v),n,fmt(c),cu] for n,v,c,cu in zip(names,value,cost,cost_unit)]
+
+    def get(self, k):
+        if k<0:
+            k+=len(self)
+        if k<0 or k>=len(self):
+            raise IndexError("solution index out of range")
+        if k not in self.cache:
+            self.cache[k]=(self._entries("unit",k),self._entries("mat",k),"%.15g" % self.arrays["total"][k])
+        return self.cache[k]
+
+    def view(self, field):
+        from .outindex import _SolutionView
+        return _SolutionView(self,field)
+
+def unpack(buffer, lazy=False, owner=None):
+    '''
+    unpack(buffer, lazy=False, owner=None)
+
+    Description
+    Rebuilds a Pgraph object from a buffer created by pack().
+
+    Arguments
+    buffer: (bytes, bytearray, memoryview) Packed problem.
+    lazy: (boolean) Keep the solutions in the buffer and build the result lists of a solution on first access. The buffer must stay alive.
+    owner: (object)(optional) Object kept with lazy solutions so that the buffer stays alive.
+
+    Return
+    P: (Pgraph) Pgraph object with the problem and, if packed, the results.
+    '''
+    from .Pgraph import Pgraph
+    header,arrays=_read(buffer)
+    meta=header["meta"]
+    symbols=header["symbols"]
+    n=header["num_nodes"]
+    nodes=symbols[:n]
+    rows=_attributes(arrays["node_values"],arrays["node_int"],NODE_ATTRIBUTES,header["node_extra"],n)
+    types=arrays["node_type"].tolist()
+    for row,name,t in zip(rows,header["names"],types):
+        row["names"]=name
+        if t>=0:
+            row["type"]=MATERIAL_TYPES[t]
+    G=nx.DiGraph()
+    G.add_nodes_from(zip(nodes,rows))
+    edge_rows=_attributes(arrays["edge_weight"][:,None],arrays["edge_int"][:,None],("weight",),header["edge_extra"],len(arrays["edge_src"]))
+    G.add_edges_from(zip([nodes[i] for i in arrays["edge_src"].tolist()],[nodes[i] for i in arrays["edge_dst"].tolist()],edge_rows))
+    me_ptr=arrays["me_ptr"].tolist()
+    me_node=arrays["me_node"].tolist()
+    ME=[[nodes[i] for i in me_node[me_ptr[k]:me_ptr[k+1]]] for k in range(len(me_ptr)-1)]
+    P=Pgraph(G,mutual_exclusion=ME,solver=meta["solver"],max_sol=meta["max_sol"],input_file=meta["input_file"])
+    P.path=meta["path"]
+    if meta["results"]:
+        solutions=PackedSolutions(header,arrays,owner)
+        if lazy:
+            P.goplist,P.gmatlist,P.goolist=solutions.view(0),solutions.view(1),solutions.view(2)
+        else:
+            entries=[solutions.get(k) for k in range(len(solutions))]
+            P.goplist=[e[0] for e in entries]
+            P.gmatlist=[e[1] for e in entries]
+            P.goolist=[e[2] for e in entries]
+        P.partial=meta["partial"]
+        P.lower_bound=meta["lower_bound"]
+        P.gap=meta["gap"]
+        #Structures are encoded on first use for lazy solutions (see Pgraph._get_structures())
+        P.structures=None
+        if not lazy:
+            P._encode_structures()
+    return P
+
+def to_shared_memory(P, results=True, name=None):
+    '''
+    to_shared_memory(P, results=True, name=None)
+
+    Description
+    Packs a Pgraph object into a new shared memory block. The creator has to close() and unlink() the block when it is no longer needed.
+
+    Arguments
+    P: (Pgraph or bytes) Pgraph object or a buffer created by pack().
+    results: (boolean) Whether the results are packed too.
+    name: (string)(optional) Name of the block. Default is a random name.
+
+    Return
+    shm: (multiprocessing.shared_memory.SharedMemory) Block holding the packed problem. Pass shm.name to other processes.
+    '''
+    from multiprocessing import shared_memory
+    buffer=P if isinstance(P,(bytes,bytearray,memoryview)) else pack(P,results)
+    shm=shared_memory.SharedMemory(name=name,create=True,size=max(1,len(buffer)))
+    shm.buf[:len(buffer)]=buffer
+    _created.add(shm.name)
+    return shm
+
+def from_shared_memory(name, lazy=True):
+    '''
+    from_shared_memory(name, lazy=True)
+
+    Description
+    Rebuilds a Pgraph object from a shared memory block created by to_shared_memory(), without copying the packed arrays.
+    With lazy=True the solutions stay in the block and the block stays attached as long as the result lists of the object are used.
+
+    Arguments
+    name: (string) Name of the block.
+    lazy: (boolean) See unpack().
+
+    Return
+    P: (Pgraph) Pgraph object.
+    '''
+    from multiprocessing import shared_memory
+    if sys.version_info>=(3,13):
+        shm=shared_memory.SharedMemory(name=name,track=False)
+    else:
+        shm=shared_memory.SharedMemory(name=name)
+        if os.name=="posix" and name not in _created:
+            #Only the creator may unlink the block, attaching processes must not have it removed at their exit
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name,"shared_memory")
+    P=unpack(shm.buf,lazy=lazy,owner=shm)
+    if not lazy:
+        shm.close()
+    return P
+
+if __name__=="__main__":
+    #Check: an INSIDEOUT result of the executable with a balanced material survives pack() and unpack() (python -m Pgraph.packed)
+    import tempfile
+    from .Pgraph import Pgraph
+
+    G=nx.DiGraph()
+    G.add_node("M1",type='product',flow_rate_lower_bound=100)
+    G.add_node("M2",type='raw_material',price=200)
+    G.add_node("M3",type='intermediate')
+    G.add_node("O1",fix_cost=2000,proportional_cost=400)
+    G.add_node("O2",fix_cost=1000,proportional_cost=400)
+    G.add_edge("M2","O1",weight=1)
+    G.add_edge("O1","M3",weight=1)
+    G.add_edge("M3","O2",weight=1)
+    G.add_edge("O2","M1",weight=1)
+    P=Pgraph(problem_network=G,solver="INSIDEOUT")
+    with tempfile.TemporaryDirectory() as directory:
+        P.path=directory+os.sep
+        with open(P.path+"test_out.out","w") as f:
+            f.write("Maximal Structure:\nMaterials(3):\nM1, M2, M3\nOperating units(2):\nO1, O2\n\n"
+                    "Feasible structure #1:\nMaterials:\nM1: 0 USD/y (100 t/y)\nM2: 20000 USD/y (100 t/y)\nM3: balanced\n"
+                    "Operating units:\n100*O1 (42000 USD/y)\n100*O2 (41000 USD/y)\nTotal annual cost= 103000 USD/y\n\nEnd.\n")
+        P.read_solutions()
+    assert ["M3",0,0,0] in P.gmatlist[0], P.gmatlist
+    for lazy in (False,True):
+        Q=unpack(pack(P),lazy=lazy)
+        assert [list(x) for x in Q.gmatlist[0]]==P.gmatlist[0], Q.gmatlist[0]
+        assert list(Q.goolist)==P.goolist and [list(x) for x in Q.goplist[0]]==P.goplist[0], Q.goplist[0]
+    print("packed results with a balanced material: ok")
@@ -0,0 +1,162 @@
+'''
+Reader of PNS_problem_v1 input files (.in), the format written by Pgraph.create_solver_input() and by P-graph Studio.
+
+The file is read line by line in a single pass. Nodes and edges are collected in lists and added to networkx in bulk.
+'''
+import networkx as nx
+from . import model
+
+#Library defaults of the attributes set in the "defaults:" section
+DEFAULTS={"material_type":("type","raw_material"),
+          "material_flow_rate_lower_bound":("flow_rate_lower_bound",model.MATERIAL_FLOW_RATE_LOWER_BOUND),
+          "material_flow_rate_upper_bound":("flow_rate_upper_bound",model.MATERIAL_FLOW_RATE_UPPER_BOUND),
+          "material_price":("price",model.MATERIAL_PRICE),
+          "operating_unit_capacity_lower_bound":("capacity_lower_bound",model.OPERATING_UNIT_CAPACITY_LOWER_BOUND),
+          "operating_unit_capacity_upper_bound":("capacity_upper_bound",model.OPERATING_UNIT_CAPACITY_UPPER_BOUND),
+          "operating_unit_fix_cost":("fix_cost",model.OPERATING_UNIT_FIX_COST),
+          "operating_unit_proportional_cost":("proportional_cost",model.OPERATING_UNIT_PROPORTIONAL_COST)}
+MATERIAL_TYPES=("raw_material","intermediate","product")
+SECTIONS=("measurement_units","defaults","materials","operating_units","material_to_operating_unit_flow_rates")
+
+def _value(text):
+    #Numbers may be followed by a measurement unit, e.g. "100 t/y"
+    token=text.split()[0] if text.split() else text
+    for convert in (int,float):
+        try:
+            return convert(token)
+        except ValueError:
+            pass
+    return text.strip()
+
+def _attributes(text):
+    '''
+    Type and key=value attributes of a material or operating unit line (the part after "name:").
+    '''
+    kind=None
+    attrs={}
+    for item in text.split(","):
+        item=item.strip()
+        if "=" in item:
+            key,value=item.split("=",1)
+            attrs[key.strip()]=_value(value)
+        elif item:
+            kind=item
+    return kind,attrs
+
+def _side(text):
+    '''
+    [(material, rate)] of one side of a flow rate line, e.g. "2 M1 + M2".
+    '''
+    terms=[]
+    for term in text.split("+"):
+        parts=term.split()
+        if len(parts)==1:
+            terms.append((parts[0],1))
+        elif len(parts)>=2:
+            terms.append((" ".join(parts[1:]),_value(parts[0])))
+    return terms
+
+def _symbol(name, prefix, taken, counter):
+    if name[:1]==prefix:
+        return name
+    while prefix+str(counter[0]) in taken:
+        counter[0]+=1
+    return prefix+str(counter[0])
+
+def read_pns(path):
+    '''
+    read_pns(path)
+
+    Description
+    Reads a PNS_problem_v1 input file into the problem network format of Pgraph.
+    Materials and operating units keep their names from the file as symbols when they start with "M" and "O" (as in files written by Pgraph).
+    Other names are replaced by new symbols and kept in the "names" attribute. Defaults of the file that differ from the library defaults are
+    set on the nodes that do not override them.
+
+    Arguments
+    path: (string) Path of the .in file.
+
+    Return
+    G: (DiGraph() object) Problem network.
+    ME: (list of list) Mutually excluded operating units.
+    symbols: (dict) Name in the file to node symbol, for materials and operating units.
+    '''
+    defaults={}
+    materials=[]
+    units=[]
+    flows=[]
+    me=[]
+    section=None
+    with open(path) as f:
+        for number,line in enumerate(f,1):
+            line=line.strip()
+            if not line or line.startswith("#"):
+                continue
+            name,colon,rest=line.partition(":")
+            name=name.strip()
+            if not rest.strip() and (name in SECTIONS or name.startswith("mutually_ex")):
+                section=name
+                continue
+            if not colon and section not in ("defaults","measurement_units",None):
+                raise ValueError("Line "+str(number)+" of "+path+" has no \"name:\" in section "+section+": "+line)
+            if section=="defaults":
+                key,equal,value=line.partition("=")
+                defaults[key.strip()]=_value(value)
+            elif section=="materials":
+                materials.append((name,)+_attributes(rest))
+            elif section=="operating_units":
+                units.append((name,)+_attributes(rest))
+            elif section=="material_to_operating_unit_flow_rates":
+                inputs,arrow,outputs=rest.partition("=>")
+                flows.append((name,_side(inputs),_side(outputs)))
+            elif section is not None and section.startswith("mutually_ex"):
+                me.append([x.strip() for x in rest.split(",") if x.strip()])
+
+    material_defaults={}
+    unit_defaults={}
+    for key,value in defaults.items():
+        if key in DEFAULTS and value!=DEFAULTS[key][1]:
+            (material_defaults if key.startswith("material") else unit_defaults)[DEFAULTS[key][0]]=value
+    material_type=material_defaults.pop("type",DEFAULTS["material_type"][1])
+
+    taken=set(name for name,kind,attrs in materials)|set(name for name,kind,attrs in units)
+    counter=[1]
+    symbols={}
+    mat_nodes=[]
+    for name,kind,attrs in materials:
+        n=_symbol(name,"M",taken,counter)
+        taken.add(n)
+        symbols[name]=n
+        node={**material_defaults,**attrs,"names":name}
+        node["type"]=kind if kind in MATERIAL_TYPES else material_type
+        mat_nodes.append((n,node))
+    counter=[1]
+    unit_nodes=[]
+    for name,kind,attrs in units:
+        n=_symbol(name,"O",taken,counter)
+        taken.add(n)
+        symbols[name]=n
+        unit_nodes.append((n,{**unit_defaults,**attrs,"names":name}))
+
+    G=nx.DiGraph()
+    G.add_nodes_from(mat_nodes)
+    G.add_nodes_from(unit_nodes)
+    material_symbols={name:symbols[name] for name,kind,attrs in materials}
+    unit_symbols={name:symbols[name] for name,kind,attrs in units}
+    edges=[]
+    for unit,inputs,outputs in flows:
+        if unit not in unit_symbols:
+            raise ValueError("Operating unit "+repr(unit)+" in material_to_operating_unit_flow_rates of "+path+" is not listed in operating_units:")
+        missing=[m for m,rate in inputs+outputs if m not in material_symbols]
+        if missing:
+            raise ValueError("Operating unit "+repr(unit)+" in "+path+" has flow rates of materials not listed in materials: "+", ".join(repr(m) for m in missing))
+        u=unit_symbols[unit]
+        edges+=[(material_symbols[m],u,{"weight":rate}) for m,rate in inputs]
+        edges+=[(u,material_symbols[m],{"weight":rate}) for m,rate in outputs]
+    G.add_edges_from(edges)
+    for M in me:
+        missing=[x for x in M if x not in unit_symbols]
+        if missing:
+            raise ValueError("Mutual exclusion "+repr(M)+" in "+path+" names operating units not listed in operating_units: "+", ".join(repr(x) for x in missing))
+    ME=[[unit_symbols[x] for x in M] for M in me]
+    return G,ME,symbols
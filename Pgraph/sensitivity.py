@@ -0,0 +1,205 @@
+'''
+LP sensitivity analysis of solution structures.
+
+The LP of a structure is written in bounded form with one variable per operating unit capacity (x) and one per net production of a
+material (r = A@x). The optimal basis is recovered from the solution, and shadow prices, reduced costs and allowable ranges follow from it
+by the usual ratio tests, without solving the LP again.
+'''
+import numpy as np
+from scipy.optimize import linprog
+from .abb import lp_data, OUT, IN
+
+TOL=1e-7
+
+def _at_bounds(v, L, U):
+    scale=TOL*np.maximum(1.0,np.maximum(np.abs(L),np.abs(U)))
+    return v-L<=scale, U-v<=scale
+
+def _basis(M, basic, allowed, m):
+    '''
+    Completes the variables strictly between their bounds to a basis of m columns out of the allowed ones, preferring material (slack) columns.
+    None if not a vertex.
+    '''
+    basic=list(np.flatnonzero(basic))
+    if len(basic)>m or (basic and np.linalg.matrix_rank(M[:,basic])<len(basic)):
+        return None
+    for j in np.flatnonzero(allowed)[::-1]:
+        if len(basic)==m:
+            break
+        if j in basic:
+            continue
+        if np.linalg.matrix_rank(M[:,basic+[j]])==len(basic)+1:
+            basic.append(j)
+    return sorted(basic) if len(basic)==m else None
+
+def _ratio(step, slack_up, slack_down):
+    '''
+    Largest t>=0 keeping slack_down <= step*t <= slack_up for all entries (slack_down <= 0 <= slack_up).
+    '''
+    with np.errstate(divide="ignore",invalid="ignore"):
+        t=np.where(step>TOL,slack_up/step,np.where(step<-TOL,slack_down/step,np.inf))
+    return float(max(0.0,t.min())) if len(t) else np.inf
+
+class Sensitivity():
+    def __init__(self, model, units, x=None):
+        '''
+        Sensitivity(model, units, x=None)
+
+        Description
+        Sensitivity of the optimal cost of one structure (fixed set of operating units) to prices, proportional costs and bounds.
+
+        Arguments
+        model: (PNSModel) Problem in array form.
+        units: (list) Indices of the operating units of the structure.
+        x: (numpy array)(optional) Optimal capacities of all operating units, e.g. from the solver results. The LP is only solved if x is missing
+           or does not describe an optimal vertex.
+
+        Attributes
+        rows, cols: (numpy array) Material and operating unit indices in the LP.
+        flow: (numpy array) Net production of the materials (negative for consumed raw materials).
+        shadow_price: (numpy array) Change of the total cost per unit change of the active flow rate bound of each material (0 if no bound is active).
+        active_bound: (list) "lower", "upper" or "" for each material (in terms of flow_rate_lower_bound and flow_rate_upper_bound).
+        bound_range: (numpy array) (low, high) values of the active bound over which the shadow price stays valid.
+        price_range: (numpy array) (low, high) material prices over which the structure's optimal flows stay the same.
+        capacity, reduced_cost, unit_bound, unit_bound_range, cost_range: The same for operating units (capacity bounds and proportional costs).
+        '''
+        self.model=model
+        state=np.full(len(model.units),OUT,dtype=np.int8)
+        state[list(units)]=IN
+        lp=lp_data(model,state)
+        if lp is None:
+            raise ValueError("The structure cannot produce the required products.")
+        self.lp=lp
+        self.rows=lp["rows"]
+        self.cols=lp["cols"]
+        A=lp["A"].toarray()
+        m,n=A.shape
+        #Variables v=[x, r] with M@v=0, cost q and bounds L<=v<=U
+        self.M=np.hstack([A,-np.eye(m)])
+        self.q=np.concatenate([model.prop_cost[self.cols],-model.price[self.rows]])
+        self.L=np.concatenate([lp["lb"],lp["p_lo"]])
+        self.U=np.concatenate([lp["ub"],lp["p_hi"]])
+        if x is None or not self._factor(np.asarray(x,dtype=float)[self.cols]):
+            #Degenerate or missing solution: the duals of HiGHS tell which columns can be basic
+            res=linprog(self.q,A_eq=self.M,b_eq=np.zeros(m),bounds=list(zip(self.L,self.U)),method="highs")
+            if res.status!=0:
+                raise ValueError("The structure has no feasible operation.")
+            if not self._factor(res.x[:n],res.eqlin.marginals):
+                raise RuntimeError("No optimal basis found for the structure.")
+        self._ranges()
+
+    def _factor(self, x, y=None):
+        '''
+        Recovers the optimal basis from the capacities x and, if given, the optimal duals y of the material rows. Returns False if x is not an optimal vertex.
+        '''
+        m=self.M.shape[0]
+        v=np.concatenate([x,self.M[:,:len(x)]@x])
+        at_lo,at_hi=_at_bounds(v,self.L,self.U)
+        if (v<self.L-TOL*np.maximum(1,np.abs(self.L))).any() or (v>self.U+TOL*np.maximum(1,np.abs(self.U))).any():
+            return False
+        scale=TOL*np.maximum(1,np.abs(self.q)).max()*10
+        allowed=np.ones(len(v),dtype=bool) if y is None else np.abs(self.q-self.M.T@y)<=scale
+        basis=_basis(self.M,~(at_lo|at_hi),allowed,m)
+        if basis is None:
+            return False
+        B=self.M[:,basis]
+        y=np.linalg.solve(B.T,self.q[basis]) if m else np.zeros(0)
+        d=self.q-self.M.T@y
+        d[basis]=0
+        nonbasic=np.ones(len(v),dtype=bool)
+        nonbasic[basis]=False
+        fixed=at_lo&at_hi
+        #Dual feasibility: nonbasic at lower need d>=0, at upper d<=0
+        if (nonbasic&~fixed&at_lo&(d<-scale)).any() or (nonbasic&~fixed&at_hi&~at_lo&(d>scale)).any():
+            return False
+        self.v=v
+        self.basis=basis
+        self.nonbasic=nonbasic
+        self.at_lo=at_lo
+        self.at_hi=at_hi
+        self.fixed=fixed
+        self.Binv=np.linalg.inv(B) if m else np.zeros((0,0))
+        self.y=y
+        self.d=d
+        return True
+
+    def _rhs_range(self, k):
+        '''
+        Allowable decrease and increase of the value of nonbasic variable k (i.e. of its active bound).
+        '''
+        g=-self.Binv@self.M[:,k]
+        b=self.basis
+        up=_ratio(g,self.U[b]-self.v[b],self.L[b]-self.v[b])
+        down=_ratio(-g,self.U[b]-self.v[b],self.L[b]-self.v[b])
+        if not self.fixed[k]:
+            #A bound cannot cross the other bound of the same variable
+            if self.at_lo[k]:
+                up=min(up,self.U[k]-self.L[k])
+            else:
+                down=min(down,self.U[k]-self.L[k])
+        return down,up
+
+    def _cost_range(self, k):
+        '''
+        Allowable decrease and increase of the cost coefficient of variable k keeping the basis optimal.
+        '''
+        nb=self.nonbasic&~self.fixed
+        if self.nonbasic[k]:
+            if self.fixed[k]:
+                return np.inf,np.inf
+            return (self.d[k],np.inf) if self.at_lo[k] else (np.inf,-self.d[k])
+        i=self.basis.index(k)
+        alpha=self.Binv[i]@self.M
+        #d_j(delta)=d_j-delta*alpha_j must keep its sign for nonbasic j
+        sign=np.where(self.at_lo,1.0,-1.0)[nb]
+        slack=self.d[nb]*sign
+        step=alpha[nb]*sign
+        up=_ratio(step,slack,-np.inf*np.ones(len(slack)))
+        down=_ratio(-step,slack,-np.inf*np.ones(len(slack)))
+        return down,up
+
+    def _ranges(self):
+        model=self.model
+        n=len(self.cols)
+        m=len(self.rows)
+        raw=model.mat_type[self.rows]==0
+        self.flow=self.v[n:]
+        self.capacity=self.v[:n]
+        self.shadow_price=np.zeros(m)
+        self.active_bound=[""]*m
+        self.bound_range=np.full((m,2),np.nan)
+        self.price_range=np.zeros((m,2))
+        for i in range(m):
+            k=n+i
+            down,up=self._cost_range(k)
+            #q_r=-price
+            self.price_range[i]=(model.price[self.rows[i]]-up,model.price[self.rows[i]]+down)
+            if self.nonbasic[k]:
+                lo=self.at_lo[k]
+                down,up=self._rhs_range(k)
+                bound=self.L[k] if lo else self.U[k]
+                if raw[i]:
+                    #r=-flow: the lower bound of r is the upper flow rate bound of the raw material and vice versa
+                    self.active_bound[i]="upper" if lo else "lower"
+                    if self.fixed[k]:
+                        self.active_bound[i]="fixed"
+                    self.shadow_price[i]=-self.d[k]
+                    self.bound_range[i]=(-bound-up,-bound+down)
+                else:
+                    self.active_bound[i]="fixed" if self.fixed[k] else ("lower" if lo else "upper")
+                    self.shadow_price[i]=self.d[k]
+                    self.bound_range[i]=(bound-down,bound+up)
+        self.reduced_cost=np.zeros(n)
+        self.unit_bound=[""]*n
+        self.unit_bound_range=np.full((n,2),np.nan)
+        self.cost_range=np.zeros((n,2))
+        for j in range(n):
+            down,up=self._cost_range(j)
+            self.cost_range[j]=(model.prop_cost[self.cols[j]]-down,model.prop_cost[self.cols[j]]+up)
+            if self.nonbasic[j]:
+                lo=self.at_lo[j]
+                down,up=self._rhs_range(j)
+                bound=self.L[j] if lo else self.U[j]
+                self.unit_bound[j]="fixed" if self.fixed[j] else ("lower" if lo else "upper")
+                self.reduced_cost[j]=self.d[j]
+                self.unit_bound_range[j]=(bound-down,bound+up)
@@ -0,0 +1,295 @@
+'''
+Local solver daemon.
+
+Start with
+    python -m Pgraph.server --workers 4
+
+and let Pgraph objects submit to it with P.run(server=DEFAULT_SOCKET) or by setting the environment variable PGRAPH_SERVER.
+The daemon keeps a bounded pool of warm worker processes (imports done, wineserver kept alive on Linux) so that jobs from notebooks
+and services on the same host share the CPUs instead of each launching their own solver. Unix only.
+
+The socket is only accessible to the user running the daemon (mode 0600, by default in a private directory), and clients can only set
+the solver options in CLIENT_OPTIONS: the solver executable and its path are always those of the daemon.
+'''
+import argparse
+import collections
+import json
+import os
+import platform
+import shutil
+import socket
+import socketserver
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .Pgraph import Pgraph
+
+DEFAULT_SOCKET=os.path.join(tempfile.gettempdir(),"pgraph-"+str(os.getuid()),"pgraph.sock")
+SOLVER_PATH=os.path.dirname(os.path.realpath(__file__))+r"/solver/"
+SOLVER_NAME="pgraph_solver.exe"
+#Keyword arguments of Pgraph.run() a client may set
+CLIENT_OPTIONS=("time_limit","gap","native","incumbent","cutoff","workers","beam_width")
+
+_work_path=None
+
+def _init_worker():
+    '''
+    Gives every worker its own directory for input.in/test_out.out and keeps wine warm between jobs.
+    '''
+    global _work_path
+    _work_path=tempfile.mkdtemp(prefix="pgraph_worker_")+"/"
+    if platform.system()=="Linux" and shutil.which("wineserver") is not None:
+        subprocess.run(["wineserver","-p"],stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+
+def _client_options(options):
+    '''
+    Checks the run() options sent by a client against CLIENT_OPTIONS.
+    '''
+    unknown=[k for k in options if k not in CLIENT_OPTIONS]
+    if unknown:
+        raise ValueError("Options "+str(unknown)+" are not accepted by the solver daemon. Allowed options: "+", ".join(CLIENT_OPTIONS))
+    return dict(options)
+
+def _private_directory(directory):
+    '''
+    Creates the directory of the default socket with mode 0700, or checks that an existing one belongs to this user and is private.
+    '''
+    if not os.path.isdir(directory):
+        os.makedirs(directory,mode=0o700)
+    info=os.stat(directory)
+    if info.st_uid!=os.getuid() or info.st_mode&0o077:
+        raise RuntimeError("Socket directory "+directory+" must belong to this user and not be accessible to others (mode 0700)")
+
+def _solve_job(problem, options):
+    '''
+    Solves one job inside a worker process and returns the results dictionary of Pgraph.
+    '''
+    start=time.time()
+    P=Pgraph.from_dict(problem)
+    P.path=_work_path
+    P.run(skip_wine=True,server=False,path=SOLVER_PATH,solver_name=SOLVER_NAME,**_client_options(options))
+    results=P._results_dict()
+    results["solve_time"]=time.time()-start
+    return results
+
+def _json_default(obj):
+    #numpy scalars (e.g. weights from fitted models) and sets
+    if hasattr(obj,"item"):
+        return obj.item()
+    if isinstance(obj,(set,tuple)):
+        return list(obj)
+    raise TypeError("Object of type "+type(obj).__name__+" is not JSON serializable")
+
+def _summary(values):
+    if len(values)==0:
+        return {"count":0,"mean":None,"p50":None,"p95":None,"max":None}
+    v=sorted(values)
+    return {"count":len(v),"mean":sum(v)/len(v),"p50":v[len(v)//2],"p95":v[min(len(v)-1,int(0.95*len(v)))],"max":v[-1]}
+
+class _ThreadingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads=True
+
+class SolverServer():
+    def __init__(self, address=DEFAULT_SOCKET, workers=None, max_queue=None, history=1000):
+        '''
+        SolverServer(address=DEFAULT_SOCKET, workers=None, max_queue=None, history=1000)
+
+        Description
+        Solver daemon listening on a Unix socket. Every connection sends one JSON request line and receives one JSON response line.
+        Requests are {"op":"solve","problem":<Pgraph.to_dict()>,"options":<run() keyword arguments in CLIENT_OPTIONS>} or {"op":"metrics"}.
+
+        Arguments
+        address: (string) Path of the Unix socket. It is created with mode 0600. The directory of DEFAULT_SOCKET is created with mode 0700.
+        workers: (int) Number of worker processes, i.e. the maximum number of jobs solved at the same time. Default is the number of CPUs.
+        max_queue: (int)(optional) Maximum number of waiting jobs. Further jobs are rejected with an error.
+        history: (int) Number of recent jobs used for the latency metrics.
+        '''
+        self.address=address
+        self.workers=workers if workers is not None else (os.cpu_count() or 1)
+        self.max_queue=max_queue
+        self.pool=ProcessPoolExecutor(max_workers=self.workers,initializer=_init_worker)
+        self.slots=threading.BoundedSemaphore(self.workers)
+        self.lock=threading.Lock()
+        self.waiting=0
+        self.running=0
+        self.completed=0
+        self.failed=0
+        self.rejected=0
+        self.latency=collections.deque(maxlen=history)
+        self.wait_time=collections.deque(maxlen=history)
+        self.solve_time=collections.deque(maxlen=history)
+        self.started=time.time()
+        self._server=None
+
+    def metrics(self):
+        '''
+        metrics()
+
+        Description
+        Returns queue depth, job counters and latency statistics (seconds) of the recent jobs.
+        '''
+        with self.lock:
+            return {"workers":self.workers,"queue_depth":self.waiting,"running":self.running,
+                    "completed":self.completed,"failed":self.failed,"rejected":self.rejected,
+                    "uptime":time.time()-self.started,
+                    "latency":_summary(self.latency),"wait_time":_summary(self.wait_time),"solve_time":_summary(self.solve_time)}
+
+    def solve(self, problem, options):
+        '''
+        solve(problem, options)
+
+        Description
+        Queues a job until a worker is free, solves it and returns the response dictionary.
+        '''
+        start=time.time()
+        options=_client_options(options)
+        with self.lock:
+            if self.max_queue is not None and self.waiting>=self.max_queue:
+                self.rejected+=1
+                return {"error":"queue full ("+str(self.waiting)+" jobs waiting)"}
+            self.waiting+=1
+        self.slots.acquire()
+        with self.lock:
+            self.waiting-=1
+            self.running+=1
+        waited=time.time()-start
+        try:
+            try:
+                results=self.pool.submit(_solve_job,problem,options).result()
+            except BrokenProcessPool:
+                #A crashed worker breaks the whole pool, start a fresh one and retry once
+                with self.lock:
+                    self.pool=ProcessPoolExecutor(max_workers=self.workers,initializer=_init_worker)
+                results=self.pool.submit(_solve_job,problem,options).result()
+        except Exception as e:
+            with self.lock:
+                self.failed+=1
+            return {"error":type(e).__name__+": "+str(e)}
+        finally:
+            self.slots.release()
+            with self.lock:
+                self.running-=1
+        with self.lock:
+            self.completed+=1
+            self.latency.append(time.time()-start)
+            self.wait_time.append(waited)
+            self.solve_time.append(results.get("solve_time",0.0))
+        results["wait_time"]=waited
+        return results
+
+    def handle(self, request):
+        op=request.get("op","solve")
+        if op=="solve":
+            return self.solve(request["problem"],request.get("options",{}))
+        elif op=="metrics":
+            return self.metrics()
+        return {"error":"unknown op "+str(op)}
+
+    def serve_forever(self):
+        '''
+        serve_forever()
+
+        Description
+        Listens on the socket until shutdown() is called or the process is interrupted.
+        '''
+        daemon=self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line=self.rfile.readline()
+                if not line:
+                    return
+                try:
+                    response=daemon.handle(json.loads(line))
+                except Exception as e:
+                    response={"error":type(e).__name__+": "+str(e)}
+                self.wfile.write((json.dumps(response,default=_json_default)+"\n").encode())
+
+        if os.path.dirname(os.path.abspath(self.address))==os.path.dirname(DEFAULT_SOCKET):
+            _private_directory(os.path.dirname(DEFAULT_SOCKET))
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        #Only the owner may connect: the socket is created with mode 0600
+        umask=os.umask(0o177)
+        try:
+            self._server=_ThreadingServer(self.address,Handler)
+        finally:
+            os.umask(umask)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.pool.shutdown(wait=False)
+            if os.path.exists(self.address):
+                os.remove(self.address)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+def _request(payload, address=None, timeout=None):
+    if address is None:
+        address=os.environ.get("PGRAPH_SERVER",DEFAULT_SOCKET)
+    with socket.socket(socket.AF_UNIX,socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(address)
+        s.sendall((json.dumps(payload,default=_json_default)+"\n").encode())
+        with s.makefile("rb") as f:
+            line=f.readline()
+    if not line:
+        raise RuntimeError("Solver daemon at "+address+" closed the connection without a response")
+    response=json.loads(line)
+    if "error" in response:
+        raise RuntimeError("Solver daemon error: "+response["error"])
+    return response
+
+def submit(problem, options={}, address=None, timeout=None):
+    '''
+    submit(problem, options={}, address=None, timeout=None)
+
+    Description
+    Sends a job to a running solver daemon and waits for the results.
+
+    Arguments
+    problem: (dict) Problem created by Pgraph.to_dict().
+    options: (dict) Keyword arguments of Pgraph.run() in CLIENT_OPTIONS, e.g. {"native":True,"time_limit":30}.
+    address: (string)(optional) Unix socket of the daemon. Default is PGRAPH_SERVER or DEFAULT_SOCKET.
+    timeout: (float)(optional) Socket timeout in seconds.
+
+    Return
+    results: (dict) gmatlist, goplist, goolist, partial, lower_bound and gap as in Pgraph, plus solve_time and wait_time in seconds.
+    '''
+    return _request({"op":"solve","problem":problem,"options":options},address=address,timeout=timeout)
+
+def get_metrics(address=None, timeout=None):
+    '''
+    get_metrics(address=None, timeout=None)
+
+    Description
+    Returns the metrics of a running solver daemon (see SolverServer.metrics()).
+    '''
+    return _request({"op":"metrics"},address=address,timeout=timeout)
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(prog="python -m Pgraph.server",description="Local P-graph solver daemon with a pool of warm workers.")
+    parser.add_argument("--socket",default=os.environ.get("PGRAPH_SERVER",DEFAULT_SOCKET),help="Unix socket path (default: %(default)s)")
+    parser.add_argument("--workers",type=int,default=None,help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--max-queue",type=int,default=None,help="reject jobs when this many are waiting")
+    parser.add_argument("--metrics",action="store_true",help="print the metrics of a running daemon and exit")
+    args=parser.parse_args(argv)
+    if args.metrics:
+        print(json.dumps(get_metrics(args.socket),indent=2))
+        return
+    server=SolverServer(address=args.socket,workers=args.workers,max_queue=args.max_queue)
+    print("Pgraph solver daemon listening on",args.socket,"with",server.workers,"workers",flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,150 @@
+'''
+SVG rendering of problems and solutions without matplotlib.
+
+The geometry of the network (node positions, shapes, edge paths and weight labels) is computed once per layout. Rendering a solution
+only chooses the colors and label texts and joins the precomputed SVG fragments, so it takes a few milliseconds and touches no global state.
+A renderer can be shared between threads.
+'''
+from xml.sax.saxutils import escape
+import math
+import numpy as np
+
+ON="black"
+OFF="lightgrey"
+
+def _f(x):
+    return "%.1f" % x
+
+class SVGRenderer():
+    def __init__(self, P, layout="layered", scale=1.5, node_radius=20, font_size=10, margin=60):
+        '''
+        SVGRenderer(P, layout="layered", scale=1.5, node_radius=20, font_size=10, margin=60)
+
+        Description
+        Prepares the drawing of the network of Pgraph P in P-graph notation: circles for materials, bars for operating units,
+        a triangle in raw materials and rings in products. render() then writes the problem or a solution as an SVG document.
+
+        Arguments
+        P: (Pgraph) Pgraph object.
+        layout: (string or dict) "layered", "dot" or a dictionary of precomputed node positions (see Pgraph.plot_problem()). Computed once.
+        scale: (float) Pixels per layout point.
+        node_radius: (float) Radius of the material circles in pixels.
+        font_size: (float) Font size of the labels in pixels.
+        margin: (float) Margin around the drawing in pixels.
+        '''
+        self.P=P
+        G=P.G
+        self.font_size=font_size
+        self.nodes=list(G.nodes())
+        pos=P._layout(G,layout)
+        xy=np.array([pos[n] for n in self.nodes],dtype=float).reshape(-1,2)
+        lo=xy.min(axis=0) if len(xy) else np.zeros(2)
+        hi=xy.max(axis=0) if len(xy) else np.zeros(2)
+        #Layout y points up, SVG y points down
+        self.xy=np.column_stack([(xy[:,0]-lo[0])*scale+margin,(hi[1]-xy[:,1])*scale+margin+font_size*2])
+        self.width=(hi[0]-lo[0])*scale+2*margin
+        self.height=(hi[1]-lo[1])*scale+2*margin+font_size*2
+        self.index={n:i for i,n in enumerate(self.nodes)}
+        R=node_radius
+        self.R=R
+
+        #(unused, used) variants of every node shape, edge and weight label
+        self.shapes=[]
+        types=dict(G.nodes(data='type'))
+        for n,(x,y) in zip(self.nodes,self.xy):
+            if n[0]=="O":
+                shape='<rect x="'+_f(x-1.4*R)+'" y="'+_f(y-0.35*R)+'" width="'+_f(2.8*R)+'" height="'+_f(0.7*R)+'" fill="{0}"/>'
+            else:
+                shape='<circle cx="'+_f(x)+'" cy="'+_f(y)+'" r="'+_f(R)+'" fill="{0}"/>'
+                if types.get(n)=="raw_material":
+                    r=0.73*R
+                    shape+='<polygon points="'+" ".join(_f(x+r*math.cos(a))+","+_f(y+r*math.sin(a)) for a in (math.pi/2,7*math.pi/6,11*math.pi/6))+'" fill="white"/>'
+                elif types.get(n)=="product":
+                    shape+=('<circle cx="'+_f(x)+'" cy="'+_f(y)+'" r="'+_f(0.82*R)+'" fill="white"/>'
+                            '<circle cx="'+_f(x)+'" cy="'+_f(y)+'" r="'+_f(0.65*R)+'" fill="{0}"/>'
+                            '<circle cx="'+_f(x)+'" cy="'+_f(y)+'" r="'+_f(0.5*R)+'" fill="white"/>')
+            self.shapes.append((shape.format(OFF),shape.format(ON)))
+
+        #Edges from border to border with an arrow marker
+        self.edges=list(G.edges())
+        self.edge_u=np.array([self.index[u] for u,v in self.edges],dtype=np.int64)
+        self.edge_v=np.array([self.index[v] for u,v in self.edges],dtype=np.int64)
+        self.edge_paths=[]
+        self.edge_labels=[]
+        weights=[G[u][v]['weight'] for u,v in self.edges]
+        for i,w in zip(range(len(self.edges)),weights):
+            (x1,y1),(x2,y2)=self.xy[self.edge_u[i]],self.xy[self.edge_v[i]]
+            d=math.hypot(x2-x1,y2-y1) or 1.0
+            ux,uy=(x2-x1)/d,(y2-y1)/d
+            r1=0.35*R if self.edges[i][0][0]=="O" else R
+            r2=0.35*R if self.edges[i][1][0]=="O" else R
+            path=('<line x1="'+_f(x1+ux*r1)+'" y1="'+_f(y1+uy*r1)+'" x2="'+_f(x2-ux*(r2+2))+'" y2="'+_f(y2-uy*(r2+2))+'" stroke="{0}" stroke-width="'+_f(min(max(abs(float(w)),0.5),3))+'" marker-end="url(#{1})"/>')
+            self.edge_paths.append((path.format(OFF,"pg-off"),path.format(ON,"pg-on")))
+            label=('<text x="'+_f((x1+x2)/2)+'" y="'+_f((y1+y2)/2)+'" font-size="'+_f(font_size*0.9)+'" text-anchor="middle" dominant-baseline="middle" fill="{0}">'+escape(str(round(float(w),2)))+'</text>')
+            self.edge_labels.append((label.format("grey"),label.format(ON)))
+
+        self.head=('<svg xmlns="http://www.w3.org/2000/svg" width="'+_f(self.width)+'" height="'+_f(self.height)+'" viewBox="0 0 '+_f(self.width)+' '+_f(self.height)+'" font-family="sans-serif">'
+                   '<defs>'+"".join('<marker id="'+k+'" viewBox="0 0 10 10" refX="9" refY="5" markerWidth="6" markerHeight="6" orient="auto"><path d="M0,0 L10,5 L0,10 z" fill="'+c+'"/></marker>'
+                                    for k,c in (("pg-on",ON),("pg-off",OFF)))+'</defs>'
+                   '<rect width="100%" height="100%" fill="white"/>')
+
+    def _label(self, i, text):
+        '''
+        Multi-line label in a white box centered on node i.
+        '''
+        lines=text.split("\n")
+        fs=self.font_size
+        x,y=self.xy[i]
+        w=max(len(l) for l in lines)*fs*0.6+fs*0.8
+        h=len(lines)*fs*1.2+fs*0.4
+        top=y-h/2
+        out=['<rect x="',_f(x-w/2),'" y="',_f(top),'" width="',_f(w),'" height="',_f(h),'" rx="2" fill="white" fill-opacity="0.8" stroke="black" stroke-width="0.5"/>',
+             '<text x="',_f(x),'" y="',_f(top+fs*0.2),'" font-size="',_f(fs),'" text-anchor="middle">']
+        for l in lines:
+            out+=['<tspan x="',_f(x),'" dy="',_f(fs*1.2),'">',escape(l),'</tspan>']
+        out.append('</text>')
+        return "".join(out)
+
+    def render(self, sol_num=None, title=None):
+        '''
+        render(sol_num=None, title=None)
+
+        Description
+        Writes the problem (sol_num=None) or solution sol_num as an SVG document. Nodes and edges that are not part of the solution are grey.
+
+        Arguments
+        sol_num: (int)(optional) Index of the solution. Default draws the problem.
+        title: (string)(optional) Title. Default matches plot_problem() and plot_solution().
+
+        Return
+        svg: (string) SVG document.
+        '''
+        P=self.P
+        n=len(self.nodes)
+        if sol_num is None:
+            selected=np.ones(n,dtype=bool)
+            names=dict(P.G.nodes(data='names'))
+            labels={x:str(names.get(x,x)) for x in self.nodes}
+            if title is None:
+                title="Original Problem"
+        else:
+            all_node,labels=P._solution_labels(sol_num)
+            selected=np.zeros(n,dtype=bool)
+            selected[[self.index[x] for x in all_node if x in self.index]]=True
+            if title is None:
+                if P.solver in ["SSG","MSG",0,1]:
+                    sol_id=P.goolist[sol_num]
+                    title="Maximal Structure" if sol_id=="0" else "Solution Structure #"+str(sol_id)
+                else:
+                    title="Solution #"+str(sol_num+1)+" Total Costs="+str(P.goolist[sol_num])
+        edge_on=selected[self.edge_u]&selected[self.edge_v] if len(self.edges) else np.zeros(0,dtype=bool)
+        out=[self.head,'<text x="',_f(self.width/2),'" y="',_f(self.font_size*2),'" font-size="',_f(self.font_size*1.4),'" text-anchor="middle">',escape(title),'</text>']
+        edge_on=edge_on.tolist()
+        out+=[path[on] for path,on in zip(self.edge_paths,edge_on)]
+        out+=[label[on] for label,on in zip(self.edge_labels,edge_on)]
+        out+=[shape[on] for shape,on in zip(self.shapes,selected.tolist())]
+        for x,text in labels.items():
+            if x in self.index:
+                out.append(self._label(self.index[x],text))
+        out.append('</svg>')
+        return "".join(out)
@@ -0,0 +1,95 @@
+'''
+Pre-flight validation of problem networks.
+
+One pass over the nodes, edges and mutual exclusions (O(V+E)) collects every problem that would otherwise surface only after the solver
+input was written and the executable was launched, as a parse error of the solver or as "No Feasible Solution Found!".
+'''
+import math
+from numbers import Real
+
+MATERIAL_TYPES=("raw_material","intermediate","product")
+MATERIAL_ATTRIBUTES=("flow_rate_lower_bound","flow_rate_upper_bound","price")
+UNIT_ATTRIBUTES=("capacity_lower_bound","capacity_upper_bound","fix_cost","proportional_cost")
+#Characters that separate the fields of the PNS_problem_v1 input file
+RESERVED=set(" \t\n,:+=#")
+
+def _number(value):
+    kind=type(value)
+    if kind is int:
+        return True
+    if kind is float:
+        return math.isfinite(value)
+    return isinstance(value,Real) and kind is not bool and math.isfinite(value)
+
+def _label(n):
+    return ("Material " if n[0]=="M" else "Operating unit ")+repr(n)
+
+def _bounds(n, attrs, lower, upper, problems):
+    lo=attrs.get(lower)
+    hi=attrs.get(upper)
+    for key,value in ((lower,lo),(upper,hi)):
+        if _number(value) and value<0:
+            problems.append(_label(n)+": "+key+" is negative ("+str(value)+")")
+    if _number(lo) and _number(hi) and lo>hi:
+        problems.append(_label(n)+": "+lower+" ("+str(lo)+") is larger than "+upper+" ("+str(hi)+")")
+
+def validate(G, ME=[[]], attributes=True):
+    '''
+    validate(G, ME=[[]], attributes=True)
+
+    Description
+    Checks a problem network and its mutual exclusions in one pass:
+    node symbols (start with "M" or "O", no separators of the solver input), material types, numeric and consistent bounds, costs and prices,
+    edges (between a material and an operating unit, with a positive numeric weight) and mutual exclusions (operating units of the network).
+
+    Arguments
+    G: (DiGraph() object) Problem network in the format of Pgraph.
+    ME: (list of list) Mutually excluded operating units.
+    attributes: (boolean) Also report node attributes the solver input does not know (they are written to the input file of the executable).
+
+    Return
+    problems: (list) Description of every problem found, empty if the problem is valid.
+    '''
+    problems=[]
+    for n,attrs in G.nodes(data=True):
+        if type(n) is not str or n[:1] not in ("M","O"):
+            problems.append("Node "+repr(n)+": symbol must be a string starting with 'M' (material) or 'O' (operating unit)")
+            continue
+        material=n[0]=="M"
+        if not RESERVED.isdisjoint(n):
+            problems.append(_label(n)+": symbol contains a space or one of , : + = #")
+        known=MATERIAL_ATTRIBUTES if material else UNIT_ATTRIBUTES
+        for key,value in attrs.items():
+            if key in known:
+                if not _number(value):
+                    problems.append(_label(n)+": "+key+" must be a finite number, not "+repr(value))
+            elif key=="type" and material:
+                if value not in MATERIAL_TYPES:
+                    problems.append(_label(n)+": type must be one of "+", ".join(MATERIAL_TYPES)+", not "+repr(value))
+            elif key!="names" and attributes:
+                problems.append(_label(n)+": unknown attribute "+repr(key))
+        lower,upper=("flow_rate_lower_bound","flow_rate_upper_bound") if material else ("capacity_lower_bound","capacity_upper_bound")
+        if lower in attrs or upper in attrs:
+            _bounds(n,attrs,lower,upper,problems)
+
+    for u,successors in G.adjacency():
+        other="O" if type(u) is str and u[:1]=="M" else "M"
+        for v,attrs in successors.items():
+            w=attrs.get("weight")
+            if type(w) in (int,float) and w>0 and type(v) is str and v[:1]==other and type(u) is str and u[:1] in ("M","O"):
+                continue
+            label="Edge "+repr(u)+" -> "+repr(v)
+            if not (type(u) is str and u[:1] in ("M","O") and type(v) is str and v[:1]==other):
+                problems.append(label+": must connect a material and an operating unit")
+            if w is None:
+                problems.append(label+": missing weight")
+            elif not _number(w) or w<=0:
+                problems.append(label+": weight must be a positive number, not "+repr(w))
+
+    for i,group in enumerate(ME):
+        for x in group:
+            if x not in G:
+                problems.append("Mutual exclusion "+str(i+1)+": "+repr(x)+" is not in the network")
+            elif not (isinstance(x,str) and x[0]=="O"):
+                problems.append("Mutual exclusion "+str(i+1)+": "+repr(x)+" is not an operating unit")
+    return problems
@@ -0,0 +1,155 @@
+'''
+Persistent solution viewer.
+
+The problem network is drawn once. Selecting another solution only changes the colors of the existing node and edge artists
+and the text of the labels, so stepping through solutions does not recompute the layout or recreate any artist.
+'''
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib as mpl
+import networkx as nx
+from matplotlib.colors import to_rgba
+
+ON=to_rgba('black')
+OFF=to_rgba('lightgrey')
+
+class SolutionViewer():
+    def __init__(self, P, sol_num=0, figsize=(5,10), padding=0.25, titlepos=0.95, rescale=2, box=True, node_size=3000, layout="dot", ax=None):
+        '''
+        SolutionViewer(P, sol_num=0, figsize=(5,10), padding=0.25, titlepos=0.95, rescale=2, box=True, node_size=3000, layout="dot", ax=None)
+
+        Description
+        Draws the network of a solved Pgraph once and shows solution sol_num. Use show() to switch solutions and interact() for a notebook slider.
+        The drawing matches plot_solution().
+
+        Arguments
+        P: (Pgraph) Solved Pgraph object.
+        sol_num: (int) Index of the first solution to be shown.
+        figsize, padding, titlepos, rescale, box, node_size, layout: As in Pgraph.plot_solution().
+        ax: (matplotlib.axes)(optional) Axes to draw on. Default is a new figure.
+        '''
+        self.P=P
+        self.titlepos=titlepos
+        self.sol_num=None
+        G=P.G
+        if ax is None:
+            fig,ax=plt.subplots(figsize=figsize)
+        self.ax=ax
+        self.nodes=list(G.nodes())
+        self.edges=list(G.edges())
+        self.node_index={n:i for i,n in enumerate(self.nodes)}
+        self.edge_u=np.array([self.node_index[u] for u,v in self.edges],dtype=np.int64)
+        self.edge_v=np.array([self.node_index[v] for u,v in self.edges],dtype=np.int64)
+
+        pos=P._layout(G,layout)
+        pos2=dict(pos)
+        for key, (v1,v2) in pos2.items():
+            if key[0]=="O":
+                pos2[key]=(v1,v2-3)
+        pos=nx.rescale_layout_dict(pos,scale=rescale)
+        pos2=nx.rescale_layout_dict(pos2,scale=rescale)
+
+        label_options = {"ec": "k", "fc": "white", "alpha": 0.8}
+        weights=[G[u][v]['weight'] for u,v in self.edges]
+        nx.draw_networkx_nodes(G,pos=pos,ax=ax,node_color='white',alpha=0.9,node_shape='o',node_size=node_size)
+        self.edge_artists=nx.draw_networkx_edges(G,pos=pos,ax=ax,edgelist=self.edges,edge_color=[OFF]*len(self.edges),width=weights,node_size=node_size)
+        #One collection per marker shape, colored per node
+        self.materials=[n for n in self.nodes if n[0]!="O"]
+        self.units=[n for n in self.nodes if n[0]=="O"]
+        self.products=[n for n,t in G.nodes(data='type') if t=="product"]
+        self.mat_artist=nx.draw_networkx_nodes(G,pos=pos2,ax=ax,nodelist=self.materials,node_color=[OFF]*len(self.materials),node_shape='o',node_size=node_size)
+        xy=np.array([pos2[n] for n in self.units]).reshape(-1,2)
+        self.unit_artist=ax.scatter(xy[:,0],xy[:,1],s=node_size*2,c=[OFF]*len(self.units),marker=mpl.markers.MarkerStyle(marker='s', fillstyle='top'))
+        raw=[n for n,t in G.nodes(data='type') if t=="raw_material"]
+        nx.draw_networkx_nodes(G,pos=pos,ax=ax,nodelist=raw,node_color='white',node_shape='v',node_size=node_size/3*1.6)
+        nx.draw_networkx_nodes(G,pos=pos,ax=ax,nodelist=self.products,node_color='white',node_shape='o',node_size=node_size/3*2)
+        self.product_artist=nx.draw_networkx_nodes(G,pos=pos,ax=ax,nodelist=self.products,node_color=[OFF]*len(self.products),node_shape='o',node_size=node_size/3*1.25)
+        nx.draw_networkx_nodes(G,pos=pos,ax=ax,nodelist=self.products,node_color='white',node_shape='o',node_size=node_size/3*0.75)
+        self.label_artists=nx.draw_networkx_labels(G,pos=pos,ax=ax,labels={n:"" for n in self.nodes},bbox=label_options,font_size=10)
+        labels={k:round(v,2) for k,v in nx.get_edge_attributes(G,'weight').items()}
+        nx.draw_networkx_edge_labels(G,pos=pos,ax=ax,edge_labels=labels)
+        self.mat_rows=np.array([self.node_index[n] for n in self.materials],dtype=np.int64)
+        self.unit_rows=np.array([self.node_index[n] for n in self.units],dtype=np.int64)
+        self.product_rows=np.array([self.node_index[n] for n in self.products],dtype=np.int64)
+        self.texts={}
+        self.edge_selected=np.zeros(len(self.edges),dtype=bool)
+
+        ax.axis('off')
+        ax.autoscale()
+        ax.set_xlim([ax.get_xlim()[0]+padding*ax.get_xlim()[0],ax.get_xlim()[1]+padding*ax.get_xlim()[1]])
+        ax.set_ylim([ax.get_ylim()[0]+padding*ax.get_ylim()[0],ax.get_ylim()[1]+padding*ax.get_ylim()[1]])
+        if box:
+            ax.set_aspect('equal', adjustable='box')
+        self.show(sol_num)
+
+    def show(self, sol_num):
+        '''
+        show(sol_num)
+
+        Description
+        Shows solution sol_num by updating colors, labels and title of the existing artists.
+
+        Return
+        ax: (matplotlib.axes) Axes of the figure.
+        '''
+        P=self.P
+        all_node,labels1=P._solution_labels(sol_num)
+        selected=np.zeros(len(self.nodes),dtype=bool)
+        selected[[self.node_index[n] for n in all_node if n in self.node_index]]=True
+        colors=np.where(selected[:,None],ON,OFF)
+        self.mat_artist.set_facecolor(colors[self.mat_rows])
+        self.unit_artist.set_facecolor(colors[self.unit_rows])
+        self.product_artist.set_facecolor(colors[self.product_rows])
+        edge_selected=selected[self.edge_u]&selected[self.edge_v]
+        if isinstance(self.edge_artists,list):
+            #One FancyArrowPatch per edge (directed graphs), only the edges that change are touched
+            for i in np.flatnonzero(edge_selected!=self.edge_selected):
+                self.edge_artists[i].set_color(ON if edge_selected[i] else OFF)
+        else:
+            self.edge_artists.set_color(np.where(edge_selected[:,None],ON,OFF))
+        self.edge_selected=edge_selected
+        #Only labels whose text changes are updated
+        for n in set(self.texts)|set(labels1):
+            text=labels1.get(n,"")
+            if self.texts.get(n,"")!=text:
+                self.label_artists[n].set_text(text)
+        self.texts=labels1
+
+        if P.solver in ["SSG","MSG",0,1]:
+            sol_id=P.goolist[sol_num]
+            title="Maximal Structure" if sol_id=="0" else "Solution Structure #"+sol_id
+        else:
+            title="Solution #"+str(sol_num+1)+" Total Costs="+str(P.goolist[sol_num])
+        self.ax.set_title(title,y=self.titlepos)
+        self.sol_num=sol_num
+        self.ax.figure.canvas.draw_idle()
+        return self.ax
+
+    def next(self):
+        '''
+        Shows the next solution.
+        '''
+        return self.show((self.sol_num+1)%len(self.P.goolist))
+
+    def previous(self):
+        '''
+        Shows the previous solution.
+        '''
+        return self.show((self.sol_num-1)%len(self.P.goolist))
+
+    def interact(self):
+        '''
+        interact()
+
+        Description
+        Displays a slider (ipywidgets) in a Jupyter notebook that switches the shown solution. Requires an interactive matplotlib backend (e.g. %matplotlib widget).
+
+        Return
+        slider: (ipywidgets.IntSlider) The slider widget.
+        '''
+        import ipywidgets
+        from IPython.display import display
+        slider=ipywidgets.IntSlider(value=self.sol_num,min=0,max=len(self.P.goolist)-1,description="Solution")
+        slider.observe(lambda change: self.show(change["new"]),names="value")
+        display(slider)
+        return slider
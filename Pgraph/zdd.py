@@ -0,0 +1,360 @@
+'''
+Zero-suppressed decision diagram (ZDD) of all combinatorially feasible structures.
+
+A structure is a set of operating units of the maximal structure in which (P-graph axioms)
+- every product and every input of a selected unit that is not a raw material is produced by a selected unit,
+- every selected unit has a path to a product, i.e. produces a product or an input of a selected unit that has such a path,
+- at most one unit of every mutually exclusive set is selected.
+
+The diagram is built top-down over the operating units in a fixed order (breadth-first from the products, which keeps the frontier small).
+The state after deciding a prefix of the units only describes the frontier materials, i.e. materials touched both by decided and by
+undecided units: whether they are needed, produced and reached from a product, which of them reach others through selected units that
+are not yet known to reach a product ("implications"), which such units still wait for one of their outputs to be reached
+("obligations"), and the mutually exclusive sets already used. Equal states share one node, so the size of the diagram grows with the
+number of distinct states, not with the number of structures. The diagram is reduced bottom-up with the usual ZDD rules.
+
+Counting, per-unit frequencies and uniform sampling are dynamic programs over the nodes with exact Python integers.
+'''
+import random
+from collections import deque
+
+NEEDED=1
+PRODUCED=2
+REACHED=4
+
+class StructureDiagram():
+    def __init__(self, G, ME=[[]]):
+        '''
+        StructureDiagram(G, ME=[[]])
+
+        Description
+        Builds the ZDD of all combinatorially feasible structures of a problem network, the structures SSG enumerates.
+
+        Arguments
+        G: (DiGraph() object) Problem network in the format of Pgraph.
+        ME: (list of list) Mutually excluded operating units.
+
+        Attributes
+        units: (list) Operating units of the maximal structure in diagram order. Units outside the maximal structure are in no structure.
+        var, lo, hi: (list) Unit position, 0-child and 1-child of every node. Nodes 0 and 1 are the empty family and the family of the empty set.
+        root: (int) Root node.
+        '''
+        from .maximal import MaximalStructure
+        units,materials=MaximalStructure(G).structure()
+        kinds={m:G.nodes[m].get('type','raw_material') for m in materials}
+        products=[m for m in materials if kinds[m]=="product"]
+        inside=set(units)
+        #Breadth-first from the products: producers of needed materials first
+        order=[]
+        seen=set()
+        queue=deque(products)
+        done=set(products)
+        while queue:
+            m=queue.popleft()
+            for u in G.predecessors(m):
+                if u in inside and u not in seen:
+                    seen.add(u)
+                    order.append(u)
+                    for x in list(G.predecessors(u))+list(G.successors(u)):
+                        if x not in done and kinds.get(x)!="raw_material":
+                            done.add(x)
+                            queue.append(x)
+        order+=[u for u in units if u not in seen]
+        self.units=order
+        self.index={u:i for i,u in enumerate(order)}
+        n=len(order)
+
+        #Non-raw materials with the positions of the units touching them
+        self.materials=[m for m in materials if kinds[m]!="raw_material"]
+        mat_id={m:i for i,m in enumerate(self.materials)}
+        self.inputs=[[mat_id[m] for m in G.predecessors(u) if m in mat_id] for u in order]
+        self.outputs=[[mat_id[m] for m in G.successors(u) if m in mat_id] for u in order]
+        first={}
+        last={}
+        self.last_producer={}
+        self.last_consumer={}
+        for i in range(n):
+            for m in self.inputs[i]+self.outputs[i]:
+                first.setdefault(m,i)
+                last[m]=i
+            for m in self.outputs[i]:
+                self.last_producer[m]=i
+            for m in self.inputs[i]:
+                self.last_consumer[m]=i
+        self.enter=[[] for i in range(n)]
+        self.leave=[[] for i in range(n)]
+        for m in first:
+            self.enter[first[m]].append(m)
+            self.leave[last[m]].append(m)
+        self.product=set(mat_id[m] for m in products)
+        groups=[[self.index[x] for x in M if x in self.index] for M in ME]
+        groups=[g for g in groups if len(g)>1]
+        self.groups_of=[[] for i in range(n)]
+        self.group_leave=[[] for i in range(n)]
+        for k,g in enumerate(groups):
+            for i in g:
+                self.groups_of[i].append(k)
+            self.group_leave[max(g)].append(k)
+
+        self.var=[n,n]
+        self.lo=[0,1]
+        self.hi=[0,1]
+        if not units or any(m not in first for m in self.product):
+            self.root=0
+            return
+        self._build()
+
+    def _step(self, state, i, take):
+        '''
+        State after deciding unit i (take=True selects it), None if no structure can follow.
+        '''
+        flags,imp,obl,used=state
+        flags=dict(flags)
+        imp=set(imp)
+        obl=set(obl)
+        used=set(used)
+        for m in self.enter[i]:
+            flags[m]=NEEDED|REACHED if m in self.product else 0
+        if take:
+            for k in self.groups_of[i]:
+                if k in used:
+                    return None
+                used.add(k)
+            inputs=self.inputs[i]
+            outputs=self.outputs[i]
+            for m in outputs:
+                flags[m]|=PRODUCED
+            for m in inputs:
+                flags[m]|=NEEDED
+            if any(flags[m]&REACHED for m in outputs):
+                reached=list(inputs)
+            else:
+                reached=[]
+                #Everything reaching an output of the unit now reaches its inputs (transitively closed)
+                sources=set(outputs)|set(a for a,b in imp if b in outputs)
+                targets=set(inputs)|set(b for a,b in imp if a in inputs)
+                imp.update((a,b) for a in sources for b in targets if a!=b)
+                obl.add(frozenset(outputs))
+            if reached:
+                stack=[m for m in reached if not flags[m]&REACHED]
+                while stack:
+                    m=stack.pop()
+                    if flags[m]&REACHED:
+                        continue
+                    flags[m]|=REACHED
+                    stack+=[b for a,b in imp if a==m and not flags[b]&REACHED]
+        #Reached materials no longer constrain anything
+        if imp:
+            imp=set((a,b) for a,b in imp if not flags[a]&REACHED and not flags[b]&REACHED)
+        if obl:
+            obl=set(o for o in obl if not any(flags[m]&REACHED for m in o))
+        for m in self.leave[i]:
+            f=flags.pop(m)
+            if f&NEEDED and not f&PRODUCED:
+                return None
+            if not f&REACHED:
+                sources=frozenset(a for a,b in imp if b==m)
+                imp=set((a,b) for a,b in imp if a!=m and b!=m)
+                new=set()
+                for o in obl:
+                    if m in o:
+                        o=(o-{m})|sources
+                        if not o:
+                            return None
+                    new.add(o)
+                obl=new
+        used.difference_update(self.group_leave[i])
+        #Flags without effect on the remaining units are cleared and obligations implied by smaller ones are dropped, so that equivalent
+        #states compare equal: a need is met once the material is produced, being produced only matters for later consumers and being
+        #reached only for later producers
+        for m,f in flags.items():
+            if f&NEEDED and not f&PRODUCED and self.last_producer.get(m,-1)<=i:
+                return None
+            if f&NEEDED and f&PRODUCED:
+                f^=NEEDED
+            if f&PRODUCED and self.last_consumer.get(m,-1)<=i:
+                f^=PRODUCED
+            if f&REACHED and self.last_producer.get(m,-1)<=i:
+                f^=REACHED
+            flags[m]=f
+        #A material can only still be reached through a later consumer, directly or through implications. Obligations without
+        #such materials cannot be met, and implications that cannot fire or have no effect are dropped
+        if obl or imp:
+            reachable=set(m for m in flags if self.last_consumer.get(m,-1)>i)
+            reachable.update([b for a,b in imp if a in reachable])
+            new=set()
+            for o in obl:
+                o=o&reachable
+                if not o:
+                    return None
+                new.add(o)
+            obl=set(o for o in new if not any(p<o for p in new))
+            useful=set(m for o in obl for m in o)|set(m for m in flags if self.last_producer.get(m,-1)>i)
+            imp=set((a,b) for a,b in imp if a in reachable and b in useful)
+        #All states of a level have the same frontier materials in the same insertion order
+        return (tuple(flags.items()),frozenset(imp),frozenset(obl),frozenset(used))
+
+    def _build(self):
+        n=len(self.units)
+        start=((),frozenset(),frozenset(),frozenset())
+        levels=[]
+        current={start:0}
+        for i in range(n):
+            following={}
+            edges=[]
+            for state in current:
+                children=[]
+                for take in (False,True):
+                    s=self._step(state,i,take)
+                    if s is None:
+                        children.append(-1)
+                    elif i==n-1:
+                        children.append(-2 if not s[0] and not s[2] else -1)
+                    else:
+                        children.append(following.setdefault(s,len(following)))
+                edges.append(children)
+            levels.append(edges)
+            current=following
+        #Bottom-up reduction: -1 is the empty family, -2 the family of the empty set
+        unique={}
+        below=[]
+        for i in range(n-1,-1,-1):
+            ids=[]
+            for lo,hi in levels[i]:
+                lo=0 if lo==-1 else (1 if lo==-2 else below[lo])
+                hi=0 if hi==-1 else (1 if hi==-2 else below[hi])
+                if hi==0:
+                    ids.append(lo)
+                    continue
+                key=(i,lo,hi)
+                if key not in unique:
+                    unique[key]=len(self.var)
+                    self.var.append(i)
+                    self.lo.append(lo)
+                    self.hi.append(hi)
+                ids.append(unique[key])
+            below=ids
+        self.root=below[0]
+        self._counts=None
+
+    def _count_all(self):
+        if getattr(self,"_counts",None) is None:
+            counts=[0,1]
+            for k in range(2,len(self.var)):
+                counts.append(counts[self.lo[k]]+counts[self.hi[k]])
+            self._counts=counts
+        return self._counts
+
+    def count(self):
+        '''
+        count()
+
+        Description
+        Exact number of combinatorially feasible structures.
+
+        Return
+        count: (int) Number of structures (a Python integer of any size).
+        '''
+        return self._count_all()[self.root]
+
+    def contains(self, units):
+        '''
+        contains(units)
+
+        Description
+        Whether a set of operating units is a combinatorially feasible structure.
+
+        Arguments
+        units: (list) Symbols of the operating units.
+        '''
+        if any(u not in self.index for u in units):
+            return False
+        chosen=set(self.index[u] for u in units)
+        k=self.root
+        for i in range(len(self.units)):
+            if k>1 and self.var[k]==i:
+                k=self.hi[k] if i in chosen else self.lo[k]
+            elif i in chosen:
+                return False
+        return k==1
+
+    def frequency(self):
+        '''
+        frequency()
+
+        Description
+        Number of structures that contain every operating unit of the maximal structure.
+
+        Return
+        frequency: (dict) Operating unit symbol to number of structures.
+        '''
+        counts=self._count_all()
+        paths=[0]*len(self.var)
+        paths[self.root]=1
+        result=[0]*len(self.units)
+        #Nodes are numbered bottom-up, so parents have larger numbers than their children
+        for k in range(len(self.var)-1,1,-1):
+            if paths[k]:
+                paths[self.lo[k]]+=paths[k]
+                paths[self.hi[k]]+=paths[k]
+                result[self.var[k]]+=paths[k]*counts[self.hi[k]]
+        return {u:result[i] for i,u in enumerate(self.units)}
+
+    def sample(self, n=1, seed=None):
+        '''
+        sample(n=1, seed=None)
+
+        Description
+        Draws structures uniformly at random (with replacement) without enumerating them.
+
+        Arguments
+        n: (int) Number of structures.
+        seed: (int)(optional) Seed of the random generator.
+
+        Return
+        structures: (list of list) Operating unit symbols of every drawn structure.
+        '''
+        counts=self._count_all()
+        if counts[self.root]==0:
+            return []
+        rng=random.Random(seed)
+        structures=[]
+        for j in range(n):
+            k=self.root
+            units=[]
+            while k>1:
+                if rng.randrange(counts[k])<counts[self.hi[k]]:
+                    units.append(self.units[self.var[k]])
+                    k=self.hi[k]
+                else:
+                    k=self.lo[k]
+            structures.append(units)
+        return structures
+
+    def structures(self, limit=None):
+        '''
+        structures(limit=None)
+
+        Description
+        Enumerates the structures in diagram order.
+
+        Arguments
+        limit: (int)(optional) Maximum number of structures.
+
+        Return
+        structures: (generator) Operating unit symbols of every structure.
+        '''
+        emitted=0
+        stack=[(self.root,())]
+        while stack:
+            k,units=stack.pop()
+            if k==0:
+                continue
+            if k==1:
+                yield [self.units[i] for i in units]
+                emitted+=1
+                if limit is not None and emitted>=limit:
+                    return
+                continue
+            stack.append((self.lo[k],units))
+            stack.append((self.hi[k],units+(self.var[k],)))
@@ -25,6 +25,7 @@ long_description_content_type="text/markdown",
 author_email='tsyet12@gmail.com',
 keywords = ['Process Optimization','Process Network Synthesis','Artificial Intelligence'],
 packages=find_packages(),
+entry_points={"console_scripts":["pgraph=Pgraph.cli:main"]},
 setup_requires=install_requires,
 install_requires=install_requires,
 classifiers=[